@@ -0,0 +1,71 @@
+from optparse import OptionParser
+
+from core.arcball import *
+from core.camera import *
+from core.quaternion import *
+
+from bench.bounding import timeCall
+
+import numpy
+
+# Benchmark of the arcball mouse mapping, which runs on the CPU without any GL context.
+# It times the mouse moves of a drag around a group, free and constrained to an axis.
+# Run it from the src directory: python -m bench.arcball
+
+class View(object):
+	"""
+	Stand-in for the GlWidget, with the camera and viewport size that the arcballs read.
+	"""
+
+	def __init__(self, width, height):
+		"""
+		Constructor.
+		"""
+
+		self.wWidth, self.wHeight = width, height
+		self.camera = Camera()
+		self.camera.aspect = float(width) / height
+
+def drag(arcBall, points):
+	"""
+	Drags the arcball along the given screen points, returning the total rotation.
+	"""
+
+	arcBall.setInitialPt(*points[0])
+
+	rotation = Quaternion()
+	for x, y in points[1:]:
+		rotation = arcBall.setFinalPt(x, y) * rotation
+
+	return rotation
+
+def main():
+	"""
+	Runs the benchmark and prints the time per mouse move of each arcball mode.
+	"""
+
+	parser = OptionParser()
+	parser.add_option("--moves", type="int", default=10000)
+	parser.add_option("--seed", type="int", default=0)
+	options, args = parser.parse_args()
+
+	view = View(640, 480)
+	random = numpy.random.RandomState(options.seed)
+	view.camera.rotate(Quaternion.fromAxisAngle(random.uniform(0, 360), *random.uniform(-1, 1, 3)))
+
+	points = numpy.cumsum(random.uniform(-5, 5, (options.moves + 1, 2)), axis=0) + (320, 240)
+
+	print("%12s %14s" % ("mode", "move (us)"))
+
+	for name, arcBall, axis in [("group", ArcBall(view), None), ("group axis", ArcBall(view), (0, 1, 0)),
+								("scene", SceneArcBall(view), None), ("scene axis", SceneArcBall(view), (0, 1, 0))]:
+		arcBall.centralPos = view.camera.position + view.camera.pointer * 10
+		arcBall.radius = 2
+		arcBall.setAxis(axis)
+
+		rotation, seconds = timeCall(drag, arcBall, points)
+
+		print("%12s %14.2f" % (name, seconds / options.moves * 1e6))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,95 @@
+from optparse import OptionParser
+from timeit import default_timer
+
+from core.bounding import boundingSphere
+from core.util import *
+
+import numpy
+
+# Benchmark of the group bounding sphere computation, comparing the expected O(n)
+# boundingSphere() against the former O(n^2) Group.updateRadiusAndCenter().
+# Run it from the src directory: python -m bench.bounding
+
+def quadraticBoundingSphere(positions, radii):
+	"""
+	The former O(n^2) algorithm of Group.updateRadiusAndCenter(), kept as the reference.
+	"""
+
+	maxDistance = 0
+	pts = [0, 0]
+	for a in range(len(positions)):
+		for b in range(len(positions)):
+			dist = lengthVector(positions[a] - positions[b])
+			if dist > maxDistance:
+				pts = [a, b]
+				maxDistance = dist
+
+	center = (positions[pts[0]] + positions[pts[1]]) * 0.5
+	radius = maxDistance * 0.5 + max(radii[pts[0]], radii[pts[1]])
+
+	for i in range(len(positions)):
+		dist = lengthVector(positions[i] - center) + radii[i]
+		if dist > radius:
+			radius = dist
+
+	return center, radius
+
+def randomSpheres(n, seed):
+	"""
+	Returns the positions and radii of n random spheres, like the ones created in the scene.
+	"""
+
+	random = numpy.random.RandomState(seed)
+
+	positions = numpy.ones((n, 4))
+	positions[:, :3] = random.uniform(-10, 10, (n, 3))
+	radii = random.uniform(0.05, 1.0, n)
+
+	return positions, radii
+
+def timeCall(function, *args):
+	"""
+	Returns the result of the call and the time it took, in seconds.
+	"""
+
+	start = default_timer()
+	result = function(*args)
+
+	return result, default_timer() - start
+
+def main():
+	"""
+	Runs the benchmark and prints one line per scene size.
+	"""
+
+	parser = OptionParser()
+	parser.add_option("--sizes", default="100,1000,10000,100000",
+					  help="comma separated list of object counts")
+	parser.add_option("--quadratic-limit", type="int", default=1000,
+					  help="largest object count for which the O(n^2) algorithm is timed")
+	parser.add_option("--seed", type="int", default=0)
+	options, args = parser.parse_args()
+
+	print("%10s %14s %14s %10s" % ("objects", "linear (ms)", "quadratic (ms)", "new/old"))
+
+	for n in [int(size) for size in options.sizes.split(",")]:
+		positions, radii = randomSpheres(n, options.seed)
+
+		(center, radius), linearTime = timeCall(boundingSphere, positions, radii)
+
+		# Checks that every sphere is really bounded.
+		extents = numpy.sqrt(((positions - center) ** 2).sum(axis=1)) + radii
+		assert (extents <= radius * (1 + 1e-9)).all()
+
+		if n <= options.quadratic_limit:
+			(oldCenter, oldRadius), quadraticTime = timeCall(quadraticBoundingSphere, positions, radii)
+			quadratic = "%14.2f" % (quadraticTime * 1000)
+			ratio = "%10.3f" % (radius / oldRadius)
+		else:
+			quadratic = "%14s" % "skipped"
+			ratio = "%10s" % "-"
+
+		print("%10d %14.2f %s %s" % (n, linearTime * 1000, quadratic, ratio))
+
+if __name__ == "__main__":
+	main()
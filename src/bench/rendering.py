@@ -0,0 +1,95 @@
+from optparse import OptionParser
+from timeit import default_timer
+
+# It selects the offscreen GL platform, so it must be imported before anything else imports PyOpenGL.
+from core.offscreen import *
+
+from OpenGL.GL import *
+
+from core.camera import *
+from core.lighting import *
+from core.lod import *
+from core.objects import *
+from core.renderer import *
+from core.scenes import *
+
+import numpy
+
+# Frame time comparison between the per-object and the instanced rendering paths.
+# It renders offscreen, so it needs no display. Run it from the src directory: python -m bench.rendering
+# With --lod, the spheres are drawn with the screen-space levels of detail, and the number of
+# triangles saved per frame is reported as well.
+
+WIDTH = 640
+HEIGHT = 480
+
+def frameTime(camera, lighting, renderObjects, frames, lod=None, store=None):
+	"""
+	Renders the given number of frames, returning the average frame time in seconds.
+	If a LevelOfDetail object is given, it is updated for the store every frame.
+	"""
+
+	start = default_timer()
+	for i in range(frames):
+		glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+		camera.setLens(WIDTH, HEIGHT)
+		camera.setView()
+		lighting.render()
+		if lod is not None:
+			lod.update(camera, HEIGHT, store)
+		renderObjects()
+		glFinish()
+
+	return (default_timer() - start) / frames
+
+def main():
+	"""
+	Runs the benchmark and prints one line per scene size.
+	"""
+
+	parser = OptionParser()
+	parser.add_option("--sizes", default="1000,10000,50000",
+					  help="comma separated list of object counts")
+	parser.add_option("--frames", type="int", default=10)
+	parser.add_option("--seed", type="int", default=0)
+	parser.add_option("--lod", action="store_true", default=False,
+					  help="use the screen-space levels of detail for the spheres")
+	options, args = parser.parse_args()
+
+	context = OffscreenContext(WIDTH, HEIGHT)
+	camera = Camera()
+	lighting = Lighting()
+	renderer = SceneRenderer()
+	renderer.initialize(lighting)
+	geometry = renderer.geometry
+	instancing = renderer.instancing
+	lod = None
+	if options.lod:
+		lod = LevelOfDetail()
+
+	if not instancing.supported:
+		print("Instanced rendering is not supported by this GL implementation.")
+
+	print("%10s %18s %18s %8s %16s" % ("objects", "per-object (ms)", "instanced (ms)", "speedup", "triangles saved"))
+
+	for n in [int(size) for size in options.sizes.split(",")]:
+		store = randomScene(n, options.seed)
+
+		perObject = frameTime(camera, lighting, lambda: store.render(geometry, lod=lod), options.frames, lod, store)
+		saved = 0
+		if lod is not None:
+			saved = lod.trianglesSaved
+
+		if instancing.supported:
+			instanced = frameTime(camera, lighting, lambda: instancing.render(store, geometry, lod=lod),
+								  options.frames, lod, store)
+			print("%10d %18.2f %18.2f %7.1fx %16d" % (n, perObject * 1000, instanced * 1000,
+													  perObject / instanced, saved))
+		else:
+			print("%10d %18.2f %18s %8s %16d" % (n, perObject * 1000, "-", "-", saved))
+
+	renderer.release()
+	context.release()
+
+if __name__ == "__main__":
+	main()
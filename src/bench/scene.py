@@ -0,0 +1,293 @@
+from optparse import OptionParser
+from math import *
+
+# It selects the offscreen GL platform, so it must be imported before anything else imports PyOpenGL.
+from core.offscreen import *
+
+from OpenGL.GL import *
+from core.camera import *
+from core.lighting import *
+from core.objects import *
+from core.quaternion import *
+from core.renderer import *
+from core.scenes import *
+from core.util import *
+
+from bench.bounding import timeCall
+
+import json
+import platform
+import numpy
+
+# Benchmark of the scene operations of the GlWidget at growing scene sizes:
+# creation, rendering, picking, view all, select all, adding and removing a group member,
+# group rotation, resizing and deleting. The scenes are generated from a seed, so every run
+# measures the same objects. The results can be written to a JSON or CSV file. For example:
+#   python -m bench.scene --sizes 100,1000,10000,100000 --output scene.json
+# Run it from the src directory.
+
+WIDTH, HEIGHT = 640, 480
+
+# Order of the measured operations in the results.
+OPERATIONS = ("create", "render", "viewAll", "tryPick", "selectAll", "groupRemove", "groupAdd",
+			  "groupRotate", "resize", "deleteSelected")
+
+class BenchmarkView(object):
+	"""
+	Stand-in for the GlWidget, without Qt. Like the GlWidget, it runs the scene operations through
+	a Scene that keeps a history, so they record the same undo commands. Its methods make the same
+	Scene calls as the GlWidget methods with the same names, with the mouse position and the size
+	slider value set directly, and without requesting repaints.
+	"""
+
+	def __init__(self, width, height):
+		"""
+		Constructor.
+		"""
+
+		self.wWidth, self.wHeight = width, height
+
+		self.camera = Camera()
+		self.lighting = Lighting()
+		self.renderer = SceneRenderer()
+
+		self.scene = Scene(history=True, view=self)
+		self.sceneObjects = self.scene.sceneObjects
+		self.selectedObjects = self.scene.selectedObjects
+
+		# Mouse position, in GL coordinates, and value of the size slider.
+		self.mousePos = numpy.zeros(3)
+		self.sizeSliderValue = 5
+
+	def createCube(self):
+		"""
+		Creates a new cube, like GlWidget.createCube().
+		"""
+
+		self.scene.createAt(CUBE, self.mousePos[X], self.mousePos[Y], self.sizeSliderValue*0.1)
+
+	def createSphere(self):
+		"""
+		Creates a new sphere, like GlWidget.createSphere().
+		"""
+
+		self.scene.createAt(SPHERE, self.mousePos[X], self.mousePos[Y], self.sizeSliderValue*0.1)
+
+	def render(self):
+		"""
+		Renders a frame, like GlWidget.paintGL(), waiting for the GL to finish it.
+		"""
+
+		glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+		self.renderer.render(self.camera, self.lighting, self.sceneObjects, self.wWidth, self.wHeight,
+							 self.selectedObjects)
+		glFinish()
+
+	def tryPick(self):
+		"""
+		Returns the object under the current mouse position, like GlWidget.tryPick() with ray picking.
+		"""
+
+		objectId = self.scene.pick(self.mousePos[X], self.mousePos[Y])
+		if objectId is None:
+			return None
+
+		return self.sceneObjects.find(objectId)
+
+	def selectAll(self):
+		"""
+		Selects all objects, like GlWidget.selectAll().
+		"""
+
+		self.scene.selectAll()
+
+	def deleteSelectedObjects(self):
+		"""
+		Deletes all selected objects, like GlWidget.deleteSelectedObjects().
+		"""
+
+		self.scene.deleteSelected()
+
+	def viewAll(self):
+		"""
+		Moves the camera to see all the objects, like GlWidget.viewAll().
+		"""
+
+		self.scene.viewAll()
+
+	def sizeSliderChangeEvent(self):
+		"""
+		Changes the size of the selected objects, like GlWidget.sizeSliderChangeEvent()
+		while the slider is dragged, so that the resizes are merged into one undo command.
+		"""
+
+		if len(self.selectedObjects) > 0:
+			self.scene.resize(self.scene.selectedIds(), self.sizeSliderValue * 0.1, merge=True)
+
+def generateScene(view, n, seed):
+	"""
+	Creates n cubes and spheres in the view, pressing C or E at random mouse positions and
+	size slider values, while the camera turns around randomly. The camera is reset afterwards.
+	The same seed always gives the same scene.
+	"""
+
+	random = numpy.random.RandomState(seed)
+
+	view.sceneObjects.reserve(len(view.sceneObjects) + n)
+	view.camera.setLens(view.wWidth, view.wHeight)
+
+	for i in range(n):
+		view.camera.rotate(Quaternion.fromAxisAngle(random.uniform(0, 30), *random.uniform(-1, 1, 3)))
+		view.camera.setView()
+
+		view.mousePos[X] = random.randint(view.wWidth)
+		view.mousePos[Y] = random.randint(view.wHeight)
+		view.sizeSliderValue = random.randint(1, 21)
+
+		if random.randint(2):
+			view.createCube()
+		else:
+			view.createSphere()
+
+	view.camera.reset()
+
+def timeRepeated(function, repeats, setup=None):
+	"""
+	Calls the function the given number of times, calling setup(i) before each call
+	without timing it. Returns the list of times, in seconds.
+	"""
+
+	times = []
+	for i in range(repeats):
+		if setup is not None:
+			setup(i)
+		times.append(timeCall(function)[1])
+
+	return times
+
+def measure(n, options):
+	"""
+	Runs every operation on a generated scene of n objects.
+	Returns a dictionary with the list of times of each operation.
+	"""
+
+	view = BenchmarkView(WIDTH, HEIGHT)
+	view.renderer.initialize(view.lighting)
+	random = numpy.random.RandomState(options.seed + 1)
+
+	def moveMouse(i):
+		view.mousePos[X] = random.randint(WIDTH)
+		view.mousePos[Y] = random.randint(HEIGHT)
+
+	times = dict.fromkeys(OPERATIONS)
+
+	times["create"] = [timeCall(generateScene, view, n, options.seed)[1]]
+	times["viewAll"] = timeRepeated(view.viewAll, options.repeats)
+
+	# The first frame builds the meshes, so it is not measured.
+	view.render()
+	times["render"] = timeRepeated(view.render, options.frames)
+
+	times["tryPick"] = timeRepeated(view.tryPick, options.repeats, moveMouse)
+
+	times["selectAll"] = [timeCall(view.selectAll)[1]]
+
+	# Removing and adding back one of the selected objects.
+	group = view.selectedObjects
+	obj = view.sceneObjects[random.randint(n)]
+	times["groupRemove"] = [timeCall(group.remove, obj)[1]]
+	times["groupAdd"] = [timeCall(group.add, obj)[1]]
+
+	# Dragging the group with the right button, starting from its center.
+	center = view.camera.project(group.centralPosition, WIDTH, HEIGHT)
+	group.rightClickEvent(center[X], center[Y])
+
+	def dragMouse(i):
+		angle = 2 * pi * i / options.repeats
+		view.mousePos[X] = center[X] + 50 * cos(angle)
+		view.mousePos[Y] = center[Y] + 50 * sin(angle)
+
+	times["groupRotate"] = timeRepeated(lambda: group.rightClickMoveEvent(view.mousePos[X], view.mousePos[Y]),
+										options.repeats, dragMouse)
+	group.rightClickReleaseEvent(view.mousePos[X], view.mousePos[Y])
+
+	def moveSlider(i):
+		view.sizeSliderValue = 1 + i % 20
+
+	times["resize"] = timeRepeated(view.sizeSliderChangeEvent, options.repeats, moveSlider)
+
+	times["deleteSelected"] = [timeCall(view.deleteSelectedObjects)[1]]
+	assert len(view.sceneObjects) == 0
+
+	view.renderer.release()
+
+	return times
+
+def writeResults(path, options, results):
+	"""
+	Writes the results to a JSON file, or to a CSV file if the path ends with .csv.
+	Each result is an (objects, operation, times) tuple.
+	"""
+
+	records = []
+	for n, operation, times in results:
+		times = numpy.array(times) * 1000
+		records.append({"objects": n, "operation": operation, "repeats": len(times),
+						"mean_ms": times.mean(), "min_ms": times.min(), "max_ms": times.max()})
+
+	resultsFile = open(path, "w")
+	try:
+		if path.lower().endswith(".csv"):
+			columns = ["objects", "operation", "repeats", "mean_ms", "min_ms", "max_ms"]
+			resultsFile.write(",".join(columns) + "\n")
+			for record in records:
+				values = [record[column] for column in columns]
+				resultsFile.write(",".join([str(value) for value in values]) + "\n")
+		else:
+			renderer = glGetString(GL_RENDERER)
+			if not isinstance(renderer, str):
+				renderer = renderer.decode("ascii", "replace")
+			header = {"seed": options.seed, "frames": options.frames, "repeats": options.repeats,
+					  "width": WIDTH, "height": HEIGHT, "python": platform.python_version(),
+					  "numpy": numpy.__version__, "renderer": renderer}
+			json.dump({"benchmark": header, "results": records}, resultsFile, indent=1)
+	finally:
+		resultsFile.close()
+
+def main():
+	"""
+	Runs the benchmark and prints the mean time of each operation, in milliseconds, per scene size.
+	"""
+
+	parser = OptionParser()
+	parser.add_option("--sizes", default="100,1000,10000,100000",
+					  help="comma separated list of object counts")
+	parser.add_option("--frames", type="int", default=5,
+					  help="number of frames rendered per scene size")
+	parser.add_option("--repeats", type="int", default=20,
+					  help="number of picks, rotation steps and resizes per scene size")
+	parser.add_option("--seed", type="int", default=0)
+	parser.add_option("--output", help="JSON (or .csv) file where the results are written")
+	options, args = parser.parse_args()
+
+	context = OffscreenContext(WIDTH, HEIGHT)
+
+	print("%8s" % "objects" + "".join(["%15s" % operation for operation in OPERATIONS]))
+
+	results = []
+	for n in [int(size) for size in options.sizes.split(",")]:
+		times = measure(n, options)
+
+		line = "%8d" % n
+		for operation in OPERATIONS:
+			results.append((n, operation, times[operation]))
+			line += "%15.3f" % (numpy.mean(times[operation]) * 1000)
+		print(line)
+
+	if options.output:
+		writeResults(options.output, options, results)
+
+	context.release()
+
+if __name__ == "__main__":
+	main()
@@ -1,13 +1,15 @@
-from OpenGL.GL import *
-from OpenGL.GLU import *
 from math import *
 import numpy
 
 from util import *
+from transform import *
+from quaternion import *
 
 class ArcBall(object):
 	"""
 	This class represents an arcball object.
+	It maps the mouse to its sphere with the camera matrices, computed on the CPU, so it needs no GL context.
+	The parent must have the camera and the viewport size (wWidth and wHeight) of the view.
 	"""
 	
 	def __init__(self, parent):
@@ -25,6 +27,8 @@ class ArcBall(object):
 		self.finalPt = [0, 0, 0]
 		# Set a reference to the GLWidget that contains this ArcBall object.
 		self.parent = parent
+		# Unit axis that the rotations are constrained to, in world coordinates, or None for free rotations.
+		self.axis = None
 		
 	def setCentralPosition(self, newPosition):
 		"""
@@ -40,6 +44,16 @@ class ArcBall(object):
 		
 		self.radius = newRadius
 		
+	def setAxis(self, axis):
+		"""
+		Constrains the rotations to the given axis, in world coordinates. If it is None, the rotations are free.
+		"""
+		
+		if axis is None:
+			self.axis = None
+		else:
+			self.axis = numpy.array(axis[:3], dtype=float) / lengthVector(axis[:3])
+		
 	def setInitialPt(self, x, y):
 		"""
 		Sets the initial point of the arcball manipulation, in screen coordinates.
@@ -50,35 +64,45 @@ class ArcBall(object):
 	def setFinalPt(self, x, y, inverse=False):
 		"""
 		Sets the final point of the arcball manipulation, in screen coordinates,
-		returning the rotation matrix associated with the movement.
+		returning the rotation quaternion associated with the movement.
 		"""
 		
 		self.finalPt = self.screenToSphereCoordinates(x, y)
-		retMatrix = self.__getRotation()
+		rotation = self.__getRotation()
 		self.initialPt = self.finalPt
 		
 		if inverse:
-			retMatrix = numpy.transpose(retMatrix)
+			rotation = rotation.conjugate()
 		
-		return retMatrix  
+		return rotation
 		
 	def screenToSphereCoordinates(self, x, y):
 		"""
 		Maps screen coordinates to the arcball's sphere coordinates.
-		Warning: This method sets the matrix mode to GL_MODELVIEW.
 		"""
 		
-		# Initialize sphere coordinates array (return value).
-		sphereCoords = numpy.zeros(4)
-		sphereCoords[W] = 1
+		camera = self.parent.camera
+		width, height = self.parent.wWidth, self.parent.wHeight
 		
 		# Gets the sphere's center position on the screen.
-		screenCenter = gluProject(*self.centralPos[:3])[:2]
+		center = numpy.array(self.centralPos[:3], dtype=float)
+		screenCenter = camera.project(center, width, height)[:2]
 		
 		# Calculates the radius of the sphere projected on the screen.
-		screenBorder = gluProject(*(self.centralPos + self.parent.camera.upVector * self.radius)[:3])[:2]
+		screenBorder = camera.project(center + camera.upVector[:3] * self.radius, width, height)[:2]
 		screenRadius = distance(screenCenter, screenBorder)
 		
+		return self.sphereCoordinates(x, y, screenCenter, screenRadius)
+	
+	def sphereCoordinates(self, x, y, screenCenter, screenRadius):
+		"""
+		Maps screen coordinates to the coordinates of a sphere with the given center and radius on the screen,
+		rotated according to the camera and constrained to the rotation axis, if there is one.
+		"""
+		
+		# Initialize sphere coordinates array (return value).
+		sphereCoords = numpy.zeros(4)
+		
 		# Finally, sets the sphere coordinates.
 		sphereCoords[X] = (x - screenCenter[X]) / screenRadius
 		sphereCoords[Y] = (y - screenCenter[Y]) / screenRadius 
@@ -91,36 +115,39 @@ class ArcBall(object):
 			sphereCoords[Z] = sqrt(1 - r)
 			
 		# Rotates the sphere coordinates according to the camera.
-		glMatrixMode(GL_MODELVIEW)
-		glPushMatrix()
-		# Unsets all translations in the matrix.
-		tempMatrix = glGetDouble(GL_MODELVIEW_MATRIX)
-		for i in range(3):
-			tempMatrix[W][i] = 0
-		# Makes the inverse rotation to the coordinates (we have the camera's rotation).
-		glLoadMatrixd(numpy.transpose(tempMatrix))
-		sphereCoords = multiplyByMatrix(sphereCoords)
-		glPopMatrix()
+		# As a direction (W = 0), the coordinates are not affected by the translation of the inverse view matrix.
+		sphereCoords = numpy.dot(sphereCoords, self.parent.camera.inverseViewMatrix())
+		
+		if self.axis is not None:
+			sphereCoords[:3] = self.__constrain(sphereCoords[:3])
+		
+		sphereCoords[W] = 1
 			
 		return sphereCoords
 	
-	def __getRotation(self):
+	def __constrain(self, point):
 		"""
-		Returns the rotation matrix of the arcball based on the initial and final points.
-		Warning: This method sets the matrix mode to GL_MODELVIEW.
+		Projects a point of the unit sphere onto the great circle perpendicular to the rotation axis.
 		"""
 		
-		glMatrixMode(GL_MODELVIEW)
+		point = point - self.axis * numpy.dot(point, self.axis)
+		norm = lengthVector(point)
+		if norm > 1e-12:
+			return point / norm
 		
-		perpVector = crossProduct(self.initialPt, self.finalPt)
+		# The point is on the axis: any point of the circle will do.
+		point = crossProduct(self.axis, [1, 0, 0])[:3]
+		if lengthVector(point) < 1e-6:
+			point = crossProduct(self.axis, [0, 1, 0])[:3]
 		
-		glPushMatrix()
-		glLoadIdentity()
-		glRotate(angle(self.initialPt, self.finalPt), *perpVector[:3])
-		retMatrix = glGetDouble(GL_MODELVIEW_MATRIX)
-		glPopMatrix()
+		return point / lengthVector(point)
+	
+	def __getRotation(self):
+		"""
+		Returns the rotation quaternion of the arcball based on the initial and final points.
+		"""
 		
-		return retMatrix
+		return Quaternion.fromVectors(self.initialPt, self.finalPt)
 
 class SceneArcBall(ArcBall):
 	"""
@@ -130,40 +157,12 @@ class SceneArcBall(ArcBall):
 	def screenToSphereCoordinates(self, x, y):
 		"""
 		Maps screen coordinates to the arcball's sphere coordinates.
-		Warning: This method sets the matrix mode to GL_MODELVIEW.
 		"""
 		
-		# Initialize sphere coordinates array (return value).
-		sphereCoords = numpy.zeros(4)
-		sphereCoords[W] = 1
-		
 		# Gets the sphere's center position on the screen.
 		screenCenter = [self.parent.wWidth*0.5, self.parent.wHeight*0.5]
 		
 		# Calculates the radius of the sphere projected on the screen.
 		screenRadius = lengthVector(screenCenter)
 		
-		# Finally, sets the sphere coordinates.
-		sphereCoords[X] = (x - screenCenter[X]) / screenRadius
-		sphereCoords[Y] = (y - screenCenter[Y]) / screenRadius 
-		r = sphereCoords[X]*sphereCoords[X] + sphereCoords[Y]*sphereCoords[Y]
-		if (r > 1):
-			# Selected point is outside the sphere boudings on the screen.
-			sphereCoords[X] /= sqrt(r)
-			sphereCoords[Y] /= sqrt(r)
-		else:
-			sphereCoords[Z] = sqrt(1 - r)
-			
-		# Rotates the sphere coordinates according to the camera.
-		glMatrixMode(GL_MODELVIEW)
-		glPushMatrix()
-		# Unsets all translations in the matrix.
-		tempMatrix = glGetDouble(GL_MODELVIEW_MATRIX)
-		for i in range(3):
-			tempMatrix[W][i] = 0
-		# Makes the inverse rotation to the coordinates (we have the camera's rotation).
-		glLoadMatrixd(numpy.transpose(tempMatrix))
-		sphereCoords = multiplyByMatrix(sphereCoords)
-		glPopMatrix()
-			
-		return sphereCoords
\ No newline at end of file
+		return self.sphereCoordinates(x, y, screenCenter, screenRadius)
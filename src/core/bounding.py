@@ -0,0 +1,78 @@
+from util import *
+
+import numpy
+
+def boundingSphere(positions, radii, refinements=8):
+	"""
+	Returns the (center, radius) of a sphere that bounds all the given spheres.
+	positions is an (N,3) or (N,4) array with the centers of the spheres, and radii is
+	an array with their N radii. The center is returned as a point (W = 1).
+	It uses Ritter's algorithm, growing the sphere towards the farthest sphere outside
+	of it, followed by a few shrink-and-grow refinement passes. Every step is a vectorized
+	O(n) pass, and only a small number of steps is needed, so it runs in expected O(n).
+	"""
+
+	points = numpy.asarray(positions, dtype=float)[:, :3]
+	radii = numpy.asarray(radii, dtype=float)
+
+	center = numpy.zeros(4)
+	center[W] = 1
+
+	if len(points) == 0:
+		return center, 0.0
+
+	# Initial guess: the sphere that bounds two spheres that are (roughly) the farthest apart.
+	a = numpy.argmax(_distances(points, points[0]) + radii)
+	b = numpy.argmax(_distances(points, points[a]) + radii)
+	sphereCenter, radius = _mergeSpheres(points[a], radii[a], points[b], radii[b])
+
+	sphereCenter, radius = _grow(points, radii, sphereCenter, radius)
+
+	# Tries to find a tighter sphere by shrinking the current one and growing it again.
+	for i in range(refinements):
+		newCenter, newRadius = _grow(points, radii, sphereCenter, radius * 0.95)
+		if newRadius < radius:
+			sphereCenter, radius = newCenter, newRadius
+
+	center[:3] = sphereCenter
+
+	return center, float(radius)
+
+def _distances(points, point):
+	"""
+	Returns the distances between every point in the (N,3) array and the given point.
+	"""
+
+	diff = points - point
+
+	return numpy.sqrt((diff * diff).sum(axis=1))
+
+def _mergeSpheres(centerA, radiusA, centerB, radiusB):
+	"""
+	Returns the (center, radius) of the smallest sphere that bounds the two given spheres.
+	"""
+
+	dist = lengthVector(centerB - centerA)
+
+	if dist + radiusB <= radiusA:
+		return centerA.copy(), radiusA
+	elif dist + radiusA <= radiusB:
+		return centerB.copy(), radiusB
+
+	radius = (dist + radiusA + radiusB) * 0.5
+
+	return centerA + (centerB - centerA) * ((radius - radiusA) / dist), radius
+
+def _grow(points, radii, center, radius):
+	"""
+	Grows the given sphere until it bounds all the spheres, merging it with the farthest
+	sphere that lies outside of it at each step.
+	"""
+
+	while True:
+		extents = _distances(points, center) + radii
+		i = numpy.argmax(extents)
+		if extents[i] <= radius * (1 + 1e-9):
+			return center, radius
+
+		center, radius = _mergeSpheres(center, radius, points[i], radii[i])
@@ -2,12 +2,17 @@ from OpenGL.GL import *
 from OpenGL.GLU import *
 
 from util import *
+from transform import *
+from quaternion import *
 
 import numpy
 
 class Camera(object):
 	"""
 	This class represents the camera system.
+	The view and projection matrices, and their inverses, are computed on the CPU and cached until the
+	attributes they depend on are assigned again. Augmented assignments such as position += shift
+	count as assignments, but changes to single elements of the vectors (position[X] = 0) are not noticed.
 	"""
 	
 	# Camera and perspective constants.
@@ -20,11 +25,18 @@ class Camera(object):
 	MIN_FOV = 1
 	DEFAULT_DEPTH = 0.05
 	
+	# Cached matrices that depend on the view (position and direction) and on the projection (lens).
+	VIEW_MATRICES = ("view", "inverseView", "viewProjection", "inverseViewProjection")
+	PROJECTION_MATRICES = ("projection", "inverseProjection", "viewProjection", "inverseViewProjection")
+	
 	def __init__(self):
 		"""
 		Constructor.
 		""" 
 		
+		# Cached matrices, computed when they are first needed.
+		self._matrices = {}
+		
 		# Camera's absolute position in world coordinates.
 		self.position = numpy.array(Camera.POSITION)
 		
@@ -43,12 +55,143 @@ class Camera(object):
 		# Width/height aspect of the view.
 		self.aspect = 1
 		
-		# Overall rotation applied to the camera.
-		self.rotation = numpy.identity(4)
+		# Overall rotation applied to the camera. The direction vectors above are always
+		# the default ones rotated by this quaternion.
+		self.orientation = Quaternion()
 		
 		# Perspective angle (in degrees).
 		self.fovAngle = Camera.FOVY
 		
+		# Size (width, height) of the viewport given to the last setLens() call, used by getScenePosition().
+		self.viewport = None
+		
+	@property
+	def position(self):
+		"""
+		Camera's absolute position in world coordinates.
+		"""
+		
+		return self._position
+	
+	@position.setter
+	def position(self, value):
+		self._position = value
+		self.__invalidate(Camera.VIEW_MATRICES)
+		
+	@property
+	def upVector(self):
+		"""
+		Camera's up vector. Should always be unitary.
+		"""
+		
+		return self._upVector
+	
+	@upVector.setter
+	def upVector(self, value):
+		self._upVector = value
+		self.__invalidate(Camera.VIEW_MATRICES)
+		
+	@property
+	def pointer(self):
+		"""
+		Vector that points to the direction that the camera is looking. Always unitary.
+		"""
+		
+		return self._pointer
+	
+	@pointer.setter
+	def pointer(self, value):
+		self._pointer = value
+		self.__invalidate(Camera.VIEW_MATRICES)
+		
+	@property
+	def near(self):
+		"""
+		Distance to the near clipping plane.
+		"""
+		
+		return self._near
+	
+	@near.setter
+	def near(self, value):
+		self._near = value
+		self.__invalidate(Camera.PROJECTION_MATRICES)
+		
+	@property
+	def far(self):
+		"""
+		Distance to the far clipping plane.
+		"""
+		
+		return self._far
+	
+	@far.setter
+	def far(self, value):
+		self._far = value
+		self.__invalidate(Camera.PROJECTION_MATRICES)
+		
+	@property
+	def aspect(self):
+		"""
+		Width/height aspect of the view.
+		"""
+		
+		return self._aspect
+	
+	@aspect.setter
+	def aspect(self, value):
+		self._aspect = value
+		self.__invalidate(Camera.PROJECTION_MATRICES)
+		
+	@property
+	def fovAngle(self):
+		"""
+		Perspective angle (in degrees).
+		"""
+		
+		return self._fovAngle
+	
+	@fovAngle.setter
+	def fovAngle(self, value):
+		self._fovAngle = value
+		self.__invalidate(Camera.PROJECTION_MATRICES)
+		
+	def __invalidate(self, names):
+		"""
+		Discards the cached matrices with the given names.
+		"""
+		
+		for name in names:
+			self._matrices.pop(name, None)
+		
+	def __matrix(self, name):
+		"""
+		Returns the cached matrix with the given name, computing it if needed.
+		The matrix is read-only, since it is shared by every caller.
+		"""
+		
+		matrix = self._matrices.get(name)
+		if matrix is not None:
+			return matrix
+		
+		if name == "view":
+			matrix = lookAtMatrix(self._position, self._position + self._pointer, self._upVector)
+		elif name == "projection":
+			matrix = perspectiveMatrix(self._fovAngle, self._aspect, self._near, self._far)
+		elif name == "viewProjection":
+			matrix = matrixByMatrix(self.__matrix("projection"), self.__matrix("view"))
+		elif name == "inverseView":
+			matrix = inverseMatrix(self.__matrix("view"))
+		elif name == "inverseProjection":
+			matrix = inverseMatrix(self.__matrix("projection"))
+		else:
+			matrix = inverseMatrix(self.__matrix("viewProjection"))
+		
+		matrix.flags.writeable = False
+		self._matrices[name] = matrix
+		
+		return matrix
+		
 	def setView(self):
 		"""
 		Sets the camera to the current lookAt position and rotation angle.
@@ -56,12 +199,7 @@ class Camera(object):
 		"""
 		
 		glMatrixMode(GL_MODELVIEW)
-		glLoadIdentity()
-		
-		gluLookAt(self.position[X], self.position[Y], self.position[Z],
-				  self.position[X] + self.pointer[X], self.position[Y] + self.pointer[Y],
-				  self.position[Z] + self.pointer[Z], self.upVector[X],
-				  self.upVector[Y], self.upVector[Z])
+		glLoadMatrixd(self.viewMatrix())
 		
 	def setLens(self, width=None, height=None):
 		"""
@@ -70,28 +208,109 @@ class Camera(object):
 		
 		if width != None and height != None:
 			self.aspect = float(width)/height
+			self.viewport = (width, height)
 		
 		glMatrixMode(GL_PROJECTION)
-		glLoadIdentity()
-		gluPerspective(self.fovAngle, self.aspect, self.near, self.far)
+		glLoadMatrixd(self.projectionMatrix())
+		
+	def viewMatrix(self):
+		"""
+		Returns the view matrix of the camera, computed on the CPU. The matrix is read-only.
+		"""
+		
+		return self.__matrix("view")
+		
+	def projectionMatrix(self):
+		"""
+		Returns the perspective projection matrix of the camera, computed on the CPU. The matrix is read-only.
+		"""
 		
-	def getScenePosition(self, x, y, depth=None):
+		return self.__matrix("projection")
+		
+	def viewProjectionMatrix(self):
+		"""
+		Returns the view matrix followed by the projection matrix. The matrix is read-only.
+		"""
+		
+		return self.__matrix("viewProjection")
+		
+	def inverseViewMatrix(self):
+		"""
+		Returns the inverse of the view matrix. The matrix is read-only.
+		"""
+		
+		return self.__matrix("inverseView")
+		
+	def inverseProjectionMatrix(self):
+		"""
+		Returns the inverse of the projection matrix. The matrix is read-only.
+		"""
+		
+		return self.__matrix("inverseProjection")
+		
+	def inverseViewProjectionMatrix(self):
+		"""
+		Returns the inverse of the view-projection matrix, which maps normalized device coordinates
+		to world coordinates. The matrix is read-only.
+		"""
+		
+		return self.__matrix("inverseViewProjection")
+		
+
+	def getRay(self, x, y, width, height):
+		"""
+		Returns the (origin, direction) of the ray that goes from the near plane through
+		the given window coordinates (in GL convention), for a viewport of the given size.
+		The direction is unitary. Everything is computed on the CPU.
+		"""
+		
+		inverse = self.inverseViewProjectionMatrix()
+		
+		ndcX = 2.0*x/width - 1
+		ndcY = 2.0*y/height - 1
+		
+		origin = multiplyByMatrix(numpy.array([ndcX, ndcY, -1.0, 1.0]), inverse)
+		direction = multiplyByMatrix(numpy.array([ndcX, ndcY, 1.0, 1.0]), inverse) - origin
+		direction /= lengthVector(direction)
+		
+		return origin, direction
+		
+	def project(self, point, width, height):
+		"""
+		Returns the window coordinates (x, y, depth), in GL convention, of a point in world coordinates
+		for a viewport of the given size, like gluProject() would. Everything is computed on the CPU.
+		"""
+		
+		clip = numpy.dot(numpy.append(numpy.asarray(point, dtype=float)[:3], 1.0), self.viewProjectionMatrix())
+		ndc = clip[:3] / clip[W]
+		
+		return numpy.array([(ndc[X] + 1) * 0.5 * width, (ndc[Y] + 1) * 0.5 * height, (ndc[Z] + 1) * 0.5])
+		
+	def getScenePosition(self, x, y, depth=None, width=None, height=None):
 		"""
 		Gets the coordinates of the mouse in the scene, on a plane
 		that is between the far and near planes, according to the depth value.
+		The plane is at a distance of (far - near) * depth from the camera.
+		width and height are the size of the viewport; the one given to setLens() is used if they are not given.
+		Everything is computed on the CPU.
 		"""
 		
 		if depth is None:
 			depth = Camera.DEFAULT_DEPTH
-
-		realFar = self.far
-		self.far = (self.far - self.near) * depth
-		self.setLens()
-		coordPosition = gluUnProject(x, y, 1)
-		self.far = realFar
-		self.setLens()
 		
-		return arrayToVector(coordPosition, 1)
+		if width is None or height is None:
+			width, height = self.viewport
+		
+		# Point of the far plane under the mouse, in eye coordinates.
+		ndcX = 2.0*x/width - 1
+		ndcY = 2.0*y/height - 1
+		farPoint = multiplyByMatrix(numpy.array([ndcX, ndcY, 1.0, 1.0]), self.inverseProjectionMatrix())
+		
+		# Points along the ray from the eye are proportional to it.
+		eyePoint = farPoint * ((self.far - self.near) * depth / self.far)
+		eyePoint[W] = 1
+		
+		return multiplyByMatrix(eyePoint, self.inverseViewMatrix())
 		
 	def reset(self):
 		"""
@@ -102,7 +321,7 @@ class Camera(object):
 		self.upVector = numpy.array(Camera.UPVECTOR)
 		self.pointer = numpy.array(Camera.POINTER)
 		self.leftVector = numpy.array(Camera.LEFT_VECTOR)
-		self.rotation = numpy.identity(4)
+		self.orientation = Quaternion()
 		self.resetFovy()
 		
 	def resetFovy(self):
@@ -114,36 +333,25 @@ class Camera(object):
 		
 	def rotate(self, rotation):
 		"""
-		Rotates the camera around the rotation center, given a rotation matrix.
+		Rotates the camera around the rotation center, given a rotation quaternion.
 		"""
 		
-		rotCenter = (self.position + self.pointer*(self.far-self.near)*Camera.DEFAULT_DEPTH)[:3]
-			
-		glPushMatrix()
-		glLoadIdentity()
-		glTranslate(*rotCenter)
-		glMultMatrixd(rotation)
-		glTranslate(*-rotCenter)
-		self.position = multiplyByMatrix(self.position)
-		self.upVector = multiplyByMatrix(self.upVector)
-		self.pointer = multiplyByMatrix(self.pointer)
-		self.leftVector = multiplyByMatrix(self.leftVector)
-		self.rotation = matrixByMatrix(rotation, self.rotation)
-		glPopMatrix()
+		rotCenter = self.position + self.pointer*(self.far-self.near)*Camera.DEFAULT_DEPTH
+		
+		self.position = rotCenter + rotation.rotateVector(self.position - rotCenter)
+		self.spin(rotation)
 		
 	def spin(self, rotation):
 		"""
-		Spins the camera around its position, given a rotation matrix.
+		Spins the camera around its position, given a rotation quaternion.
 		"""
 		
-		glPushMatrix()
-		glLoadIdentity()
-		glMultMatrixd(rotation)
-		self.upVector = multiplyByMatrix(self.upVector)
-		self.pointer = multiplyByMatrix(self.pointer)
-		self.leftVector = multiplyByMatrix(self.leftVector)
-		self.rotation = matrixByMatrix(rotation, self.rotation)
-		glPopMatrix()
+		self.orientation = (rotation * self.orientation).normalized()
+		
+		# Recomputing the vectors from the orientation avoids numerical drift.
+		self.upVector = self.orientation.rotateVector(Camera.UPVECTOR)
+		self.pointer = self.orientation.rotateVector(Camera.POINTER)
+		self.leftVector = self.orientation.rotateVector(Camera.LEFT_VECTOR)
 		
 	def zoomIn(self):
 		"""
@@ -206,63 +414,27 @@ class Camera(object):
 	def tiltUp(self):
 		"""
 		Tilts the camera up.
-		Warning: This method sets the matrix mode to GL_MODELVIEW.
 		"""
 		
-		glMatrixMode(GL_MODELVIEW)
-		
-		glPushMatrix()
-		glLoadIdentity()
-		glRotate(-2, self.leftVector[X], self.leftVector[Y], self.leftVector[Z])
-		rotation = glGetDouble(GL_MODELVIEW_MATRIX)
-		glPopMatrix()
-		
-		self.spin(rotation)
+		self.spin(Quaternion.fromAxisAngle(-2, self.leftVector[X], self.leftVector[Y], self.leftVector[Z]))
 	
 	def tiltDown(self):
 		"""
 		Tilts the camera down.
-		Warning: This method sets the matrix mode to GL_MODELVIEW.
 		"""
 		
-		glMatrixMode(GL_MODELVIEW)
-		
-		glPushMatrix()
-		glLoadIdentity()
-		glRotate(2, self.leftVector[X], self.leftVector[Y], self.leftVector[Z])
-		rotation = glGetDouble(GL_MODELVIEW_MATRIX)
-		glPopMatrix()
-		
-		self.spin(rotation)
+		self.spin(Quaternion.fromAxisAngle(2, self.leftVector[X], self.leftVector[Y], self.leftVector[Z]))
 	
 	def tiltLeft(self):
 		"""
 		Tilts the camera left.
-		Warning: This method sets the matrix mode to GL_MODELVIEW.
 		"""
 		
-		glMatrixMode(GL_MODELVIEW)
-		
-		glPushMatrix()
-		glLoadIdentity()
-		glRotate(2, self.upVector[X], self.upVector[Y], self.upVector[Z])
-		rotation = glGetDouble(GL_MODELVIEW_MATRIX)
-		glPopMatrix()
-		
-		self.spin(rotation)
+		self.spin(Quaternion.fromAxisAngle(2, self.upVector[X], self.upVector[Y], self.upVector[Z]))
 	
 	def tiltRight(self):
 		"""
 		Tilts the camera right.
-		Warning: This method sets the matrix mode to GL_MODELVIEW.
 		"""
 		
-		glMatrixMode(GL_MODELVIEW)
-		
-		glPushMatrix()
-		glLoadIdentity()
-		glRotate(-2, self.upVector[X], self.upVector[Y], self.upVector[Z])
-		rotation = glGetDouble(GL_MODELVIEW_MATRIX)
-		glPopMatrix()
-		
-		self.spin(rotation)
\ No newline at end of file
+		self.spin(Quaternion.fromAxisAngle(-2, self.upVector[X], self.upVector[Y], self.upVector[Z]))
@@ -0,0 +1,75 @@
+from plane import *
+from transform import *
+
+import numpy
+
+class Frustum(object):
+	"""
+	View frustum of the camera, defined by six planes whose normal vectors point inwards.
+	It is used to reject the objects that are outside of the view before any GL call.
+	"""
+
+	# Indexes of the planes.
+	LEFT, RIGHT, BOTTOM, TOP, NEAR, FAR = range(6)
+
+	def __init__(self):
+		"""
+		Constructor. The frustum must be updated from a camera before culling.
+		"""
+
+		# The six planes of the frustum.
+		self.planes = []
+
+		# Number of objects found visible and culled in the last call to cull().
+		self.visible = 0
+		self.culled = 0
+
+		self._normals = numpy.zeros((0, 3))
+		self._offsets = numpy.zeros(0)
+
+	def update(self, camera):
+		"""
+		Extracts the planes from the view and projection matrices of the given camera.
+		"""
+
+		# Clip coordinates are v * viewProjection. With the matrices in OpenGL layout,
+		# column i of the array gives the clip coordinate i.
+		viewProjection = matrixByMatrix(camera.projectionMatrix(), camera.viewMatrix())
+		columns = numpy.transpose(viewProjection)
+
+		coefficients = [columns[W] + columns[X], columns[W] - columns[X],
+						columns[W] + columns[Y], columns[W] - columns[Y],
+						columns[W] + columns[Z], columns[W] - columns[Z]]
+
+		self.planes = [Plane.fromCoefficients(*c) for c in coefficients]
+		self._normals = numpy.array([plane.normal for plane in self.planes])
+		self._offsets = numpy.array([plane.offset for plane in self.planes])
+
+	def cull(self, positions, radii):
+		"""
+		Returns the indexes of the given spheres that intersect the frustum.
+		positions is an (N,3) or (N,4) array with the centers of the spheres, and radii is
+		an array with their N radii. All the sphere-plane tests are done in a single pass.
+		"""
+
+		# A sphere is outside if it is entirely behind any of the planes.
+		distances = numpy.dot(positions[:, :3], numpy.transpose(self._normals)) + self._offsets
+		inside = (distances >= -numpy.asarray(radii)[:, numpy.newaxis]).all(axis=1)
+
+		rows = numpy.nonzero(inside)[0]
+
+		self.visible = len(rows)
+		self.culled = len(positions) - self.visible
+
+		return rows
+
+	def containsSphere(self, center, radius):
+		"""
+		Returns True if the given sphere intersects the frustum, and False otherwise.
+		"""
+
+		for plane in self.planes:
+			if plane.signedDistance(center) < -radius:
+				return False
+
+		return True
@@ -0,0 +1,358 @@
+from OpenGL.GL import *
+from math import pi
+
+import numpy
+
+class Mesh(object):
+	"""
+	This class represents the geometry of a primitive, built once and drawn as many times as needed.
+	The vertex data is uploaded to vertex buffer objects when they are available,
+	falling back to client-side vertex arrays otherwise.
+	"""
+
+	def __init__(self, mode, vertices, normals, indices):
+		"""
+		Constructor. mode is the GL primitive (GL_TRIANGLES or GL_LINES) used to draw the indices.
+		"""
+
+		self.mode = mode
+		self.vertices = numpy.ascontiguousarray(vertices, dtype=numpy.float32)
+		self.normals = numpy.ascontiguousarray(normals, dtype=numpy.float32)
+		self.indices = numpy.ascontiguousarray(indices, dtype=numpy.uint32)
+
+		# Vertex, normal and index buffer names, once uploaded.
+		self._buffers = None
+
+	@property
+	def triangleCount(self):
+		"""
+		Number of triangles drawn by the mesh (0 for line meshes).
+		"""
+
+		if self.mode != GL_TRIANGLES:
+			return 0
+
+		return len(self.indices) // 3
+
+	def upload(self):
+		"""
+		Uploads the mesh to vertex buffer objects, if they are supported.
+		It needs a current GL context, and it is called automatically by bind().
+		"""
+
+		if self._buffers is not None or not bool(glGenBuffers):
+			return
+
+		self._buffers = glGenBuffers(3)
+
+		glBindBuffer(GL_ARRAY_BUFFER, self._buffers[0])
+		glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+		glBindBuffer(GL_ARRAY_BUFFER, self._buffers[1])
+		glBufferData(GL_ARRAY_BUFFER, self.normals.nbytes, self.normals, GL_STATIC_DRAW)
+		glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+		glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self._buffers[2])
+		glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+		glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+	def release(self):
+		"""
+		Deletes the vertex buffer objects of the mesh.
+		"""
+
+		if self._buffers is not None:
+			glDeleteBuffers(3, self._buffers)
+			self._buffers = None
+
+	def bind(self):
+		"""
+		Sets the mesh as the current vertex array. Any number of draw() calls may follow.
+		"""
+
+		self.upload()
+
+		glEnableClientState(GL_VERTEX_ARRAY)
+		glEnableClientState(GL_NORMAL_ARRAY)
+
+		if self._buffers is not None:
+			glBindBuffer(GL_ARRAY_BUFFER, self._buffers[0])
+			glVertexPointer(3, GL_FLOAT, 0, None)
+			glBindBuffer(GL_ARRAY_BUFFER, self._buffers[1])
+			glNormalPointer(GL_FLOAT, 0, None)
+			glBindBuffer(GL_ARRAY_BUFFER, 0)
+			glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self._buffers[2])
+		else:
+			glVertexPointer(3, GL_FLOAT, 0, self.vertices)
+			glNormalPointer(GL_FLOAT, 0, self.normals)
+
+	def unbind(self):
+		"""
+		Unsets the mesh as the current vertex array.
+		"""
+
+		if self._buffers is not None:
+			glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+		glDisableClientState(GL_NORMAL_ARRAY)
+		glDisableClientState(GL_VERTEX_ARRAY)
+
+	def draw(self):
+		"""
+		Draws the mesh. It must be bound.
+		"""
+
+		if self._buffers is not None:
+			glDrawElements(self.mode, len(self.indices), GL_UNSIGNED_INT, None)
+		else:
+			glDrawElements(self.mode, len(self.indices), GL_UNSIGNED_INT, self.indices)
+
+	def drawInstanced(self, count):
+		"""
+		Draws count instances of the mesh in a single draw call. It must be bound,
+		and the per-instance attributes must be set by the caller.
+		"""
+
+		if self._buffers is not None:
+			glDrawElementsInstanced(self.mode, len(self.indices), GL_UNSIGNED_INT, None, count)
+		else:
+			glDrawElementsInstanced(self.mode, len(self.indices), GL_UNSIGNED_INT, self.indices, count)
+
+	def render(self):
+		"""
+		Binds, draws and unbinds the mesh.
+		"""
+
+		self.bind()
+		self.draw()
+		self.unbind()
+
+def cubeMesh():
+	"""
+	Returns the mesh of a solid cube with unit side, centered at the origin, like glutSolidCube(1).
+	"""
+
+	faceNormals = numpy.array([[1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1]], dtype=float)
+
+	vertices = []
+	normals = []
+	indices = []
+	for normal in faceNormals:
+		# Two unit vectors that span the face, with (u x v) pointing outwards.
+		u = numpy.roll(normal, 1)
+		v = numpy.cross(normal, u)
+
+		first = len(vertices)
+		for su, sv in ((-1, -1), (1, -1), (1, 1), (-1, 1)):
+			vertices.append((normal + su*u + sv*v) * 0.5)
+			normals.append(normal)
+		indices.extend([first, first + 1, first + 2, first, first + 2, first + 3])
+
+	return Mesh(GL_TRIANGLES, vertices, normals, indices)
+
+def wireCubeMesh():
+	"""
+	Returns the mesh of a wire cube with unit side, centered at the origin, like glutWireCube(1).
+	"""
+
+	vertices = numpy.array([[x, y, z] for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (-0.5, 0.5)])
+
+	# Edges connect vertices that differ in exactly one coordinate.
+	indices = []
+	for a in range(8):
+		for bit in (1, 2, 4):
+			if not a & bit:
+				indices.extend([a, a | bit])
+
+	return Mesh(GL_LINES, vertices, vertices * 2 / numpy.sqrt(3), indices)
+
+def _sphereVertices(slices, stacks):
+	"""
+	Returns the vertices of a unit sphere grid, with stacks + 1 rings of slices + 1 vertices each.
+	"""
+
+	theta = numpy.linspace(0, pi, stacks + 1)
+	phi = numpy.linspace(0, 2 * pi, slices + 1)
+
+	vertices = numpy.empty((stacks + 1, slices + 1, 3))
+	vertices[:, :, 0] = numpy.outer(numpy.sin(theta), numpy.cos(phi))
+	vertices[:, :, 1] = numpy.outer(numpy.sin(theta), numpy.sin(phi))
+	vertices[:, :, 2] = numpy.cos(theta)[:, numpy.newaxis]
+
+	return vertices.reshape(-1, 3)
+
+def sphereMesh(slices, stacks):
+	"""
+	Returns the mesh of a solid sphere with unit radius, centered at the origin,
+	like glutSolidSphere(1, slices, stacks).
+	"""
+
+	vertices = _sphereVertices(slices, stacks)
+
+	indices = []
+	for i in range(stacks):
+		for j in range(slices):
+			a = i * (slices + 1) + j
+			b = a + slices + 1
+			# The first and last stacks are triangle fans around the poles.
+			if i != 0:
+				indices.extend([a, b, a + 1])
+			if i != stacks - 1:
+				indices.extend([a + 1, b, b + 1])
+
+	return Mesh(GL_TRIANGLES, vertices, vertices, indices)
+
+def wireSphereMesh(slices, stacks):
+	"""
+	Returns the mesh of a wire sphere with unit radius, centered at the origin,
+	like glutWireSphere(1, slices, stacks).
+	"""
+
+	vertices = _sphereVertices(slices, stacks)
+
+	indices = []
+	for i in range(stacks + 1):
+		for j in range(slices):
+			a = i * (slices + 1) + j
+			# Lines along the stacks (except the poles) and along the slices.
+			if 0 < i < stacks:
+				indices.extend([a, a + 1])
+			if i < stacks:
+				indices.extend([a, a + slices + 1])
+
+	return Mesh(GL_LINES, vertices, vertices, indices)
+
+class GLStateCache(object):
+	"""
+	Remembers the bound mesh and the current color, so that the calls that would set them
+	to the values they already have are skipped. It counts the changes that were made.
+	Nothing else may change the bound vertex arrays or the color between reset() and finish().
+	"""
+
+	def __init__(self):
+		"""
+		Constructor.
+		"""
+
+		self.reset()
+
+	def reset(self):
+		"""
+		Forgets the current state, and resets the counters.
+		"""
+
+		self._mesh = None
+		self._color = None
+
+		# Number of mesh binds and color changes since the last reset.
+		self.meshChanges = 0
+		self.colorChanges = 0
+
+	def bindMesh(self, mesh):
+		"""
+		Binds the mesh, unless it is already bound.
+		"""
+
+		if mesh is self._mesh:
+			return
+
+		if self._mesh is not None:
+			self._mesh.unbind()
+		mesh.bind()
+
+		self._mesh = mesh
+		self.meshChanges += 1
+
+	def setColor(self, red, green, blue):
+		"""
+		Sets the current color, as RGB bytes, unless it is already set.
+		"""
+
+		color = (red, green, blue)
+		if color == self._color:
+			return
+
+		glColor3ub(red, green, blue)
+
+		self._color = color
+		self.colorChanges += 1
+
+	def finish(self):
+		"""
+		Unbinds the bound mesh. The state is unknown afterwards, so nothing is skipped until the next change.
+		"""
+
+		if self._mesh is not None:
+			self._mesh.unbind()
+
+		self._mesh = None
+		self._color = None
+
+	@property
+	def changes(self):
+		"""
+		Number of state changes made since the last reset.
+		"""
+
+		return self.meshChanges + self.colorChanges
+
+class GeometryCache(object):
+	"""
+	Cache of the meshes used to draw the scene. Each mesh is built only once, and it is
+	shared by all the objects, which are drawn by scaling it.
+	The cache belongs to a GL context, and it must be released while that context is current.
+	"""
+
+	# Default tessellation of the spheres.
+	SLICES = 20
+	STACKS = 20
+
+	def __init__(self):
+		"""
+		Constructor.
+		"""
+
+		# Dictionary of the meshes, indexed by (primitive, wire, slices, stacks).
+		self._meshes = {}
+
+	def cube(self, wire=False):
+		"""
+		Returns the mesh of a cube with unit side.
+		"""
+
+		key = ("cube", wire, 0, 0)
+		if key not in self._meshes:
+			if wire:
+				self._meshes[key] = wireCubeMesh()
+			else:
+				self._meshes[key] = cubeMesh()
+
+		return self._meshes[key]
+
+	def sphere(self, wire=False, slices=None, stacks=None):
+		"""
+		Returns the mesh of a sphere with unit radius.
+		"""
+
+		if slices is None:
+			slices = GeometryCache.SLICES
+		if stacks is None:
+			stacks = GeometryCache.STACKS
+
+		key = ("sphere", wire, slices, stacks)
+		if key not in self._meshes:
+			if wire:
+				self._meshes[key] = wireSphereMesh(slices, stacks)
+			else:
+				self._meshes[key] = sphereMesh(slices, stacks)
+
+		return self._meshes[key]
+
+	def release(self):
+		"""
+		Releases all the meshes of the cache.
+		"""
+
+		for mesh in self._meshes.values():
+			mesh.release()
+
+		self._meshes.clear()
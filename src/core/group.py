@@ -1,5 +1,10 @@
-from OpenGL.raw.GLUT import glutWireSphere, glutSolidSphere
+from OpenGL.GL import *
+from OpenGL.GLU import *
 from util import *
+from transform import *
+from bounding import *
+from objects import *
+from quaternion import *
 from arcball import *
 
 import numpy
@@ -14,22 +19,21 @@ class Group(object):
 		Creates a new Group object.
 		"""
 		
-		# List of objects in this group.
+		# List of objects in this group, and the index of each object in the list.
+		# The index makes membership tests and removals O(1).
 		self._objects = []
+		self._indices = {}
 		
 		# Center position of the group, in world coordinates.
 		self._centralPos = numpy.zeros(4)
 		self._centralPos[W] = 1
 		
 		# Rotation of the group.
-		self.rotation = numpy.identity(4)
+		self.orientation = Quaternion()
 		
 		# Radius of the sphere that bounds all the objects in the group.
 		self._radius = 0
 		
-		# Maximum distance between two objects in the group.
-		self._maxDistance = 0
-		
 		# Reference to the GLWidget object that contains this object.
 		self.arcBall = ArcBall(parent)
 		
@@ -56,6 +60,13 @@ class Group(object):
 		
 		return len(self._objects)
 	
+	def __contains__(self, object):
+		"""
+		Returns True if the object is in this group, in O(1).
+		"""
+		
+		return object in self._indices
+	
 	def leftClickPressEvent(self, x, y):
 		"""
 		Method called when the left mouse button is pressed.
@@ -72,10 +83,7 @@ class Group(object):
 		screenPos = gluProject(*self._centralPos[:3])
 		shift = arrayToVector(gluUnProject(x - self.fromCenter[X], y - self.fromCenter[Y], screenPos[Z]), 1) - self._centralPos
 		
-		for obj in self._objects:
-			obj.centralPosition += shift
-		
-		self._centralPos += shift
+		self.translate(shift)
 	
 	def rightClickEvent(self, x, y):
 		"""
@@ -97,17 +105,7 @@ class Group(object):
 			return
 		
 		r = self.arcBall.setFinalPt(x, y)
-		self.rotation = matrixByMatrix(r, self.rotation)
-		
-		glPushMatrix()
-		glLoadIdentity()
-		glTranslate(*self._centralPos[:3])
-		glMultMatrixd(r)
-		glTranslate(*-self._centralPos[:3])
-		for obj in self._objects:
-			obj.centralPosition = multiplyByMatrix(obj.centralPosition)
-			obj.rotation = matrixByMatrix(r, obj.rotation)
-		glPopMatrix()
+		self.rotate(r)
 		
 	def rightClickReleaseEvent(self, x, y):
 		"""
@@ -118,6 +116,63 @@ class Group(object):
 			return
 		
 		self.rotatingScene = False
+		
+	def translate(self, shift):
+		"""
+		Shifts all the objects in the group, and the group itself, by the given vector.
+		"""
+		
+		self.__transformObjects(translationMatrix(*shift[:3]))
+		
+		self._centralPos += shift
+		
+	def rotate(self, rotation):
+		"""
+		Rotates all the objects in the group around the group center, given a rotation quaternion.
+		"""
+		
+		self.orientation = (rotation * self.orientation).normalized()
+		self.__transformObjects(rotationAroundPoint(rotation.toMatrix(), self._centralPos), rotation)
+		
+	def __transformObjects(self, matrix, rotation=None):
+		"""
+		Applies the transformation matrix to the central positions of all objects in the group,
+		and premultiplies their orientations by the given rotation quaternion, in one vectorized pass.
+		"""
+		
+		if len(self._objects) == 0:
+			return
+		
+		store, rows = self.__storeRows()
+		
+		positions, orientations = transformBatch(store.positions[rows], store.orientations[rows], matrix, rotation)
+		
+		store.positions[rows] = positions
+		if rotation is not None:
+			store.orientations[rows] = orientations
+		store.modified()
+		
+	def __storeRows(self):
+		"""
+		Returns the SceneStore that holds the objects in the group, and an array with their rows.
+		All the objects in a group must belong to the same store.
+		"""
+		
+		store = self._objects[0].store
+		
+		return store, store.rows(self._objects)
+		
+	def setObjectsSize(self, size):
+		"""
+		Sets the size of all the objects in the group at once.
+		Note that it does not update the radius and center of the group.
+		"""
+		
+		if len(self._objects) == 0:
+			return
+		
+		store, rows = self.__storeRows()
+		store.setSizes(rows, size)
 	
 	@property
 	def centralPosition(self):
@@ -135,11 +190,7 @@ class Group(object):
 		
 		shift = value - self._centralPos
 		
-		for obj in self._objects:
-			obj.centralPosition += shift
-			obj.arcBall.centralPos += shift
-			
-		self._centralPos += shift
+		self.translate(shift)
 		self.arcBall.centralPos += shift
 	
 	@property
@@ -152,123 +203,152 @@ class Group(object):
 	
 	def add(self, object, autoSelect=True):
 		"""
-		Adds an object to the group.
+		Adds an object to the group, in O(1). Objects that are already in the group are ignored.
+		The bounding sphere of the group grows just enough to enclose the object as well.
 		"""
 		
-		newPts = None
-		for obj in self._objects:
-			dist = lengthVector(obj.centralPosition - object.centralPosition)
-			if dist > self._maxDistance:
-				newPts = [obj, object]
-				self._maxDistance = dist
-				
+		if object in self._indices:
+			return
+		
+		self.__append(object)
+		
 		if object.size > self.maxObjectSize:
 			self.maxObjectSize = object.size
-				
-		self._objects.append(object)
 		
 		if autoSelect:
 			object.select(True)
 		
+		center = object.centralPosition
+		
 		if len(self._objects) == 1:
-			self._radius = self._objects[0].radius
-			self._centralPos = self._objects[0].centralPosition.copy()
-			self.arcBall.centralPos = self._centralPos
-			self.arcBall.radius = self._radius
-			return
+			self._radius = object.radius
+			self._centralPos = center.copy()
+		else:
+			offset = center - self._centralPos
+			dist = lengthVector(offset)
+			
+			if dist + self._radius <= object.radius:
+				# The object encloses the whole group.
+				self._radius = object.radius
+				self._centralPos = center.copy()
+			elif dist + object.radius > self._radius:
+				# Smallest sphere that encloses both the group sphere and the object.
+				newRadius = (self._radius + dist + object.radius) * 0.5
+				self._centralPos = self._centralPos + offset * ((newRadius - self._radius) / dist)
+				self._radius = newRadius
+		
+		self.arcBall.centralPos = self._centralPos
+		self.arcBall.radius = self._radius
 		
-		# The group center remains the same.
-		if newPts is None:
-			dist = lengthVector(object.centralPosition - self._centralPos) + object.radius
-			if self._radius < dist:
-				self._radius = dist
-				self.arcBall.radius = dist
+	def addMany(self, objects, autoSelect=True):
+		"""
+		Adds several objects to the group at once, updating the group sphere only once at the end.
+		Objects that are already in the group are ignored.
+		"""
+		
+		newObjects = [obj for obj in objects if obj not in self._indices]
+		if not newObjects:
 			return
 		
-		# A new central position of the group is set.
-		self._centralPos = (newPts[0].centralPosition + newPts[1].centralPosition) * 0.5
-		self._radius = self._maxDistance * 0.5 + max(newPts[0].radius, newPts[1].radius)
+		for obj in newObjects:
+			self.__append(obj)
 		
-		# Iterates over objects in the group to verify if there are any objects outside the current sphere.
-		for obj in self._objects:
-			dist = lengthVector(obj.centralPosition - self._centralPos) + obj.radius
-			if dist > self._radius:
-				self._radius = dist
+		if autoSelect:
+			store = newObjects[0].store
+			store.setSelected(store.rows(newObjects), True)
 		
-		self.arcBall.centralPos = self._centralPos
-		self.arcBall.radius = self._radius
+		self.updateRadiusAndCenter()
 		
 	def remove(self, object, autoDeselect=True):
 		"""
 		Removes an object from the group.
+		The object is removed in O(1), but the group sphere is recomputed (see updateRadiusAndCenter()).
 		"""
 		
-		self._objects.remove(object)
+		self.__discard(object)
 		
 		if autoDeselect:
 			object.select(False)
 		
 		self.updateRadiusAndCenter()
 		
-	def removeAll(self):
+	def removeMany(self, objects, autoDeselect=True):
+		"""
+		Removes several objects from the group at once, updating the group sphere only once at the end.
+		Objects that are not in the group are ignored.
+		"""
+		
+		removedObjects = [obj for obj in objects if obj in self._indices]
+		if not removedObjects:
+			return
+		
+		for obj in removedObjects:
+			self.__discard(obj)
+		
+		if autoDeselect:
+			store = removedObjects[0].store
+			store.setSelected(store.rows(removedObjects), False)
+		
+		self.updateRadiusAndCenter()
+		
+	def clear(self, autoDeselect=True):
 		"""
 		Removes all objects from the group.
 		"""
 		
-		for obj in self._objects:
-			obj.select(False)
+		if autoDeselect and self._objects:
+			store, rows = self.__storeRows()
+			store.setSelected(rows, False)
 			
 		del self._objects[:]
+		self._indices.clear()
 		self._radius = 0
-		self._maxDistance = 0
 		self.maxObjectSize = 0
 		
+	def __append(self, object):
+		"""
+		Appends an object to the list of objects, indexing it.
+		"""
+		
+		self._indices[object] = len(self._objects)
+		self._objects.append(object)
+		
+	def __discard(self, object):
+		"""
+		Removes an object from the list of objects in O(1), moving the last object into its place.
+		"""
+		
+		index = self._indices.pop(object)
+		last = self._objects.pop()
+		
+		if last is not object:
+			self._objects[index] = last
+			self._indices[last] = index
+		
 	def updateRadiusAndCenter(self):
 		"""
 		Updates the radius and center of the group. Also updates the maxObjectSize attribute.
-		This method is O(n^2).
+		This method is O(n) (expected), see boundingSphere().
 		"""
 		
 		self._radius = 0
-		self._maxDistance = 0
-		
 		self.maxObjectSize = 0
-		for obj in self._objects:
-			if obj.size > self.maxObjectSize:
-				self.maxObjectSize = obj.size	
 		
 		if len(self._objects) == 0:
 			return
-		elif len(self._objects) == 1:
-			self._radius = self._objects[0].radius
-			self._centralPos = self._objects[0].centralPosition.copy()
-			self.arcBall.centralPos = self._centralPos
-			self.arcBall.radius = self._radius
-			return
 		
-		for a in self._objects:
-			for b in self._objects:
-				dist = lengthVector(a.centralPosition - b.centralPosition)
-				if dist > self._maxDistance:
-					pts = [a, b]
-					self._maxDistance = dist
+		store, rows = self.__storeRows()
 		
-		# A new central position of the group is set.
-		self._centralPos = (pts[0].centralPosition + pts[1].centralPosition) * 0.5
-		self._radius = self._maxDistance * 0.5 + max(pts[0].radius, pts[1].radius)
-		
-		# Iterates over objects in the group to verify if there are any objects outside the current sphere.
-		for obj in self._objects:
-			dist = lengthVector(obj.centralPosition - self._centralPos) + obj.radius
-			if dist > self._radius:
-				self._radius = dist
+		self.maxObjectSize = store.sizes[rows].max()
+		self._centralPos, self._radius = boundingSphere(store.positions[rows], store.radii[rows])
 		
 		self.arcBall.centralPos = self._centralPos
 		self.arcBall.radius = self._radius
 		
-	def render(self, pickingMode=False):
+	def render(self, geometry, pickingMode=False, tessellation=None):
 		"""
-		Renders the group effects. Does not render the objects.
+		Renders the group effects, using the meshes of the given GeometryCache. Does not render the objects.
+		tessellation is the (slices, stacks) of the bounding sphere, or None for the default one.
 		"""
 		
 		if len(self._objects) == 0:
@@ -277,7 +357,8 @@ class Group(object):
 		glPushMatrix()
 		if pickingMode:
 			glTranslate(*self._centralPos[:3])
-			glutSolidSphere(self._radius, 20, 20)
+			glScale(self._radius, self._radius, self._radius)
+			Sphere.mesh(geometry, False, tessellation).render()
 		else:
 			if self.rotatingScene:
 				alpha = 0.6
@@ -286,9 +367,11 @@ class Group(object):
 			
 			glDisable(GL_LIGHTING)
 			glTranslate(*self._centralPos[:3])
-			glMultMatrixf(self.rotation)
+			glMultMatrixd(self.orientation.toMatrix())
 			glColor4f(0.1, 0.3, 0.5, alpha)
-			glutWireSphere(self._radius + 0.005, 20, 20)
+			radius = self._radius + 0.005
+			glScale(radius, radius, radius)
+			Sphere.mesh(geometry, True, tessellation).render()
 			glEnable(GL_LIGHTING)
 		glPopMatrix()
-		
\ No newline at end of file
+		
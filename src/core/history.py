@@ -0,0 +1,343 @@
+from objects import *
+from quaternion import *
+from scenefile import *
+from transform import *
+
+from collections import deque
+
+import numpy
+
+class Command(object):
+	"""
+	Base class of the operations kept in the History. A command identifies its objects by their
+	store IDs, so that it still applies after other objects were added or removed.
+	"""
+
+	def __init__(self, ids):
+		"""
+		Constructor. ids are the IDs of the objects that the command changes.
+		"""
+
+		self.ids = numpy.array(ids, dtype=numpy.int64)
+
+	def undo(self, store):
+		"""
+		Virtual method that reverts the command on the store.
+		"""
+
+		pass
+
+	def redo(self, store):
+		"""
+		Virtual method that applies the command again on the store.
+		"""
+
+		pass
+
+	def merge(self, command):
+		"""
+		Merges a command that follows this one into it, if possible, returning True if it was merged.
+		"""
+
+		return False
+
+	def nbytes(self):
+		"""
+		Returns how many bytes the command data is using.
+		"""
+
+		return self.ids.nbytes
+
+	def _rows(self, store):
+		"""
+		Returns the rows of the objects of the command. Raises KeyError if any of them is not in the store.
+		"""
+
+		rows = store.rowsOf(self.ids)
+		if (rows < 0).any():
+			raise KeyError("There are no objects with some of the IDs of the command.")
+
+		return rows
+
+class TransformCommand(Command):
+	"""
+	Transformation of a set of objects: the same matrix applied to all their positions,
+	and the same rotation (if any) premultiplied to their orientations, as Group.translate() and Group.rotate() do.
+	"""
+
+	def __init__(self, ids, matrix, rotation=None):
+		"""
+		Constructor.
+		"""
+
+		super(TransformCommand, self).__init__(ids)
+
+		self.matrix = numpy.array(matrix)
+		self.rotation = rotation
+
+	@staticmethod
+	def translation(ids, shift):
+		"""
+		Creates the command of a translation by the given vector.
+		"""
+
+		return TransformCommand(ids, translationMatrix(*shift[:3]))
+
+	@staticmethod
+	def rotationAround(ids, rotation, center):
+		"""
+		Creates the command of a rotation around the given center, given a rotation quaternion.
+		"""
+
+		return TransformCommand(ids, rotationAroundPoint(rotation.toMatrix(), center), rotation)
+
+	def undo(self, store):
+		"""
+		Applies the inverse transformation to the objects, in one vectorized pass.
+		"""
+
+		rotation = None
+		if self.rotation is not None:
+			rotation = self.rotation.conjugate()
+
+		self.__apply(store, inverseMatrix(self.matrix), rotation)
+
+	def redo(self, store):
+		"""
+		Applies the transformation to the objects again, in one vectorized pass.
+		"""
+
+		self.__apply(store, self.matrix, self.rotation)
+
+	def nbytes(self):
+		"""
+		Returns how many bytes the command data is using.
+		"""
+
+		return self.ids.nbytes + self.matrix.nbytes
+
+	def __apply(self, store, matrix, rotation):
+		"""
+		Transforms the objects by the given matrix and rotation.
+		"""
+
+		rows = self._rows(store)
+
+		positions, orientations = transformBatch(store.positions[rows], store.orientations[rows], matrix, rotation)
+
+		store.positions[rows] = positions
+		if rotation is not None:
+			store.orientations[rows] = orientations
+		store.modified()
+
+class ResizeCommand(Command):
+	"""
+	Change of the size of a set of objects to a single new size.
+	"""
+
+	def __init__(self, ids, oldSizes, newSize):
+		"""
+		Constructor. oldSizes are the sizes of the objects before the change.
+		If they are all the same, only one of them is kept.
+		"""
+
+		super(ResizeCommand, self).__init__(ids)
+
+		oldSizes = numpy.asarray(oldSizes, dtype=float)
+		if len(oldSizes) > 0 and (oldSizes == oldSizes[0]).all():
+			oldSizes = oldSizes[:1].copy()
+
+		self.oldSizes = oldSizes
+		self.newSize = newSize
+
+	def undo(self, store):
+		"""
+		Restores the former sizes of the objects.
+		"""
+
+		store.setSizes(self._rows(store), self.oldSizes)
+
+	def redo(self, store):
+		"""
+		Sets the new size of the objects again.
+		"""
+
+		store.setSizes(self._rows(store), self.newSize)
+
+	def merge(self, command):
+		"""
+		Merges a resize of the same objects, so that dragging the size slider makes a single command.
+		"""
+
+		if not isinstance(command, ResizeCommand) or not numpy.array_equal(command.ids, self.ids):
+			return False
+
+		self.newSize = command.newSize
+
+		return True
+
+	def nbytes(self):
+		"""
+		Returns how many bytes the command data is using.
+		"""
+
+		return self.ids.nbytes + self.oldSizes.nbytes
+
+class CreateCommand(Command):
+	"""
+	Creation of a set of objects. Their data is kept to create them again, with the same IDs.
+	"""
+
+	def __init__(self, store, rows):
+		"""
+		Constructor. rows are the rows of the store where the objects were created.
+		"""
+
+		super(CreateCommand, self).__init__(store.ids[rows])
+
+		self.records = storeRecords(store, rows)
+
+	def undo(self, store):
+		"""
+		Removes the objects.
+		"""
+
+		store.removeRows(self._rows(store))
+
+	def redo(self, store):
+		"""
+		Creates the objects again, with the same IDs.
+		"""
+
+		addRecords(store, self.records, self.ids)
+
+	def nbytes(self):
+		"""
+		Returns how many bytes the command data is using.
+		"""
+
+		return self.ids.nbytes + self.records.nbytes
+
+class DeleteCommand(CreateCommand):
+	"""
+	Deletion of a set of objects. Their data is kept to create them again, with the same IDs.
+	It must be created before the objects are removed.
+	"""
+
+	def undo(self, store):
+		"""
+		Creates the objects again, with the same IDs.
+		"""
+
+		super(DeleteCommand, self).redo(store)
+
+	def redo(self, store):
+		"""
+		Removes the objects again.
+		"""
+
+		super(DeleteCommand, self).undo(store)
+
+class History(object):
+	"""
+	Journal of the commands applied to a SceneStore, which can be undone and redone.
+	The oldest commands are dropped when there are more than maxCommands of them,
+	or when their data takes more than maxBytes.
+	"""
+
+	# Default limits of the history.
+	MAX_COMMANDS = 100
+	MAX_BYTES = 64 * 1024 * 1024
+
+	def __init__(self, store, maxCommands=None, maxBytes=None):
+		"""
+		Constructor.
+		"""
+
+		self.store = store
+		self.maxCommands = maxCommands or History.MAX_COMMANDS
+		self.maxBytes = maxBytes or History.MAX_BYTES
+
+		# Commands that can be undone, the last one at the end, and commands that can be redone.
+		self._undo = deque()
+		self._redo = []
+
+		# Bytes used by the commands that can be undone.
+		self._bytes = 0
+
+	def record(self, command, merge=False):
+		"""
+		Records a command that was just applied. The commands that could be redone are discarded.
+		If merge is True, the command is merged into the last one when possible (see Command.merge()).
+		"""
+
+		self._redo = []
+
+		if merge and self._undo and self._undo[-1].merge(command):
+			return
+
+		self._undo.append(command)
+		self._bytes += command.nbytes()
+
+		while len(self._undo) > self.maxCommands or (self._bytes > self.maxBytes and len(self._undo) > 1):
+			self._bytes -= self._undo.popleft().nbytes()
+
+	def undo(self):
+		"""
+		Reverts the last command, returning it, or returns None if there is none.
+		"""
+
+		if not self._undo:
+			return None
+
+		command = self._undo.pop()
+		self._bytes -= command.nbytes()
+		command.undo(self.store)
+		self._redo.append(command)
+
+		return command
+
+	def redo(self):
+		"""
+		Applies the last undone command again, returning it, or returns None if there is none.
+		"""
+
+		if not self._redo:
+			return None
+
+		command = self._redo.pop()
+		command.redo(self.store)
+		self._undo.append(command)
+		self._bytes += command.nbytes()
+
+		return command
+
+	def canUndo(self):
+		"""
+		Returns True if there is a command to undo.
+		"""
+
+		return len(self._undo) > 0
+
+	def canRedo(self):
+		"""
+		Returns True if there is a command to redo.
+		"""
+
+		return len(self._redo) > 0
+
+	def clear(self):
+		"""
+		Discards all the commands.
+		"""
+
+		self._undo.clear()
+		self._redo = []
+		self._bytes = 0
+
+	def nbytes(self):
+		"""
+		Returns how many bytes the commands that can be undone are using.
+		"""
+
+		return self._bytes
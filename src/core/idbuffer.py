@@ -0,0 +1,179 @@
+from OpenGL.GL import *
+from objects import *
+
+import numpy
+
+class ColorIdPicker(object):
+	"""
+	Picks objects by rendering their IDs as flat colors into an offscreen framebuffer.
+	The framebuffer is only rendered again when the objects, the camera or the viewport change,
+	so repeated picks between scene changes cost a single small pixel read.
+	It needs framebuffer object support; check the supported attribute before using it.
+	"""
+
+	def __init__(self):
+		"""
+		Constructor. It needs a current GL context.
+		"""
+
+		# Indicates whether offscreen framebuffers are available in the current context.
+		self.supported = bool(glGenFramebuffers) and bool(glGenRenderbuffers)
+
+		# Number of times the ID framebuffer was rendered, and number of picks served.
+		self.renders = 0
+		self.picks = 0
+
+		self._framebuffer = None
+		self._renderbuffers = None
+		self._width, self._height = 0, 0
+
+		# Store version, camera matrices and viewport of the last render.
+		self._key = None
+
+		# IDs of the objects in each row of the store at the last render.
+		self._ids = None
+
+	def release(self):
+		"""
+		Deletes the framebuffer and its renderbuffers.
+		"""
+
+		if self._framebuffer is not None:
+			glDeleteRenderbuffers(2, self._renderbuffers)
+			glDeleteFramebuffers(1, [self._framebuffer])
+			self._framebuffer = None
+			self._renderbuffers = None
+
+		self._width, self._height = 0, 0
+		self._key = None
+		self._ids = None
+
+	def invalidate(self):
+		"""
+		Forces the ID framebuffer to be rendered again on the next pick.
+		"""
+
+		self._key = None
+
+	def pick(self, store, geometry, camera, x, y, width, height, radius=0):
+		"""
+		Returns the ID of the object at the given window coordinates (in GL convention),
+		or None if there is none. If radius is positive, the object nearest to the point in a
+		(2*radius + 1) pixels wide square is returned.
+		width and height are the size of the viewport.
+		"""
+
+		x, y = int(x), int(y)
+		if len(store) == 0 or not (0 <= x < width and 0 <= y < height):
+			return None
+
+		self.update(store, geometry, camera, width, height)
+		self.picks += 1
+
+		left, bottom = max(x - radius, 0), max(y - radius, 0)
+		right, top = min(x + radius + 1, width), min(y + radius + 1, height)
+
+		glBindFramebuffer(GL_FRAMEBUFFER, self._framebuffer)
+		glPushClientAttrib(GL_CLIENT_PIXEL_STORE_BIT)
+		glPixelStorei(GL_PACK_ALIGNMENT, 1)
+		data = glReadPixels(left, bottom, right - left, top - bottom, GL_RGB, GL_UNSIGNED_BYTE)
+		glPopClientAttrib()
+		glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+		pixels = numpy.frombuffer(data, dtype=numpy.uint8).reshape(top - bottom, right - left, 3).astype(int)
+		ids = pixels[:, :, 0] | (pixels[:, :, 1] << 8) | (pixels[:, :, 2] << 16)
+
+		hits = numpy.nonzero(ids)
+		if len(hits[0]) == 0:
+			return None
+
+		# Nearest hit pixel to the given point.
+		distances = (hits[0] + bottom - y) ** 2 + (hits[1] + left - x) ** 2
+		nearest = numpy.argmin(distances)
+
+		return int(self._ids[ids[hits[0][nearest], hits[1][nearest]] - 1])
+
+	def update(self, store, geometry, camera, width, height):
+		"""
+		Renders the ID framebuffer again if the store, the camera or the viewport changed since the last time.
+		"""
+
+		view = camera.viewMatrix()
+		projection = camera.projectionMatrix()
+
+		key = (store.version, width, height, tuple(view.ravel()), tuple(projection.ravel()))
+		if key == self._key:
+			return
+
+		self.__resize(width, height)
+		self.__render(store, geometry, view, projection)
+		self._key = key
+		self.renders += 1
+
+	def __resize(self, width, height):
+		"""
+		Creates the framebuffer, or resizes its renderbuffers, for the given viewport size.
+		"""
+
+		if self._framebuffer is None:
+			self._framebuffer = glGenFramebuffers(1)
+			self._renderbuffers = glGenRenderbuffers(2)
+		elif (width, height) == (self._width, self._height):
+			return
+
+		glBindRenderbuffer(GL_RENDERBUFFER, self._renderbuffers[0])
+		glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+		glBindRenderbuffer(GL_RENDERBUFFER, self._renderbuffers[1])
+		glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+		glBindRenderbuffer(GL_RENDERBUFFER, 0)
+
+		glBindFramebuffer(GL_FRAMEBUFFER, self._framebuffer)
+		glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self._renderbuffers[0])
+		glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self._renderbuffers[1])
+		glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+		self._width, self._height = width, height
+
+	def __render(self, store, geometry, view, projection):
+		"""
+		Renders every object of the store with its row + 1 encoded in the RGB bytes of its color.
+		The IDs of the rows are kept, so that the picks return IDs even if the rows change afterwards.
+		"""
+
+		self._ids = store.ids.copy()
+
+		ids = numpy.arange(1, len(store) + 1)
+		colors = numpy.empty((len(store), 3), dtype=numpy.uint8)
+		colors[:, 0] = ids & 0xFF
+		colors[:, 1] = (ids >> 8) & 0xFF
+		colors[:, 2] = (ids >> 16) & 0xFF
+
+		glPushAttrib(GL_ENABLE_BIT | GL_VIEWPORT_BIT | GL_COLOR_BUFFER_BIT)
+		glBindFramebuffer(GL_FRAMEBUFFER, self._framebuffer)
+		glViewport(0, 0, self._width, self._height)
+
+		# Colors must reach the framebuffer exactly as they are given.
+		glDisable(GL_LIGHTING)
+		glDisable(GL_BLEND)
+		glDisable(GL_DITHER)
+		glEnable(GL_DEPTH_TEST)
+
+		glClearColor(0, 0, 0, 0)
+		glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+		glMatrixMode(GL_PROJECTION)
+		glPushMatrix()
+		glLoadMatrixd(projection)
+		glMatrixMode(GL_MODELVIEW)
+		glPushMatrix()
+		glLoadMatrixd(view)
+
+		store.render(geometry, colors=colors)
+
+		glMatrixMode(GL_PROJECTION)
+		glPopMatrix()
+		glMatrixMode(GL_MODELVIEW)
+		glPopMatrix()
+
+		glBindFramebuffer(GL_FRAMEBUFFER, 0)
+		glPopAttrib()
@@ -0,0 +1,171 @@
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+from objects import *
+
+import ctypes
+import numpy
+
+# Vertex shader of the instanced path. Each instance has its own model matrix and color, and the
+# lighting mimics the fixed pipeline with GL_LIGHT0 as a directional light and GL_COLOR_MATERIAL.
+VERTEX_SHADER = """
+#version 120
+
+attribute mat4 instanceMatrix;
+attribute vec3 instanceColor;
+
+void main()
+{
+	gl_Position = gl_ModelViewProjectionMatrix * (instanceMatrix * gl_Vertex);
+
+	vec3 normal = normalize(gl_NormalMatrix * (mat3(instanceMatrix) * gl_Normal));
+	vec3 light = normalize(gl_LightSource[0].position.xyz);
+	float diffuse = max(dot(normal, light), 0.0);
+
+	vec3 color = instanceColor * (gl_LightModel.ambient.rgb + gl_LightSource[0].ambient.rgb
+								  + diffuse * gl_LightSource[0].diffuse.rgb);
+	gl_FrontColor = vec4(color, 1.0);
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 120
+
+void main()
+{
+	gl_FragColor = gl_Color;
+}
+"""
+
+class InstancedRenderer(object):
+	"""
+	Renders all the objects of a SceneStore with one instanced draw call per mesh
+	(cube/sphere, solid/wire), uploading the model matrices and colors of the objects
+	as per-instance attributes.
+	It needs instanced arrays and GLSL support; check the supported attribute before using it.
+	"""
+
+	def __init__(self):
+		"""
+		Constructor. It needs a current GL context.
+		"""
+
+		# Indicates whether instanced rendering is available in the current context.
+		self.supported = False
+
+		# Number of draw calls issued in the last call to render().
+		self.drawCalls = 0
+
+		self._program = None
+		self._buffers = None
+		self._matrixLocation = -1
+		self._colorLocation = -1
+
+		self.__setup()
+
+	def __setup(self):
+		"""
+		Compiles the shaders and creates the instance buffers, if instancing is supported.
+		"""
+
+		if not (bool(glDrawElementsInstanced) and bool(glVertexAttribDivisor)
+				and bool(glCreateShader) and bool(glGenBuffers)):
+			return
+
+		try:
+			self._program = shaders.compileProgram(shaders.compileShader(VERTEX_SHADER, GL_VERTEX_SHADER),
+												   shaders.compileShader(FRAGMENT_SHADER, GL_FRAGMENT_SHADER))
+		except (RuntimeError, GLError):
+			self._program = None
+			return
+
+		self._matrixLocation = glGetAttribLocation(self._program, "instanceMatrix")
+		self._colorLocation = glGetAttribLocation(self._program, "instanceColor")
+		self._buffers = glGenBuffers(2)
+
+		self.supported = True
+
+	def release(self):
+		"""
+		Deletes the shader program and the instance buffers.
+		"""
+
+		if self._buffers is not None:
+			glDeleteBuffers(2, self._buffers)
+			self._buffers = None
+
+		if self._program is not None:
+			glDeleteProgram(self._program)
+			self._program = None
+
+		self.supported = False
+
+	def render(self, store, geometry, rows=None, lod=None):
+		"""
+		Renders the objects in the given rows of the store (all of them, if rows is None),
+		using the meshes of the given GeometryCache.
+		If a LevelOfDetail object is given, it must have been updated for this store in the current frame,
+		and there is one draw call per level of detail as well.
+		"""
+
+		self.drawCalls = 0
+
+		if rows is None:
+			rows = numpy.arange(len(store))
+		else:
+			rows = numpy.asarray(rows, dtype=int)
+
+		if len(rows) == 0:
+			return
+
+		types = store.types[rows]
+		wire = store.wire[rows]
+		if lod is not None:
+			levels = lod.levels[rows]
+		else:
+			levels = -numpy.ones(len(rows), dtype=int)
+
+		glUseProgram(self._program)
+
+		for typeCode in range(len(OBJECT_CLASSES)):
+			for isWire in (False, True):
+				selection = (types == typeCode) & (wire == isWire)
+
+				for level in numpy.unique(levels[selection]):
+					meshRows = rows[selection & (levels == level)]
+					mesh = OBJECT_CLASSES[typeCode].mesh(geometry, isWire, lod and lod.tessellation(level))
+					self.__draw(mesh, store.modelMatrices(meshRows), store.colors[meshRows])
+
+		glUseProgram(0)
+
+	def __draw(self, mesh, matrices, colors):
+		"""
+		Draws one instance of the mesh for each model matrix and color.
+		"""
+
+		matrices = numpy.ascontiguousarray(matrices, dtype=numpy.float32)
+		colors = numpy.ascontiguousarray(colors, dtype=numpy.uint8)
+
+		# Model matrices take four attribute locations, one per column.
+		glBindBuffer(GL_ARRAY_BUFFER, self._buffers[0])
+		glBufferData(GL_ARRAY_BUFFER, matrices.nbytes, matrices, GL_STREAM_DRAW)
+		for i in range(4):
+			location = self._matrixLocation + i
+			glEnableVertexAttribArray(location)
+			glVertexAttribPointer(location, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(16 * i))
+			glVertexAttribDivisor(location, 1)
+
+		glBindBuffer(GL_ARRAY_BUFFER, self._buffers[1])
+		glBufferData(GL_ARRAY_BUFFER, colors.nbytes, colors, GL_STREAM_DRAW)
+		glEnableVertexAttribArray(self._colorLocation)
+		glVertexAttribPointer(self._colorLocation, 3, GL_UNSIGNED_BYTE, GL_TRUE, 3, None)
+		glVertexAttribDivisor(self._colorLocation, 1)
+		glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+		mesh.bind()
+		mesh.drawInstanced(len(matrices))
+		mesh.unbind()
+		self.drawCalls += 1
+
+		for location in [self._matrixLocation + i for i in range(4)] + [self._colorLocation]:
+			glVertexAttribDivisor(location, 0)
+			glDisableVertexAttribArray(location)
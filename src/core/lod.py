@@ -0,0 +1,104 @@
+from math import tan, radians
+from objects import *
+
+import numpy
+
+class LevelOfDetail(object):
+	"""
+	Selects the tessellation of each sphere according to the radius it has on the screen.
+	Levels are (minimum projected radius in pixels, slices, stacks) tuples, sorted by the radius.
+	"""
+
+	# Default levels of detail.
+	LEVELS = [(0, 6, 4), (4, 10, 8), (12, 14, 12), (40, 20, 20), (200, 32, 24)]
+
+	# Tessellation that every sphere used before the levels of detail, used to report the savings.
+	BASE_SLICES = 20
+	BASE_STACKS = 20
+
+	def __init__(self, levels=None):
+		"""
+		Constructor. Uses the default levels if none are given.
+		"""
+
+		# Level of each row of the store in the last update, or -1 for objects that have a single mesh.
+		self.levels = numpy.zeros(0, dtype=int)
+
+		# Number of solid sphere triangles drawn, and saved compared to the base tessellation, in the last update.
+		self.trianglesDrawn = 0
+		self.trianglesSaved = 0
+
+		self.setLevels(levels or LevelOfDetail.LEVELS)
+
+	def setLevels(self, levels):
+		"""
+		Sets the levels of detail, as (minimum projected radius in pixels, slices, stacks) tuples.
+		"""
+
+		self._levels = sorted(levels)
+		self._thresholds = numpy.array([level[0] for level in self._levels], dtype=float)
+		self._triangles = numpy.array([sphereTriangles(slices, stacks) for pixels, slices, stacks in self._levels])
+
+	def tessellation(self, level):
+		"""
+		Returns the (slices, stacks) of the given level, or None if the level is -1.
+		"""
+
+		if level < 0:
+			return None
+
+		return self._levels[level][1:]
+
+	def selectLevels(self, pixels):
+		"""
+		Returns the level index for each of the given projected radii, in pixels.
+		"""
+
+		return numpy.maximum(numpy.searchsorted(self._thresholds, pixels, side="right") - 1, 0)
+
+	def update(self, camera, viewportHeight, store, rows=None):
+		"""
+		Selects the levels of the spheres in the given rows of the store (all of them, if rows is None)
+		for the current camera. It must be called every frame before rendering the store with this object.
+		"""
+
+		self.levels = -numpy.ones(len(store), dtype=int)
+
+		if rows is None:
+			spheres = numpy.nonzero(store.types == SPHERE)[0]
+		else:
+			rows = numpy.asarray(rows, dtype=int)
+			spheres = rows[store.types[rows] == SPHERE]
+		pixels = projectedRadii(camera, viewportHeight, store.positions[spheres], store.radii[spheres])
+		self.levels[spheres] = self.selectLevels(pixels)
+
+		solid = numpy.logical_not(store.wire[spheres])
+		self.trianglesDrawn = int(self._triangles[self.levels[spheres[solid]]].sum())
+		self.trianglesSaved = int(solid.sum()) * sphereTriangles(LevelOfDetail.BASE_SLICES, LevelOfDetail.BASE_STACKS) \
+							  - self.trianglesDrawn
+
+	def sphereTessellation(self, camera, viewportHeight, center, radius):
+		"""
+		Returns the (slices, stacks) of a single sphere, such as the group bounding sphere.
+		"""
+
+		pixels = projectedRadii(camera, viewportHeight, numpy.array([center]), numpy.array([radius]))
+
+		return self.tessellation(self.selectLevels(pixels)[0])
+
+def sphereTriangles(slices, stacks):
+	"""
+	Returns how many triangles a solid sphere mesh with the given tessellation has.
+	"""
+
+	return 2 * slices * (stacks - 1)
+
+def projectedRadii(camera, viewportHeight, positions, radii):
+	"""
+	Estimates the radius, in pixels, that the given spheres have on the screen.
+	"""
+
+	diff = positions[:, :3] - camera.position[:3]
+	distances = numpy.maximum(numpy.sqrt((diff * diff).sum(axis=1)), camera.near)
+
+	return radii / (distances * tan(radians(camera.fovAngle) * 0.5)) * (viewportHeight * 0.5)
@@ -1,150 +1,751 @@
 from OpenGL.GL import *
-from OpenGL.raw.GLUT import *
+from geometry import *
 from util import *
+from quaternion import *
 from math import sqrt
 
+import numpy
+
+# Type codes of the objects kept in a SceneStore.
+CUBE = 0
+SPHERE = 1
+
+# Colors of the objects (RGB bytes), according to their selection status.
+SELECTED_COLOR = (0, 255, 0)
+UNSELECTED_COLOR = (255, 0, 0)
+
 class BaseObject(object):
 	"""
 	Base class for any object used in the GLWidget class.
+	Objects are thin views onto a row of a SceneStore, which holds the actual data.
 	"""
-	
-	def __init__(self, parent):
+
+	__slots__ = ("_store", "_row")
+
+	def __init__(self, parent, typeCode, size, wire=False, store=None):
 		"""
 		Constructor of the base class. Usually, it should be called in
 		the constructor of the inherited classes.
+		The object is added to the given store; if there is none, a new store is created for it.
 		"""
-		
-		self.rotation = []
-		self._centralPos = []
-		
-		# Radius of the bouding sphere that surrounds the object. 
-		self._radius = 0.0
-		
-		# Indicates whether the object is selected or not.
-		self.selected = False
-		
-		# Initial color of the object.
-		self.r, self.g, self.b = 1.0, 0.0, 0.0
-		
-		# Reference to the GLWidget object that contains this object.
-		self.parent = parent
-			
-	def render(self):
+
+		if store is None:
+			store = SceneStore(parent)
+
+		self._store = store
+		self._row = store.allocate(typeCode, size, wire)
+		store.attach(self._row, self)
+
+	@classmethod
+	def view(cls, store, row):
+		"""
+		Returns a new object that is a view onto an existing row of the given store.
+		"""
+
+		obj = cls.__new__(cls)
+		obj._store = store
+		obj._row = row
+
+		return obj
+
+	def render(self, geometry):
+		"""
+		Method called when the object should be drawn, using the meshes of the given GeometryCache.
+		"""
+
+		self._store.render(geometry, [self._row])
+
+	@staticmethod
+	def mesh(geometry, wire, tessellation=None):
 		"""
 		Virtual method that should be overridden in base-classes.
-		Method called when the object should be drawn.
+		Returns the mesh, from the given GeometryCache, that is scaled by the object size to draw it.
+		tessellation is the (slices, stacks) chosen by the level of detail, if any.
 		"""
-		
-		pass
-			
+
+		return None
+
 	def select(self, newStatus):
 		"""
 		Selects or unselects the object, depending on the newStatus argument.
 		Also changes the object's color according to the selection status.
 		"""
-		
-		self.selected = newStatus
-		if self.selected:
-			self.r, self.g, self.b = 0, 1, 0
-		else:
-			self.r, self.g, self.b = 1, 0, 0
-		
+
+		self._store.setSelected([self._row], newStatus)
+
+	@property
+	def store(self):
+		"""
+		SceneStore that holds the object's data.
+		"""
+
+		return self._store
+
+	@property
+	def row(self):
+		"""
+		Row of the object in its SceneStore. It may change when other objects are removed.
+		"""
+
+		return self._row
+
+	@property
+	def id(self):
+		"""
+		Identifier of the object in its SceneStore. Unlike the row, it never changes.
+		"""
+
+		return int(self._store.ids[self._row])
+
+	@property
+	def parent(self):
+		"""
+		Reference to the GLWidget object that contains this object.
+		"""
+
+		return self._store.parent
+
+	@property
+	def selected(self):
+		"""
+		Indicates whether the object is selected or not.
+		"""
+
+		return bool(self._store.selected[self._row])
+
+	@property
+	def color(self):
+		"""
+		Color of the object, as an (r, g, b) array of bytes.
+		"""
+
+		return self._store.colors[self._row]
+
+	@property
+	def wire(self):
+		"""
+		Indicates whether the object is drawn in wireframe or not.
+		"""
+
+		return bool(self._store.wire[self._row])
+
+	@wire.setter
+	def wire(self, value):
+		self._store.wire[self._row] = value
+		self._store.modified()
+
 	@property
 	def centralPosition(self):
-		return self._centralPos
-		
+		"""
+		Central position of the object, in world coordinates.
+		The array returned is a view onto the store, so it is only valid until the store changes size.
+		"""
+
+		return self._store.positions[self._row]
+
 	@centralPosition.setter
 	def centralPosition(self, value):
-		self._centralPos = value
-		
+		self._store.positions[self._row] = value
+		self._store.modified()
+
+	@property
+	def orientation(self):
+		"""
+		Rotation of the object, as a quaternion.
+		"""
+
+		return Quaternion.fromArray(self._store.orientations[self._row])
+
+	@orientation.setter
+	def orientation(self, value):
+		self._store.orientations[self._row] = value.asArray()
+		self._store.modified()
+
 	@property
 	def radius(self):
-		return self._radius
-		
-	@radius.setter
-	def radius(self, value):
-		self._radius = value
-		
+		"""
+		Radius of the bouding sphere that surrounds the object.
+		"""
+
+		return self._store.radii[self._row]
+
 	@property
 	def size(self):
-		raise Exception()
-	
+		return self._store.sizes[self._row]
+
 	@size.setter
 	def size(self, value):
-		raise Exception()
+		self._store.setSizes([self._row], value)
 
 class Cube(BaseObject):
 	"""
 	Class that defines a cube.
 	"""
-	
-	def __init__(self, parent, side=0.5, wire=False):
+
+	__slots__ = ()
+
+	def __init__(self, parent, side=0.5, wire=False, store=None):
 		"""
 		Constructor.
 		"""
-		
-		super(Cube, self).__init__(parent)
-		self._side = side
-		self.wire = wire
-		self.radius = side * sqrt(3) / 2.0
-		
-	def render(self):
-		"""
-		Renders the cube.
-		"""
-		
-		glPushMatrix()
-		glColor3f(self.r, self.g, self.b)
-		glTranslate(*self._centralPos[:3])
-		glMultMatrixf(self.rotation)
-		if self.wire:
-			glutWireCube(self._side)
-		else:
-			glutSolidCube(self._side)
-		glPopMatrix()
-		
-	@property	
-	def size(self):
-		return self._side
-		
-	@size.setter
-	def size(self, value):
-		self._side = value
-		self.radius = value * sqrt(3) / 2.0
-		
+
+		super(Cube, self).__init__(parent, CUBE, side, wire, store)
+
+	@staticmethod
+	def mesh(geometry, wire, tessellation=None):
+		"""
+		Returns the mesh of a cube with unit side.
+		"""
+
+		return geometry.cube(wire)
+
 class Sphere(BaseObject):
 	"""
 	Class that defines a sphere.
 	"""
-	
-	def __init__(self, parent, radius=0.5, wire=False):
+
+	__slots__ = ()
+
+	def __init__(self, parent, radius=0.5, wire=False, store=None):
 		"""
 		Constructor.
 		"""
-		
-		super(Sphere, self).__init__(parent)
-		self.wire = wire
-		self.radius = radius
-		
-	@property	
-	def size(self):
-		return self.radius
-		
-	@size.setter
-	def size(self, value):
-		self.radius = value
-		
-	def render(self):
-		"""
-		Renders the sphere.
-		"""
-		
-		glPushMatrix()
-		glColor(self.r, self.g, self.b)
-		glTranslate(*self._centralPos[:3])
-		glMultMatrixf(self.rotation)
-		if self.wire:
-			glutWireSphere(self._radius, 20, 20)
+
+		super(Sphere, self).__init__(parent, SPHERE, radius, wire, store)
+
+	@staticmethod
+	def mesh(geometry, wire, tessellation=None):
+		"""
+		Returns the mesh of a sphere with unit radius.
+		"""
+
+		if tessellation is None:
+			return geometry.sphere(wire)
+
+		return geometry.sphere(wire, *tessellation)
+
+	@property
+	def radius(self):
+		return self._store.radii[self._row]
+
+	@radius.setter
+	def radius(self, value):
+		self.size = value
+
+# Classes of the objects, indexed by their type codes.
+OBJECT_CLASSES = [Cube, Sphere]
+
+# Ratio between the radius of the bounding sphere and the size of the objects, indexed by their type codes.
+RADIUS_FACTORS = numpy.array([sqrt(3) / 2.0, 1.0])
+
+class SceneStore(object):
+	"""
+	Columnar storage for the objects of a scene. Each object is a row in a set of contiguous
+	arrays (positions, orientations, radii, sizes, colors, type codes, wire and selection flags),
+	so that operations over many objects can run as array operations.
+	Object views (Cube and Sphere) are only created when an object is accessed.
+	Every object gets an integer ID that stays the same until it is removed, and that is never reused.
+	"""
+
+	# Number of rows allocated when the store is created.
+	INITIAL_CAPACITY = 16
+
+	# Names of the per-object arrays.
+	COLUMNS = ("_positions", "_orientations", "_radii", "_sizes", "_colors", "_types", "_wire", "_selected", "_ids")
+
+	def __init__(self, parent=None):
+		"""
+		Constructor.
+		"""
+
+		# Reference to the GLWidget object that contains the objects.
+		self.parent = parent
+
+		# Number of objects in the store.
+		self._count = 0
+
+		# Change counters, used to keep the structures derived from the store up to date.
+		# version changes whenever the objects are added, removed, moved, rotated or resized,
+		# and structureVersion only when they are added or removed.
+		self.version = 0
+		self.structureVersion = 0
+
+		# Object views of each row, or None if the view was not created yet.
+		self._views = []
+
+		# Single precision is enough for everything but positions and sizes.
+		self._positions = numpy.zeros((0, 4))
+		self._orientations = numpy.zeros((0, 4), dtype=numpy.float32)
+		self._radii = numpy.zeros(0, dtype=numpy.float32)
+		self._sizes = numpy.zeros(0)
+		self._colors = numpy.zeros((0, 3), dtype=numpy.uint8)
+		self._types = numpy.zeros(0, dtype=numpy.uint8)
+		self._wire = numpy.zeros(0, dtype=bool)
+		self._selected = numpy.zeros(0, dtype=bool)
+		self._ids = numpy.zeros(0, dtype=numpy.int64)
+
+		# Row of every ID handed out so far, or -1 if its object was removed, and the next ID.
+		self._idRows = numpy.zeros(0, dtype=numpy.int64)
+		self._nextId = 0
+
+		self.reserve(SceneStore.INITIAL_CAPACITY)
+
+	def __len__(self):
+		"""
+		Returns how many objects there are in the store.
+		"""
+
+		return self._count
+
+	def __iter__(self):
+		"""
+		Iterates over the objects in the store.
+		"""
+
+		for row in range(self._count):
+			yield self[row]
+
+	def __getitem__(self, row):
+		"""
+		Returns the object in the given row.
+		"""
+
+		if row < 0:
+			row += self._count
+		if row < 0 or row >= self._count:
+			raise IndexError(row)
+
+		obj = self._views[row]
+		if obj is None:
+			obj = OBJECT_CLASSES[self._types[row]].view(self, row)
+			self._views[row] = obj
+
+		return obj
+
+	def __contains__(self, obj):
+		"""
+		Returns True if the object belongs to the store.
+		"""
+
+		return getattr(obj, "store", None) is self and 0 <= obj.row < self._count \
+			and self._views[obj.row] is obj
+
+	@property
+	def positions(self):
+		"""
+		(N,4) array with the central positions of the objects.
+		"""
+
+		return self._positions[:self._count]
+
+	@property
+	def orientations(self):
+		"""
+		(N,4) array with the (w, x, y, z) orientation quaternions of the objects.
+		"""
+
+		return self._orientations[:self._count]
+
+	@property
+	def radii(self):
+		"""
+		Array with the radii of the bounding spheres of the objects.
+		"""
+
+		return self._radii[:self._count]
+
+	@property
+	def sizes(self):
+		"""
+		Array with the sizes of the objects.
+		"""
+
+		return self._sizes[:self._count]
+
+	@property
+	def colors(self):
+		"""
+		(N,3) array with the (r, g, b) byte colors of the objects.
+		"""
+
+		return self._colors[:self._count]
+
+	@property
+	def types(self):
+		"""
+		Array with the type codes of the objects.
+		"""
+
+		return self._types[:self._count]
+
+	@property
+	def wire(self):
+		"""
+		Array with the wireframe flags of the objects.
+		"""
+
+		return self._wire[:self._count]
+
+	@property
+	def selected(self):
+		"""
+		Array with the selection flags of the objects.
+		"""
+
+		return self._selected[:self._count]
+
+	@property
+	def ids(self):
+		"""
+		Array with the IDs of the objects.
+		"""
+
+		return self._ids[:self._count]
+
+	def reserve(self, capacity):
+		"""
+		Makes sure that the store has room for at least capacity objects.
+		"""
+
+		if capacity <= len(self._radii):
+			return
+
+		for name in SceneStore.COLUMNS:
+			oldArray = getattr(self, name)
+			newArray = numpy.zeros((capacity,) + oldArray.shape[1:], dtype=oldArray.dtype)
+			newArray[:self._count] = oldArray[:self._count]
+			setattr(self, name, newArray)
+
+	def allocate(self, typeCode, size, wire=False):
+		"""
+		Adds a new row to the store, returning its index.
+		The object is placed in the origin, with no rotation and unselected.
+		"""
+
+		if self._count == len(self._radii):
+			self.reserve(max(SceneStore.INITIAL_CAPACITY, 2 * self._count))
+
+		self.__reserveIds(1)
+
+		row = self._count
+		self._count += 1
+		self._views.append(None)
+
+		self._ids[row] = self._nextId
+		self._idRows[self._nextId] = row
+		self._nextId += 1
+
+		self._positions[row] = (0, 0, 0, 1)
+		self._orientations[row] = (1, 0, 0, 0)
+		self._types[row] = typeCode
+		self._wire[row] = wire
+		self._selected[row] = False
+		self._colors[row] = UNSELECTED_COLOR
+		self.setSizes([row], size)
+		self.structureVersion += 1
+
+		return row
+
+	def extend(self, types, positions, orientations, sizes, colors=None, wire=None, ids=None):
+		"""
+		Adds many objects to the store at once, returning the array of their rows.
+		positions are (N,3) or (N,4) arrays, orientations (N,4) (w, x, y, z) quaternions and
+		colors (N,3) arrays of bytes. The objects are unselected, and solid unless wire is given.
+		Any array-like input works, including memory-mapped arrays; no object views are created.
+		New IDs are given to the objects, unless the IDs of removed objects are given to bring them back.
+		The store is left unchanged if the inputs are not valid.
+		"""
+
+		n = len(types)
+		first = self._count
+		last = first + n
+		rows = numpy.arange(first, last)
+
+		types = numpy.asarray(types)
+		if n > 0 and types.max() >= len(OBJECT_CLASSES):
+			raise ValueError("Unknown object type %d." % types.max())
+
+		newIds = ids is None
+		if newIds:
+			self.__reserveIds(n)
+			ids = numpy.arange(self._nextId, self._nextId + n)
+		else:
+			ids = numpy.asarray(ids, dtype=numpy.int64)
+			assert(((ids >= 0) & (ids < self._nextId)).all() and (self._idRows[ids] == -1).all())
+
+		self.reserve(max(SceneStore.INITIAL_CAPACITY, last, 2 * first))
+
+		# The columns are written past the last object first, so that a failure leaves no partial objects behind.
+		self._ids[first:last] = ids
+
+		positions = numpy.asarray(positions)
+		self._positions[first:last, :3] = positions[:, :3]
+		self._positions[first:last, W] = 1
+		self._orientations[first:last] = orientations
+		self._types[first:last] = types
+		self._selected[first:last] = False
+
+		if wire is None:
+			self._wire[first:last] = False
+		else:
+			self._wire[first:last] = wire
+
+		if colors is None:
+			self._colors[first:last] = UNSELECTED_COLOR
+		else:
+			self._colors[first:last] = colors
+
+		self._sizes[first:last] = sizes
+		self._radii[first:last] = self._sizes[first:last] * RADIUS_FACTORS[self._types[first:last]]
+
+		if newIds:
+			self._nextId += n
+		self._idRows[ids] = rows
+		self._views.extend([None] * n)
+		self._count = last
+
+		self.structureVersion += 1
+		self.modified()
+
+		return rows
+
+	def clear(self):
+		"""
+		Removes all the objects from the store. The removed objects must not be used afterwards.
+		"""
+
+		for obj in self._views:
+			if obj is not None:
+				obj._row = -1
+
+		self._idRows[self.ids] = -1
+		self._views = []
+		self._count = 0
+
+		self.structureVersion += 1
+		self.modified()
+
+	def __reserveIds(self, n):
+		"""
+		Makes sure that there is room for n more IDs in the ID-to-row array.
+		"""
+
+		if self._nextId + n <= len(self._idRows):
+			return
+
+		grow = max(SceneStore.INITIAL_CAPACITY, self._nextId, n)
+		self._idRows = numpy.concatenate((self._idRows, -numpy.ones(grow, dtype=numpy.int64)))
+
+	def attach(self, row, obj):
+		"""
+		Sets the object view of the given row.
+		"""
+
+		self._views[row] = obj
+
+	def remove(self, obj):
+		"""
+		Removes an object from the store in O(1), moving the last row into its place.
+		The removed object must not be used afterwards.
+		"""
+
+		assert(obj in self)
+
+		row = obj.row
+		last = self._count - 1
+
+		self._idRows[self._ids[row]] = -1
+
+		if row != last:
+			for name in SceneStore.COLUMNS:
+				array = getattr(self, name)
+				array[row] = array[last]
+
+			self._idRows[self._ids[row]] = row
+			self._views[row] = self._views[last]
+			if self._views[row] is not None:
+				self._views[row]._row = row
+
+		self._views.pop()
+		self._count -= 1
+		obj._row = -1
+
+		self.structureVersion += 1
+		self.modified()
+
+	def removeMany(self, objects):
+		"""
+		Removes several objects from the store in linear time, keeping the order of the remaining ones.
+		The removed objects must not be used afterwards.
+		"""
+
+		assert(all([obj in self for obj in objects]))
+
+		self.removeRows(self.rows(objects))
+
+	def removeRows(self, rows):
+		"""
+		Removes the objects in the given rows in linear time, keeping the order of the remaining ones.
+		Their object views, if any, must not be used afterwards.
+		"""
+
+		rows = numpy.asarray(rows, dtype=int)
+		if len(rows) == 0:
+			return
+
+		for row in rows:
+			if self._views[row] is not None:
+				self._views[row]._row = -1
+
+		kept = numpy.ones(self._count, dtype=bool)
+		kept[rows] = False
+		kept = numpy.nonzero(kept)[0]
+
+		self._idRows[self._ids[rows]] = -1
+
+		# Only the rows after the first removed one move.
+		first = rows.min()
+		kept = kept[kept > first]
+		count = first + len(kept)
+
+		for name in SceneStore.COLUMNS:
+			array = getattr(self, name)
+			array[first:count] = array[kept]
+
+		self._views[first:] = [self._views[row] for row in kept]
+		for row in range(first, count):
+			if self._views[row] is not None:
+				self._views[row]._row = row
+
+		self._count = count
+		self._idRows[self._ids[first:count]] = numpy.arange(first, count)
+
+		self.structureVersion += 1
+		self.modified()
+
+	def find(self, objectId):
+		"""
+		Returns the object with the given ID in O(1), or None if there is none.
+		"""
+
+		if not 0 <= objectId < self._nextId:
+			return None
+
+		row = self._idRows[objectId]
+		if row < 0:
+			return None
+
+		return self[row]
+
+	def rowsOf(self, ids):
+		"""
+		Returns an array with the rows of the objects with the given IDs, with -1 for the removed ones
+		and for the IDs that were never given.
+		"""
+
+		ids = numpy.asarray(ids, dtype=numpy.int64)
+		known = (ids >= 0) & (ids < self._nextId)
+		if known.all():
+			return self._idRows[ids]
+
+		rows = -numpy.ones(ids.shape, dtype=numpy.int64)
+		rows[known] = self._idRows[ids[known]]
+
+		return rows
+
+	def rows(self, objects):
+		"""
+		Returns an array with the rows of the given objects, which must belong to this store.
+		"""
+
+		return numpy.fromiter((obj.row for obj in objects), dtype=int, count=len(objects))
+
+	def setSizes(self, rows, size):
+		"""
+		Sets the size of the objects in the given rows, updating their bounding sphere radii.
+		"""
+
+		self._sizes[rows] = size
+		self._radii[rows] = self._sizes[rows] * RADIUS_FACTORS[self._types[rows]]
+		self.modified()
+
+	def modified(self):
+		"""
+		Signals that the objects changed. It must be called after writing
+		to the positions, orientations or wire flags of the store directly.
+		"""
+
+		self.version += 1
+
+	def setSelected(self, rows, newStatus):
+		"""
+		Selects or unselects the objects in the given rows, changing their colors accordingly.
+		"""
+
+		self._selected[rows] = newStatus
+		if newStatus:
+			self._colors[rows] = SELECTED_COLOR
 		else:
-			glutSolidSphere(self._radius, 20, 20)
-		glPopMatrix()
+			self._colors[rows] = UNSELECTED_COLOR
+
+	def nbytes(self):
+		"""
+		Returns how many bytes the object data is using.
+		"""
+
+		return sum([getattr(self, name).nbytes for name in SceneStore.COLUMNS]) + self._idRows.nbytes
+
+	def modelMatrices(self, rows):
+		"""
+		Returns the model matrices of the objects in the given rows, computed at once.
+		They scale the unit meshes by the object sizes, rotate and translate them.
+		"""
+
+		matrices = quaternionsToMatrices(self._orientations[rows])
+		matrices[:, :W, :W] *= self._sizes[rows][:, numpy.newaxis, numpy.newaxis]
+		matrices[:, W, :] = self._positions[rows]
+
+		return matrices
+
+	def render(self, geometry, rows=None, lod=None, colors=None, state=None):
+		"""
+		Renders the objects in the given rows (all of them, if rows is None), in that order,
+		using the meshes of the given GeometryCache.
+		If a LevelOfDetail object is given, it must have been updated for this store in the current frame.
+		If colors is given, it holds the RGB bytes used for each of the rows instead of the object colors.
+		The mesh and color are set through a GLStateCache (the given one, to count the changes),
+		so they are only set when they change from one object to the next.
+		GL_RESCALE_NORMAL (or GL_NORMALIZE) must be enabled, since the meshes are scaled.
+		"""
+
+		if state is None:
+			state = GLStateCache()
+
+		if rows is None:
+			rows = numpy.arange(self._count)
+		else:
+			rows = numpy.asarray(rows, dtype=int)
+
+		if colors is None:
+			colors = self._colors[rows]
+
+		# Plain integers are much faster to compare than numpy scalars.
+		colors = numpy.asarray(colors).tolist()
+
+		matrices = self.modelMatrices(rows)
+
+		for i, row in enumerate(rows):
+			tessellation = None
+			if lod is not None:
+				tessellation = lod.tessellation(lod.levels[row])
+
+			mesh = OBJECT_CLASSES[self._types[row]].mesh(geometry, self._wire[row], tessellation)
+			state.bindMesh(mesh)
+			state.setColor(*colors[i])
+
+			glPushMatrix()
+			glMultMatrixd(matrices[i])
+			mesh.draw()
+			glPopMatrix()
+
+		state.finish()
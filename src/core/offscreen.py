@@ -0,0 +1,155 @@
+import os
+
+# The platform must be chosen before PyOpenGL is imported for the first time.
+# EGL (with Mesa's surfaceless platform) works without a display; set PYOPENGL_PLATFORM=osmesa to use OSMesa instead.
+os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+from OpenGL.GL import *
+
+import ctypes
+import struct
+import zlib
+import numpy
+
+class OffscreenContext(object):
+	"""
+	GL context that renders into an offscreen surface, without any window or display.
+	It uses EGL pbuffers, or OSMesa if PYOPENGL_PLATFORM is set to osmesa before this module is imported.
+	"""
+
+	def __init__(self, width, height):
+		"""
+		Constructor. Creates the context and makes it current.
+		"""
+
+		self.width, self.height = width, height
+		self.platform = os.environ["PYOPENGL_PLATFORM"]
+
+		self._display = None
+		self._surface = None
+		self._context = None
+		self._buffer = None
+
+		if self.platform == "osmesa":
+			self.__createOSMesa()
+		else:
+			self.__createEGL()
+
+		glViewport(0, 0, width, height)
+
+	def __createEGL(self):
+		"""
+		Creates an EGL pbuffer surface and a desktop GL context for it.
+		"""
+
+		from OpenGL import EGL
+
+		self._display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+		major, minor = EGL.EGLint(), EGL.EGLint()
+		if not EGL.eglInitialize(self._display, ctypes.pointer(major), ctypes.pointer(minor)):
+			raise RuntimeError("Could not initialize the EGL display.")
+
+		attributes = [EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+					  EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+					  EGL.EGL_DEPTH_SIZE, 24,
+					  EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+					  EGL.EGL_NONE]
+		config = EGL.EGLConfig()
+		count = EGL.EGLint()
+		if not EGL.eglChooseConfig(self._display, (EGL.EGLint * len(attributes))(*attributes),
+								   ctypes.pointer(config), 1, ctypes.pointer(count)) or count.value == 0:
+			raise RuntimeError("No EGL configuration supports offscreen desktop GL rendering.")
+
+		surfaceAttributes = [EGL.EGL_WIDTH, self.width, EGL.EGL_HEIGHT, self.height, EGL.EGL_NONE]
+		self._surface = EGL.eglCreatePbufferSurface(self._display, config,
+													(EGL.EGLint * len(surfaceAttributes))(*surfaceAttributes))
+
+		EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+		self._context = EGL.eglCreateContext(self._display, config, EGL.EGL_NO_CONTEXT, None)
+		if not EGL.eglMakeCurrent(self._display, self._surface, self._surface, self._context):
+			raise RuntimeError("Could not make the EGL context current.")
+
+	def __createOSMesa(self):
+		"""
+		Creates an OSMesa context that renders into a buffer in main memory.
+		"""
+
+		from OpenGL import osmesa, arrays
+
+		self._context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+		if not self._context:
+			raise RuntimeError("Could not create the OSMesa context.")
+
+		self._buffer = arrays.GLubyteArray.zeros((self.height, self.width, 4))
+		if not osmesa.OSMesaMakeCurrent(self._context, self._buffer, GL_UNSIGNED_BYTE, self.width, self.height):
+			raise RuntimeError("Could not make the OSMesa context current.")
+
+	def release(self):
+		"""
+		Destroys the context and its surface.
+		"""
+
+		if self._context is None:
+			return
+
+		if self.platform == "osmesa":
+			from OpenGL import osmesa
+			osmesa.OSMesaDestroyContext(self._context)
+		else:
+			from OpenGL import EGL
+			EGL.eglMakeCurrent(self._display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+			EGL.eglDestroySurface(self._display, self._surface)
+			EGL.eglDestroyContext(self._display, self._context)
+			EGL.eglTerminate(self._display)
+
+		self._context = None
+
+	def readPixels(self):
+		"""
+		Returns the rendered image as a (height, width, 3) array of bytes, with the first row at the top.
+		"""
+
+		glFinish()
+		glPixelStorei(GL_PACK_ALIGNMENT, 1)
+		data = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+
+		pixels = numpy.frombuffer(data, dtype=numpy.uint8).reshape(self.height, self.width, 3)
+
+		return pixels[::-1]
+
+def writeImage(path, pixels):
+	"""
+	Writes a (height, width, 3) array of bytes to a PNG file, or to a PPM file if the path ends with .ppm.
+	"""
+
+	height, width = pixels.shape[:2]
+	pixels = numpy.ascontiguousarray(pixels, dtype=numpy.uint8)
+
+	imageFile = open(path, "wb")
+	try:
+		if path.lower().endswith(".ppm"):
+			imageFile.write(("P6\n%d %d\n255\n" % (width, height)).encode("ascii"))
+			imageFile.write(pixels.data)
+		else:
+			imageFile.write(_pngData(width, height, pixels))
+	finally:
+		imageFile.close()
+
+def _pngData(width, height, pixels):
+	"""
+	Returns the contents of an 8-bit RGB PNG file with the given pixels.
+	"""
+
+	# Each scanline starts with its filter type (0, no filter).
+	rows = numpy.zeros((height, width * 3 + 1), dtype=numpy.uint8)
+	rows[:, 1:] = pixels.reshape(height, width * 3)
+
+	def chunk(chunkType, data):
+		return struct.pack(">I", len(data)) + chunkType + data \
+			   + struct.pack(">I", zlib.crc32(chunkType + data) & 0xFFFFFFFF)
+
+	header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+
+	return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows.data)) \
+		   + chunk(b"IEND", b"")
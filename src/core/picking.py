@@ -0,0 +1,259 @@
+from objects import *
+from quaternion import *
+
+import numpy
+
+class BoundingVolumeHierarchy(object):
+	"""
+	Hierarchy of the bounding spheres of the objects in a SceneStore, used to find
+	the object hit by a ray on the CPU, without any GL call.
+	The objects are sorted along a Morton (Z-order) curve and grouped in leaves of LEAF_SIZE
+	consecutive objects; each level above bounds pairs of consecutive nodes of the level below.
+	The spheres are refit when the objects move, and the tree is rebuilt when objects are
+	added or removed, or when refitting made it too loose.
+	"""
+
+	# Number of objects in each leaf.
+	LEAF_SIZE = 8
+
+	# The tree is rebuilt when refitting makes its leaves this many times bigger than when it was built.
+	REBUILD_FACTOR = 2.0
+
+	def __init__(self, store):
+		"""
+		Constructor. The hierarchy is built lazily, by update().
+		"""
+
+		self.store = store
+
+		# Number of times the tree was built and refit.
+		self.builds = 0
+		self.refits = 0
+
+		# Rows of the store, in the order of the leaves.
+		self._order = numpy.zeros(0, dtype=int)
+
+		# (centers, radii) of the spheres of each level, from the leaves up to the root.
+		self._levels = []
+
+		self._version = None
+		self._structureVersion = None
+		self._builtLeafRadii = 0.0
+
+	def update(self):
+		"""
+		Brings the hierarchy up to date with the store, refitting or rebuilding it if needed.
+		"""
+
+		if self._structureVersion != self.store.structureVersion:
+			self.build()
+		elif self._version != self.store.version:
+			self.refit()
+			if self._leafRadii() > BoundingVolumeHierarchy.REBUILD_FACTOR * self._builtLeafRadii:
+				self.build()
+
+	def build(self):
+		"""
+		Sorts the objects along the Morton curve and computes the spheres of every level.
+		"""
+
+		self._order = numpy.argsort(mortonCodes(self.store.positions[:, :3]), kind="mergesort")
+		self.refit()
+		self._builtLeafRadii = self._leafRadii()
+		self._structureVersion = self.store.structureVersion
+		self.builds += 1
+
+	def refit(self):
+		"""
+		Recomputes the spheres of every level, keeping the order of the objects.
+		Each level is computed in a single vectorized pass.
+		"""
+
+		count = len(self._order)
+		self._levels = []
+		self._version = self.store.version
+		self.refits += 1
+
+		if count == 0:
+			return
+
+		positions = self.store.positions[self._order, :3]
+		radii = self.store.radii[self._order].astype(float)
+
+		# Leaves are centered at the mean of their objects, and bound all of them.
+		starts = numpy.arange(0, count, BoundingVolumeHierarchy.LEAF_SIZE)
+		sizes = numpy.diff(numpy.append(starts, count))
+		centers = numpy.add.reduceat(positions, starts, axis=0) / sizes[:, numpy.newaxis]
+		extents = _lengths(positions - numpy.repeat(centers, sizes, axis=0)) + radii
+		self._levels.append((centers, numpy.maximum.reduceat(extents, starts)))
+
+		while len(self._levels[-1][0]) > 1:
+			self._levels.append(_mergePairs(*self._levels[-1]))
+
+	def intersect(self, origin, direction):
+		"""
+		Returns the (row, distance) of the nearest object hit by the ray, or (None, inf) if there is none.
+		The direction must be unitary. Call update() first if the store may have changed.
+		"""
+
+		if len(self._levels) == 0:
+			return None, numpy.inf
+
+		# Descends the tree level by level, keeping the nodes whose spheres are hit by the ray.
+		nodes = numpy.zeros(1, dtype=int)
+		for level in range(len(self._levels) - 1, -1, -1):
+			centers, radii = self._levels[level]
+			nodes = nodes[raySpheres(origin, direction, centers[nodes], radii[nodes]) < numpy.inf]
+			if len(nodes) == 0:
+				return None, numpy.inf
+
+			if level > 0:
+				nodes = numpy.concatenate((2 * nodes, 2 * nodes + 1))
+				nodes = nodes[nodes < len(self._levels[level - 1][0])]
+
+		leafSize = BoundingVolumeHierarchy.LEAF_SIZE
+		indexes = (nodes[:, numpy.newaxis] * leafSize + numpy.arange(leafSize)).ravel()
+		rows = self._order[indexes[indexes < len(self._order)]]
+
+		distances = rayObjects(origin, direction, self.store, rows)
+		nearest = numpy.argmin(distances)
+		if distances[nearest] == numpy.inf:
+			return None, numpy.inf
+
+		return rows[nearest], distances[nearest]
+
+	def _leafRadii(self):
+		"""
+		Returns the sum of the radii of the leaves, used to measure how tight the tree is.
+		"""
+
+		if len(self._levels) == 0:
+			return 0.0
+
+		return self._levels[0][1].sum()
+
+def mortonCodes(points, bits=10):
+	"""
+	Returns the Morton codes of the given (N,3) points, interleaving the bits of their
+	coordinates quantized in the bounding box of all the points.
+	"""
+
+	if len(points) == 0:
+		return numpy.zeros(0, dtype=numpy.int64)
+
+	low = points.min(axis=0)
+	extent = points.max(axis=0) - low
+	extent[extent == 0] = 1
+
+	cells = ((points - low) / extent * ((1 << bits) - 1)).astype(numpy.int64)
+
+	codes = numpy.zeros(len(points), dtype=numpy.int64)
+	for bit in range(bits):
+		for axis in range(3):
+			codes |= ((cells[:, axis] >> bit) & 1) << (3 * bit + axis)
+
+	return codes
+
+def raySpheres(origin, direction, centers, radii):
+	"""
+	Returns the distance along the ray to the first hit of each of the given spheres, or inf if it misses.
+	If the ray starts inside of a sphere, the distance to where it leaves the sphere is returned.
+	"""
+
+	diff = centers[:, :3] - origin[:3]
+	b = numpy.dot(diff, direction[:3])
+	discriminant = b * b - (diff * diff).sum(axis=1) + numpy.asarray(radii, dtype=float) ** 2
+
+	distances = numpy.empty(len(diff))
+	distances.fill(numpy.inf)
+
+	hit = discriminant >= 0
+	root = numpy.sqrt(discriminant[hit])
+	near = b[hit] - root
+	far = b[hit] + root
+	distances[hit] = numpy.where(near >= 0, near, numpy.where(far >= 0, far, numpy.inf))
+
+	return distances
+
+def rayCubes(origin, direction, centers, orientations, sides):
+	"""
+	Returns the distance along the ray to the first hit of each of the given oriented cubes, or inf if it misses.
+	The ray is taken to the frame of each cube, where it is tested against the slabs of the faces.
+	"""
+
+	inverse = numpy.asarray(orientations, dtype=float) * [1, -1, -1, -1]
+	localOrigins = rotateVectors(inverse, origin[:3] - centers[:, :3])
+	localDirections = rotateVectors(inverse, numpy.tile(direction[:3], (len(inverse), 1)))
+	half = (numpy.asarray(sides, dtype=float) * 0.5)[:, numpy.newaxis]
+
+	oldSettings = numpy.seterr(divide="ignore", invalid="ignore")
+	try:
+		low = (-half - localOrigins) / localDirections
+		high = (half - localOrigins) / localDirections
+	finally:
+		numpy.seterr(**oldSettings)
+
+	# fmin/fmax ignore the NaNs of rays parallel to a face that lie exactly on it.
+	enter = numpy.fmin(low, high).max(axis=1)
+	leave = numpy.fmax(low, high).min(axis=1)
+
+	hit = (leave >= numpy.maximum(enter, 0))
+
+	return numpy.where(hit, numpy.where(enter >= 0, enter, leave), numpy.inf)
+
+def rayObjects(origin, direction, store, rows):
+	"""
+	Returns the distance along the ray to the first hit of each object in the given rows of the store,
+	or inf if it misses. Wire objects are tested as if they were solid.
+	"""
+
+	rows = numpy.asarray(rows, dtype=int)
+	distances = numpy.empty(len(rows))
+
+	cubes = store.types[rows] == CUBE
+	spheres = numpy.logical_not(cubes)
+
+	cubeRows = rows[cubes]
+	distances[cubes] = rayCubes(origin, direction, store.positions[cubeRows], store.orientations[cubeRows],
+								store.sizes[cubeRows])
+
+	sphereRows = rows[spheres]
+	distances[spheres] = raySpheres(origin, direction, store.positions[sphereRows], store.radii[sphereRows])
+
+	return distances
+
+def _lengths(vectors):
+	"""
+	Returns the lengths of the given (N,3) vectors.
+	"""
+
+	return numpy.sqrt((vectors * vectors).sum(axis=1))
+
+def _mergePairs(centers, radii):
+	"""
+	Returns the (centers, radii) of the spheres that bound each pair of consecutive given spheres.
+	If there is an odd number of spheres, the last one is kept as it is.
+	"""
+
+	pairs = len(radii) // 2
+	centerA, radiusA = centers[0:2*pairs:2], radii[0:2*pairs:2]
+	centerB, radiusB = centers[1:2*pairs:2], radii[1:2*pairs:2]
+
+	dist = _lengths(centerB - centerA)
+	radius = (dist + radiusA + radiusB) * 0.5
+	offset = (radius - radiusA) / numpy.where(dist > 0, dist, 1)
+	center = centerA + (centerB - centerA) * offset[:, numpy.newaxis]
+
+	# One of the spheres may already contain the other.
+	containsB = dist + radiusB <= radiusA
+	containsA = dist + radiusA <= radiusB
+	center[containsB] = centerA[containsB]
+	radius[containsB] = radiusA[containsB]
+	center[containsA] = centerB[containsA]
+	radius[containsA] = radiusB[containsA]
+
+	if len(radii) % 2:
+		center = numpy.vstack((center, centers[-1:]))
+		radius = numpy.append(radius, radii[-1])
+
+	return center, radius
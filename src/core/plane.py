@@ -18,6 +18,12 @@ class Plane(object):
 		self.point = point
 		self.perpVector = vector
 		
+		# Unitary normal vector and offset, such that dot(normal, p) + offset is the signed
+		# distance of the point p to the plane. perpVector is not used for that because it is scaled below.
+		self.normal = numpy.array(vector[:3], dtype=float)
+		self.normal /= lengthVector(self.normal)
+		self.offset = -numpy.dot(self.normal, point[:3])
+		
 		if self.perpVector[Z] != 0:
 			self.perpVector[X] /= self.perpVector[Z]
 			self.perpVector[Y] /= self.perpVector[Z]
@@ -40,4 +46,26 @@ class Plane(object):
 		
 		assert(len(point) == 4)
 		
-		return abs(numpy.dot(self.perpVector, (self.point - point))) < 0.0001
\ No newline at end of file
+		return abs(numpy.dot(self.perpVector, (self.point - point))) < 0.0001
+	
+	def signedDistance(self, point):
+		"""
+		Returns the signed distance of the given point to the plane,
+		positive on the side the normal vector points to.
+		"""
+		
+		return numpy.dot(self.normal, point[:3]) + self.offset
+	
+	@staticmethod
+	def fromCoefficients(a, b, c, d):
+		"""
+		Creates the plane of the points p that satisfy a*p[X] + b*p[Y] + c*p[Z] + d = 0,
+		with (a, b, c) as its normal vector.
+		"""
+		
+		vector = numpy.array([a, b, c, 0], dtype=float)
+		point = numpy.zeros(4)
+		point[:3] = vector[:3] * (-d / numpy.dot(vector, vector))
+		point[W] = 1
+		
+		return Plane(point, vector)
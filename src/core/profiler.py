@@ -0,0 +1,404 @@
+from OpenGL.GL import *
+from OpenGL.error import GLError
+from timeit import default_timer
+from collections import deque
+
+import numpy
+
+class GLCallCounter(object):
+	"""
+	Counts the GL calls made by a set of modules, replacing the gl* functions in their
+	namespaces by counting wrappers while it is installed. Calls of the functions that
+	submit geometry (glBegin, glDraw*) are counted as draw calls as well.
+	"""
+
+	# Functions that are counted as draw calls.
+	DRAW_FUNCTIONS = ("glBegin", "glDrawArrays", "glDrawElements", "glDrawArraysInstanced",
+					  "glDrawElementsInstanced", "glCallList", "glCallLists")
+
+	def __init__(self, modules):
+		"""
+		Constructor. The counter is not installed until install() is called.
+		"""
+
+		self.modules = modules
+
+		# Number of GL calls and draw calls since the last reset.
+		self.calls = 0
+		self.drawCalls = 0
+
+		# (module, name, function) of every replaced function.
+		self._originals = []
+
+	def install(self):
+		"""
+		Replaces the GL functions of the modules by counting wrappers.
+		Functions that the driver does not provide are false, and the modules test them
+		(e.g. bool(glGenBuffers)), so they are left as they are; they cannot be called anyway.
+		"""
+
+		if self._originals:
+			return
+
+		for module in self.modules:
+			for name, function in list(vars(module).items()):
+				if name.startswith("gl") and callable(function) and bool(function):
+					self._originals.append((module, name, function))
+					setattr(module, name, self.__wrap(name, function))
+
+	def uninstall(self):
+		"""
+		Restores the original GL functions of the modules.
+		"""
+
+		for module, name, function in self._originals:
+			setattr(module, name, function)
+
+		self._originals = []
+
+	def reset(self):
+		"""
+		Resets the counters.
+		"""
+
+		self.calls = 0
+		self.drawCalls = 0
+
+	def __wrap(self, name, function):
+		"""
+		Returns a wrapper of the GL function that counts its calls.
+		"""
+
+		counter = self
+		isDraw = name in GLCallCounter.DRAW_FUNCTIONS
+
+		def wrapper(*args, **kwargs):
+			counter.calls += 1
+			if isDraw:
+				counter.drawCalls += 1
+			return function(*args, **kwargs)
+
+		wrapper.__name__ = name
+		wrapper.__doc__ = function.__doc__
+
+		return wrapper
+
+class FrameProfiler(object):
+	"""
+	Measures where the time of each frame goes. A frame is split in named phases, each one
+	timed with the wall clock and, when the driver supports it, with GPU timer queries.
+	The last frames are kept for the rolling statistics and for the CSV export.
+	GPU times are read without stalling the pipeline, so they may show up a few frames late.
+	"""
+
+	# Number of frames kept for the export, and number of frames in the rolling statistics.
+	HISTORY = 1000
+	WINDOW = 120
+
+	# Edges of the frame time histogram bins, in milliseconds.
+	HISTOGRAM_EDGES = [0, 5, 10, 16.7, 25, 33.3, 50, 100, 200]
+
+	def __init__(self, counter=None):
+		"""
+		Constructor. If a GLCallCounter is given, the GL and draw calls of each frame are recorded as well.
+		"""
+
+		# Indicates whether frames are being measured.
+		self.enabled = False
+
+		# Indicates whether GPU timer queries are used. Set when enabled in a GL context.
+		self.gpuTiming = False
+
+		self.counter = counter
+
+		# Names of the phases, in the order they first appeared.
+		self.phases = []
+
+		# Records of the last frames, as dictionaries.
+		self.frames = deque(maxlen=FrameProfiler.HISTORY)
+
+		self._frameNumber = 0
+		self._frame = None
+		self._phase = None
+		self._phaseStart = 0
+		self._query = None
+
+		# Frames waiting for their GPU timer query results, and the query names that can be reused.
+		self._pending = deque()
+		self._freeQueries = []
+
+	def setEnabled(self, enabled):
+		"""
+		Starts or stops measuring the frames. It needs a current GL context to use the GPU timer queries.
+		"""
+
+		if enabled == self.enabled:
+			return
+
+		self.enabled = enabled
+
+		if enabled:
+			self.gpuTiming = self.__gpuTimingSupported()
+			if self.counter is not None:
+				self.counter.install()
+		else:
+			self.__discardFrames()
+			if self.counter is not None:
+				self.counter.uninstall()
+
+	def beginFrame(self):
+		"""
+		Starts measuring a new frame.
+		"""
+
+		if not self.enabled:
+			return
+
+		self.__collectGpuTimes()
+
+		if self.counter is not None:
+			self.counter.reset()
+
+		self._frameNumber += 1
+		self._frame = {"frame": self._frameNumber, "start": default_timer(), "cpu": {}, "gpu": {}, "queries": []}
+
+	def phase(self, name):
+		"""
+		Ends the current phase of the frame, if any, and starts the one with the given name.
+		"""
+
+		if self._frame is None:
+			return
+
+		self.__endPhase()
+
+		if name not in self.phases:
+			self.phases.append(name)
+
+		self._phase = name
+		self._phaseStart = default_timer()
+
+		if self.gpuTiming:
+			self._query = self.__newQuery()
+			glBeginQuery(GL_TIME_ELAPSED, self._query)
+			self._frame["queries"].append((name, self._query))
+
+	def endFrame(self):
+		"""
+		Ends the current frame, recording its measurements.
+		"""
+
+		if self._frame is None:
+			return
+
+		self.__endPhase()
+
+		frame = self._frame
+		self._frame = None
+
+		frame["total"] = default_timer() - frame["start"]
+		if self.counter is not None:
+			frame["calls"] = self.counter.calls
+			frame["drawCalls"] = self.counter.drawCalls
+
+		self.frames.append(frame)
+		if frame["queries"]:
+			self._pending.append(frame)
+
+	def flush(self):
+		"""
+		Waits for the GPU to finish, and reads the results of all the pending timer queries.
+		"""
+
+		if self._pending:
+			glFinish()
+			self.__collectGpuTimes()
+
+	def frameTimes(self):
+		"""
+		Returns an array with the duration of the frames in the rolling window, in seconds.
+		"""
+
+		window = list(self.frames)[-FrameProfiler.WINDOW:]
+
+		return numpy.array([frame["total"] for frame in window])
+
+	def fps(self):
+		"""
+		Returns the frames per second in the rolling window, measured between the starts of the frames.
+		"""
+
+		window = list(self.frames)[-FrameProfiler.WINDOW:]
+		if len(window) < 2:
+			return 0.0
+
+		elapsed = window[-1]["start"] - window[0]["start"]
+		if elapsed <= 0:
+			return 0.0
+
+		return (len(window) - 1) / elapsed
+
+	def histogram(self):
+		"""
+		Returns how many frames of the rolling window fall in each bin of HISTOGRAM_EDGES.
+		The last bin also counts the frames longer than the last edge.
+		"""
+
+		times = numpy.minimum(self.frameTimes() * 1000, FrameProfiler.HISTOGRAM_EDGES[-1])
+
+		return numpy.histogram(times, FrameProfiler.HISTOGRAM_EDGES)[0]
+
+	def averages(self):
+		"""
+		Returns a list of (phase, average CPU time, average GPU time) in the rolling window, in seconds.
+		The GPU time is None if it was not measured.
+		"""
+
+		window = list(self.frames)[-FrameProfiler.WINDOW:]
+
+		averages = []
+		for name in self.phases:
+			cpu = [frame["cpu"][name] for frame in window if name in frame["cpu"]]
+			gpu = [frame["gpu"][name] for frame in window if name in frame["gpu"]]
+			averages.append((name, cpu and sum(cpu) / len(cpu) or 0.0, gpu and sum(gpu) / len(gpu) or None))
+
+		return averages
+
+	def summary(self):
+		"""
+		Returns the lines of text shown in the performance overlay.
+		"""
+
+		times = self.frameTimes()
+		lines = []
+
+		if len(times) > 0:
+			lines.append("%.1f fps   frame %.2f ms (max %.2f ms)" % (self.fps(), times.mean() * 1000, times.max() * 1000))
+
+		for name, cpu, gpu in self.averages():
+			if gpu is None:
+				lines.append("%-10s cpu %7.2f ms" % (name, cpu * 1000))
+			else:
+				lines.append("%-10s cpu %7.2f ms   gpu %7.2f ms" % (name, cpu * 1000, gpu * 1000))
+
+		if self.frames and "calls" in self.frames[-1]:
+			lines.append("%d draw calls, %d GL calls" % (self.frames[-1]["drawCalls"], self.frames[-1]["calls"]))
+
+		return lines
+
+	def exportCsv(self, path):
+		"""
+		Writes the recorded frames to a CSV file, one line per frame, with times in milliseconds.
+		"""
+
+		header = ["frame", "start", "total_ms"]
+		header += ["%s_cpu_ms" % name for name in self.phases]
+		header += ["%s_gpu_ms" % name for name in self.phases]
+		header += ["draw_calls", "gl_calls"]
+
+		csvFile = open(path, "w")
+		try:
+			csvFile.write(",".join(header) + "\n")
+
+			for frame in self.frames:
+				values = [str(frame["frame"]), "%.6f" % frame["start"], "%.3f" % (frame["total"] * 1000)]
+				values += [self.__milliseconds(frame["cpu"], name) for name in self.phases]
+				values += [self.__milliseconds(frame["gpu"], name) for name in self.phases]
+				values += [str(frame.get("drawCalls", "")), str(frame.get("calls", ""))]
+				csvFile.write(",".join(values) + "\n")
+		finally:
+			csvFile.close()
+
+	def __endPhase(self):
+		"""
+		Ends the current phase, if any, recording its wall clock time.
+		"""
+
+		if self._phase is None:
+			return
+
+		if self.gpuTiming:
+			glEndQuery(GL_TIME_ELAPSED)
+
+		times = self._frame["cpu"]
+		times[self._phase] = times.get(self._phase, 0) + default_timer() - self._phaseStart
+		self._phase = None
+
+	def __discardFrames(self):
+		"""
+		Drops the current frame and the frames waiting for their GPU times,
+		returning their timer query names to be reused.
+		"""
+
+		frames = list(self._pending)
+		if self._frame is not None:
+			self.__endPhase()
+			frames.append(self._frame)
+
+		for frame in frames:
+			for name, query in frame["queries"]:
+				self._freeQueries.append(query)
+			frame["queries"] = []
+
+		self._frame = None
+		self._pending.clear()
+
+	def __gpuTimingSupported(self):
+		"""
+		Returns True if timer queries are available in the current context.
+		"""
+
+		if not (bool(glGenQueries) and bool(glBeginQuery) and bool(glGetQueryObjectuiv)):
+			return False
+
+		# Generating a query checks that they work. The names of earlier runs are reused.
+		if self._freeQueries:
+			return True
+
+		try:
+			self._freeQueries.append(glGenQueries(1)[0])
+		except (GLError, TypeError, IndexError):
+			return False
+
+		return True
+
+	def __newQuery(self):
+		"""
+		Returns an unused timer query name.
+		"""
+
+		if self._freeQueries:
+			return self._freeQueries.pop()
+
+		return glGenQueries(1)[0]
+
+	def __collectGpuTimes(self):
+		"""
+		Reads the results of the timer queries that are ready, without waiting for the others.
+		"""
+
+		while self._pending:
+			frame = self._pending[0]
+
+			for name, query in frame["queries"]:
+				if not glGetQueryObjectuiv(query, GL_QUERY_RESULT_AVAILABLE):
+					return
+
+			for name, query in frame["queries"]:
+				nanoseconds = glGetQueryObjectuiv(query, GL_QUERY_RESULT)
+				frame["gpu"][name] = frame["gpu"].get(name, 0) + nanoseconds * 1e-9
+				self._freeQueries.append(query)
+
+			frame["queries"] = []
+			self._pending.popleft()
+
+	@staticmethod
+	def __milliseconds(times, name):
+		"""
+		Returns the given time in milliseconds as a CSV field, or an empty field if there is none.
+		"""
+
+		if name not in times:
+			return ""
+
+		return "%.3f" % (times[name] * 1000)
@@ -0,0 +1,249 @@
+from math import sqrt, sin, cos, acos, radians
+from util import *
+
+import numpy
+
+# Quaternions are laid out as (w, x, y, z) when stored in arrays.
+QW = 0
+QX = 1
+QY = 2
+QZ = 3
+
+class Quaternion(object):
+	"""
+	This class represents a rotation as a unit quaternion.
+	"""
+
+	def __init__(self, w=1.0, x=0.0, y=0.0, z=0.0):
+		"""
+		Constructor. The default quaternion is the identity rotation.
+		"""
+
+		self.w = float(w)
+		self.x = float(x)
+		self.y = float(y)
+		self.z = float(z)
+
+	@staticmethod
+	def fromArray(array):
+		"""
+		Creates a quaternion from a (w, x, y, z) array.
+		"""
+
+		return Quaternion(array[QW], array[QX], array[QY], array[QZ])
+
+	@staticmethod
+	def fromAxisAngle(angle, x, y, z):
+		"""
+		Creates the quaternion that rotates angle degrees around the (x, y, z) axis,
+		the same rotation that glRotate(angle, x, y, z) would apply.
+		A null axis results in the identity rotation.
+		"""
+
+		length = sqrt(x*x + y*y + z*z)
+		if length < 1e-12:
+			return Quaternion()
+
+		halfAngle = radians(angle) * 0.5
+		s = sin(halfAngle) / length
+
+		return Quaternion(cos(halfAngle), x*s, y*s, z*s)
+
+	@staticmethod
+	def fromVectors(a, b):
+		"""
+		Creates the quaternion that rotates the direction of vector a onto the direction of vector b,
+		around the axis perpendicular to both. Opposite or null vectors result in the identity rotation.
+		"""
+
+		perpVector = crossProduct(a[:3], b[:3])
+		w = lengthVector(a[:3]) * lengthVector(b[:3]) + numpy.dot(a[:3], b[:3])
+
+		q = Quaternion(w, perpVector[X], perpVector[Y], perpVector[Z])
+		if q.norm() < 1e-12:
+			return Quaternion()
+
+		return q.normalized()
+
+	@staticmethod
+	def slerp(a, b, t):
+		"""
+		Spherical linear interpolation between quaternions a (t = 0) and b (t = 1).
+		"""
+
+		c = a.w*b.w + a.x*b.x + a.y*b.y + a.z*b.z
+
+		# Takes the shortest path.
+		if c < 0:
+			b = Quaternion(-b.w, -b.x, -b.y, -b.z)
+			c = -c
+
+		if c > 0.9995:
+			# The quaternions are too close, so a linear interpolation is enough.
+			ka, kb = 1 - t, t
+		else:
+			theta = acos(c)
+			ka = sin((1 - t) * theta) / sin(theta)
+			kb = sin(t * theta) / sin(theta)
+
+		return Quaternion(ka*a.w + kb*b.w, ka*a.x + kb*b.x, ka*a.y + kb*b.y, ka*a.z + kb*b.z).normalized()
+
+	def __mul__(self, other):
+		"""
+		Composes two rotations. (a * b) applies b first, then a,
+		just like the matrix product a x b.
+		"""
+
+		return Quaternion(self.w*other.w - self.x*other.x - self.y*other.y - self.z*other.z,
+						  self.w*other.x + self.x*other.w + self.y*other.z - self.z*other.y,
+						  self.w*other.y - self.x*other.z + self.y*other.w + self.z*other.x,
+						  self.w*other.z + self.x*other.y - self.y*other.x + self.z*other.w)
+
+	def __repr__(self):
+		"""
+		Returns the representation of the quaternion.
+		"""
+
+		return "Quaternion(%g, %g, %g, %g)" % (self.w, self.x, self.y, self.z)
+
+	def copy(self):
+		"""
+		Returns a copy of the quaternion.
+		"""
+
+		return Quaternion(self.w, self.x, self.y, self.z)
+
+	def asArray(self):
+		"""
+		Returns the (w, x, y, z) array representation of the quaternion.
+		"""
+
+		return numpy.array([self.w, self.x, self.y, self.z])
+
+	def norm(self):
+		"""
+		Returns the norm of the quaternion.
+		"""
+
+		return sqrt(self.w*self.w + self.x*self.x + self.y*self.y + self.z*self.z)
+
+	def normalize(self):
+		"""
+		Normalizes the quaternion in place, removing any numerical drift.
+		"""
+
+		n = self.norm()
+		self.w /= n
+		self.x /= n
+		self.y /= n
+		self.z /= n
+
+	def normalized(self):
+		"""
+		Returns a normalized copy of the quaternion.
+		"""
+
+		q = self.copy()
+		q.normalize()
+
+		return q
+
+	def conjugate(self):
+		"""
+		Returns the conjugate of the quaternion, which is the inverse rotation for unit quaternions.
+		"""
+
+		return Quaternion(self.w, -self.x, -self.y, -self.z)
+
+	def rotateVector(self, vector):
+		"""
+		Rotates a 3 or 4-component vector. The W component, if any, is kept.
+		"""
+
+		retVec = numpy.array(vector, dtype=float)
+		retVec[:3] = rotateVectors(self.asArray(), retVec[:3])
+
+		return retVec
+
+	def toMatrix(self):
+		"""
+		Expands the quaternion into a rotation matrix, in OpenGL's column-major order.
+		"""
+
+		return quaternionsToMatrices(self.asArray())
+
+def multiplyQuaternions(a, b):
+	"""
+	Multiplies (composes) arrays of (w, x, y, z) quaternions, broadcasting over the leading axes.
+	"""
+
+	a = numpy.asarray(a, dtype=float)
+	b = numpy.asarray(b, dtype=float)
+
+	aw, ax, ay, az = a[..., QW], a[..., QX], a[..., QY], a[..., QZ]
+	bw, bx, by, bz = b[..., QW], b[..., QX], b[..., QY], b[..., QZ]
+
+	retArray = numpy.empty(numpy.broadcast(aw, bw).shape + (4,))
+	retArray[..., QW] = aw*bw - ax*bx - ay*by - az*bz
+	retArray[..., QX] = aw*bx + ax*bw + ay*bz - az*by
+	retArray[..., QY] = aw*by - ax*bz + ay*bw + az*bx
+	retArray[..., QZ] = aw*bz + ax*by - ay*bx + az*bw
+
+	return retArray
+
+def normalizeQuaternions(quaternions):
+	"""
+	Normalizes an array of (w, x, y, z) quaternions in place.
+	"""
+
+	quaternions /= numpy.sqrt((quaternions * quaternions).sum(axis=-1))[..., numpy.newaxis]
+
+def rotateVectors(quaternions, vectors):
+	"""
+	Rotates arrays of 3-component vectors by arrays of (w, x, y, z) quaternions, broadcasting over the leading axes.
+	"""
+
+	quaternions = numpy.asarray(quaternions, dtype=float)
+	vectors = numpy.asarray(vectors, dtype=float)
+
+	w = quaternions[..., QW:QW+1]
+	u = quaternions[..., QX:QZ+1]
+
+	t = 2 * _cross(u, vectors)
+
+	return vectors + w*t + _cross(u, t)
+
+def quaternionsToMatrices(quaternions):
+	"""
+	Expands an array of (w, x, y, z) quaternions into rotation matrices, in OpenGL's column-major order.
+	"""
+
+	quaternions = numpy.asarray(quaternions, dtype=float)
+
+	w, x, y, z = quaternions[..., QW], quaternions[..., QX], quaternions[..., QY], quaternions[..., QZ]
+
+	retMatrix = numpy.zeros(quaternions.shape[:-1] + (4, 4))
+	retMatrix[..., X, X] = 1 - 2*(y*y + z*z)
+	retMatrix[..., X, Y] = 2*(x*y + w*z)
+	retMatrix[..., X, Z] = 2*(x*z - w*y)
+	retMatrix[..., Y, X] = 2*(x*y - w*z)
+	retMatrix[..., Y, Y] = 1 - 2*(x*x + z*z)
+	retMatrix[..., Y, Z] = 2*(y*z + w*x)
+	retMatrix[..., Z, X] = 2*(x*z + w*y)
+	retMatrix[..., Z, Y] = 2*(y*z - w*x)
+	retMatrix[..., Z, Z] = 1 - 2*(x*x + y*y)
+	retMatrix[..., W, W] = 1
+
+	return retMatrix
+
+def _cross(a, b):
+	"""
+	Cross product of arrays of 3-component vectors, broadcasting over the leading axes.
+	"""
+
+	retArray = numpy.empty(numpy.broadcast(a, b).shape)
+	retArray[..., X] = a[..., Y]*b[..., Z] - a[..., Z]*b[..., Y]
+	retArray[..., Y] = a[..., Z]*b[..., X] - a[..., X]*b[..., Z]
+	retArray[..., Z] = a[..., X]*b[..., Y] - a[..., Y]*b[..., X]
+
+	return retArray
@@ -0,0 +1,162 @@
+from OpenGL.GL import *
+from frustum import *
+from geometry import *
+from instancing import *
+from lod import *
+from objects import *
+from profiler import *
+from renderqueue import *
+
+import numpy
+
+class SceneRenderer(object):
+	"""
+	Renders the objects of a SceneStore, and optionally a selected Group, with a camera and lighting.
+	It holds everything that only exists to draw the scene (meshes, instancing, culling, levels of detail),
+	so that the same code draws the scene in the GlWidget and in the headless renderer.
+	"""
+
+	def __init__(self, profiler=None):
+		"""
+		Constructor. The frames are measured by the given FrameProfiler, if it is enabled.
+		"""
+
+		# Meshes shared by all objects. They are built once the GL context exists.
+		self.geometry = GeometryCache()
+
+		# Instanced renderer, created by initialize(). The per-object
+		# rendering path is used if instancing is disabled or not supported.
+		self.instancing = None
+		self.useInstancing = True
+
+		# Selects the tessellation of the spheres from their size on the screen.
+		# lod.trianglesSaved reports how many triangles it saved in the last frame.
+		self.lod = LevelOfDetail()
+
+		# View frustum used to cull the objects outside of the view. frustum.visible and
+		# frustum.culled give the number of objects drawn and skipped in the last frame.
+		self.frustum = Frustum()
+		self.useCulling = True
+
+		# Sorts the objects of the per-object rendering path to save GL state changes. renderQueue.stateChanges
+		# and renderQueue.stateChangesSaved give the changes made and saved in the last frame.
+		self.renderQueue = RenderQueue()
+
+		if profiler is None:
+			profiler = FrameProfiler()
+		self.profiler = profiler
+
+	def initialize(self, lighting):
+		"""
+		Sets the GL state used to render the scene, and the default light. It needs a current GL context.
+		"""
+
+		glEnable(GL_DEPTH_TEST)
+		glEnable(GL_BLEND)
+		glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+		# Lighting
+		lighting.enableLighting()
+		lighting.addLight(GL_LIGHT0)
+		lighting.setLight(GL_LIGHT0, [1.0, 1.0, 1.0, 0],
+									 [1.0, 1.0, 1.0, 1.0],
+									 [0, 0, 0, 1.0],
+									 [0.2, 0.2, 0.2, 1.0])
+
+		glEnable(GL_COLOR_MATERIAL)
+
+		# The cached meshes are scaled to the size of each object.
+		glEnable(GL_RESCALE_NORMAL)
+
+		self.instancing = InstancedRenderer()
+		glClearColor(0.6, 0.7, 0.9, 1)
+
+	def release(self):
+		"""
+		Releases the GL resources of the renderer. Its context must be current.
+		"""
+
+		if self.instancing is not None:
+			self.instancing.release()
+			self.instancing = None
+
+		self.geometry.release()
+
+	def render(self, camera, lighting, store, width, height, group=None):
+		"""
+		Renders the objects of the store, and the effects of the group if one is given,
+		in a viewport of the given size. The color and depth buffers are not cleared.
+		Warning: This method sets the matrix mode to GL_MODELVIEW.
+		"""
+
+		# Camera
+		self.profiler.phase("camera")
+		camera.setLens(width, height)
+		camera.setView()
+
+		# Lighting
+		self.profiler.phase("lighting")
+		lighting.render()
+
+		# Reference of the XYZ axis
+		self.profiler.phase("axis")
+		self.renderAxis(camera, height)
+
+		# Frustum culling
+		self.profiler.phase("culling")
+		rows = None
+		if self.useCulling:
+			self.frustum.update(camera)
+			rows = self.frustum.cull(store.positions, store.radii)
+
+		# Levels of detail for the current camera
+		self.profiler.phase("lod")
+		self.lod.update(camera, height, store, rows)
+
+		self.profiler.phase("objects")
+		if self.instancingActive():
+			self.instancing.render(store, self.geometry, rows, self.lod)
+		else:
+			self.renderQueue.render(store, self.geometry, rows, self.lod)
+
+		if group is not None:
+			self.profiler.phase("group")
+			tessellation = self.lod.sphereTessellation(camera, height, group.centralPosition, group.radius)
+			group.render(self.geometry, tessellation=tessellation)
+
+	def instancingActive(self):
+		"""
+		Returns True if the objects are drawn by the instanced renderer, and False if they are drawn one by one.
+		"""
+
+		return self.useInstancing and self.instancing is not None and self.instancing.supported
+
+	def renderAxis(self, camera, height):
+		"""
+		Creates a small white wire sphere and the XYZ axis in the 0 coordinate, just for reference.
+		"""
+
+		# White wire
+		glColor(1, 1, 1)
+		glPushMatrix()
+		glScale(0.1, 0.1, 0.1)
+		tessellation = self.lod.sphereTessellation(camera, height, numpy.array([0, 0, 0, 1]), 0.1)
+		Sphere.mesh(self.geometry, True, tessellation).render()
+		glPopMatrix()
+
+		# XYZ axis
+		glLineWidth(2)
+		glDisable(GL_LIGHTING)
+		glBegin(GL_LINES)
+		glColor(1, 0, 0)
+		glVertex3f(0, 0, 0)
+		glVertex3f(1, 0, 0)
+		glColor(0, 1, 0)
+		glVertex3f(0, 0, 0)
+		glVertex3f(0, 1, 0)
+		glColor(0, 0, 1)
+		glVertex3f(0, 0, 0)
+		glVertex3f(0, 0, 1)
+		glEnd()
+		glEnable(GL_LIGHTING)
+		glLineWidth(1)
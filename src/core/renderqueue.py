@@ -0,0 +1,78 @@
+from geometry import *
+from objects import *
+
+import numpy
+
+class RenderQueue(object):
+	"""
+	Sorts the objects drawn by the per-object rendering path by mesh (type, wire/solid mode and
+	level of detail) and then by color, so that each mesh is bound once and the color only changes
+	between runs of objects with different colors. The state is set through a GLStateCache.
+	After each frame, stateChanges is the number of mesh binds and color changes made, and
+	stateChangesSaved how many more the objects would have needed in the order of the store.
+	"""
+
+	def __init__(self):
+		"""
+		Constructor.
+		"""
+
+		self.state = GLStateCache()
+
+		# Indicates whether the objects are sorted before drawing them.
+		self.sorting = True
+
+		# State changes made, and saved by the sorting, in the last frame.
+		self.stateChanges = 0
+		self.stateChangesSaved = 0
+
+	def render(self, store, geometry, rows=None, lod=None):
+		"""
+		Renders the objects in the given rows of the store (all of them, if rows is None),
+		sorted unless sorting is disabled, and updates the counters. See SceneStore.render().
+		Objects with the same mesh and color keep their order.
+		"""
+
+		if rows is None:
+			rows = numpy.arange(len(store))
+		else:
+			rows = numpy.asarray(rows, dtype=int)
+
+		meshKeys, colorKeys = self.__keys(store, rows, lod)
+		unsortedChanges = countChanges(meshKeys) + countChanges(colorKeys)
+
+		if self.sorting:
+			rows = rows[numpy.lexsort((colorKeys, meshKeys))]
+
+		self.state.reset()
+		store.render(geometry, rows, lod, state=self.state)
+
+		self.stateChanges = self.state.changes
+		self.stateChangesSaved = unsortedChanges - self.stateChanges
+
+	def __keys(self, store, rows, lod):
+		"""
+		Returns the mesh and color sort keys of the given rows, as integer arrays.
+		"""
+
+		levels = numpy.zeros(len(rows), dtype=int)
+		if lod is not None:
+			levels = lod.levels[rows] + 1
+
+		meshKeys = (store.types[rows].astype(int) * 2 + store.wire[rows]) * 256 + levels
+
+		colors = store.colors[rows].astype(int)
+		colorKeys = (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+
+		return meshKeys, colorKeys
+
+def countChanges(keys):
+	"""
+	Returns how many times the state has to be set to draw objects with the given state keys in order,
+	i.e., the number of runs of equal consecutive keys.
+	"""
+
+	if len(keys) == 0:
+		return 0
+
+	return 1 + int(numpy.count_nonzero(keys[1:] != keys[:-1]))
@@ -0,0 +1,209 @@
+from objects import *
+
+import os
+import struct
+import numpy
+
+# Binary scene files hold a fixed header followed by one fixed-width record per object:
+#
+#   magic      8 bytes   "JOAQSCN\0"
+#   version    uint16    SCENE_VERSION
+#   reserved   uint16
+#   recordSize uint32    size of each record, in bytes
+#   count      uint64    number of records
+#
+# The fields of the records are described by RECORD_FIELDS, all little endian.
+# Later versions may only append fields to the records, so that older readers can skip them.
+
+SCENE_MAGIC = b"JOAQSCN\0"
+SCENE_VERSION = 1
+
+HEADER = struct.Struct("<8sHHIQ")
+
+# Fields of the version 1 records.
+RECORD_FIELDS = [("type", "u1"), ("wire", "u1"), ("position", "<f8", 3), ("orientation", "<f4", 4),
+				 ("size", "<f8"), ("color", "u1", 3)]
+
+RECORD = numpy.dtype(RECORD_FIELDS)
+
+# Number of records written or copied at once.
+CHUNK_SIZE = 65536
+
+class SceneFileError(Exception):
+	"""
+	Raised when a file is not a scene file, was written by a newer, incompatible version, or is corrupt.
+	"""
+
+	pass
+
+class SceneWriter(object):
+	"""
+	Writes a scene file in chunks of objects, so that the whole scene never has to be copied at once.
+	The number of objects is written in the header when the writer is closed.
+	"""
+
+	def __init__(self, path):
+		"""
+		Constructor. Creates the file, replacing any existing one.
+		"""
+
+		self.count = 0
+
+		self._file = open(path, "wb")
+		self._file.write(HEADER.pack(SCENE_MAGIC, SCENE_VERSION, 0, RECORD.itemsize, 0))
+
+	def write(self, types, positions, orientations, sizes, colors, wire):
+		"""
+		Appends objects to the file. The arguments are arrays with one row per object,
+		like the columns of a SceneStore; positions may have 3 or 4 columns.
+		"""
+
+		records = makeRecords(types, positions, orientations, sizes, colors, wire)
+
+		self._file.write(records.data)
+		self.count += len(records)
+
+	def writeStore(self, store, rows=None):
+		"""
+		Appends the objects in the given rows of the store (all of them, if rows is None), a chunk at a time.
+		The selection is not saved, so selected objects are written with the color they have when unselected.
+		"""
+
+		if rows is None:
+			rows = numpy.arange(len(store))
+
+		for start in range(0, len(rows), CHUNK_SIZE):
+			records = storeRecords(store, rows[start:start + CHUNK_SIZE])
+
+			self._file.write(records.data)
+			self.count += len(records)
+
+	def close(self):
+		"""
+		Writes the number of objects in the header and closes the file.
+		"""
+
+		if self._file is None:
+			return
+
+		self._file.seek(0)
+		self._file.write(HEADER.pack(SCENE_MAGIC, SCENE_VERSION, 0, RECORD.itemsize, self.count))
+		self._file.close()
+		self._file = None
+
+def makeRecords(types, positions, orientations, sizes, colors, wire):
+	"""
+	Returns an array of scene records built from arrays with one row per object,
+	like the columns of a SceneStore; positions may have 3 or 4 columns.
+	"""
+
+	records = numpy.empty(len(types), dtype=RECORD)
+	records["type"] = types
+	records["wire"] = wire
+	records["position"] = numpy.asarray(positions)[:, :3]
+	records["orientation"] = orientations
+	records["size"] = sizes
+	records["color"] = colors
+
+	return records
+
+def storeRecords(store, rows):
+	"""
+	Returns an array with the scene records of the objects in the given rows of the store.
+	Selected objects get the color they have when unselected.
+	"""
+
+	colors = store.colors[rows]
+	colors[store.selected[rows]] = UNSELECTED_COLOR
+
+	return makeRecords(store.types[rows], store.positions[rows], store.orientations[rows],
+					   store.sizes[rows], colors, store.wire[rows])
+
+def saveScene(path, store):
+	"""
+	Saves all the objects of the store to a scene file.
+	"""
+
+	writer = SceneWriter(path)
+	try:
+		writer.writeStore(store)
+	finally:
+		writer.close()
+
+def openScene(path):
+	"""
+	Memory-maps the records of a scene file, without reading them.
+	Returns a structured array with the fields of RECORD_FIELDS, one record per object.
+	Raises SceneFileError if the file is not a valid scene file, or if it is truncated.
+	"""
+
+	sceneFile = open(path, "rb")
+	try:
+		header = sceneFile.read(HEADER.size)
+	finally:
+		sceneFile.close()
+
+	if len(header) < HEADER.size:
+		raise SceneFileError("%s is not a scene file." % path)
+
+	magic, version, reserved, recordSize, count = HEADER.unpack(header)
+	if magic != SCENE_MAGIC:
+		raise SceneFileError("%s is not a scene file." % path)
+	if recordSize < RECORD.itemsize:
+		if version > SCENE_VERSION:
+			raise SceneFileError("%s was written by an incompatible version (%d)." % (path, version))
+		raise SceneFileError("%s is corrupt: its records are %d bytes long, instead of %d."
+							 % (path, recordSize, RECORD.itemsize))
+
+	if HEADER.size + count * recordSize > os.path.getsize(path):
+		raise SceneFileError("%s is truncated: it should have %d objects." % (path, count))
+
+	if count == 0:
+		return numpy.zeros(0, dtype=RECORD)
+
+	# Records of newer versions may be larger; their extra fields are skipped.
+	recordType = numpy.dtype({"names": RECORD.names,
+							  "formats": [RECORD.fields[name][0] for name in RECORD.names],
+							  "offsets": [RECORD.fields[name][1] for name in RECORD.names],
+							  "itemsize": recordSize})
+
+	return numpy.memmap(path, dtype=recordType, mode="r", offset=HEADER.size, shape=(count,))
+
+def checkRecords(records):
+	"""
+	Raises SceneFileError if any of the scene records has an unknown object type.
+	"""
+
+	if len(records) > 0 and records["type"].max() >= len(OBJECT_CLASSES):
+		raise SceneFileError("The scene file is corrupt: it has objects of unknown types.")
+
+def addRecords(store, records, ids=None):
+	"""
+	Adds the objects of a chunk of scene records to the store, returning their rows.
+	If the IDs of removed objects are given, the objects get them back.
+	Raises SceneFileError, without adding any object, if the records are not valid (see checkRecords()).
+	"""
+
+	checkRecords(records)
+
+	return store.extend(records["type"], records["position"], records["orientation"], records["size"],
+						records["color"], records["wire"], ids)
+
+def loadScene(path, store=None):
+	"""
+	Adds the objects of a scene file to the store (to a new SceneStore, if none is given) and returns it.
+	The records are copied straight from the memory-mapped file into the store columns.
+	Nothing is added if the file is not valid.
+	"""
+
+	if store is None:
+		store = SceneStore()
+
+	records = openScene(path)
+	checkRecords(records)
+	store.reserve(len(store) + len(records))
+
+	for start in range(0, len(records), CHUNK_SIZE):
+		addRecords(store, records[start:start + CHUNK_SIZE])
+
+	return store
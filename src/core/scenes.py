@@ -0,0 +1,404 @@
+from math import sin, radians
+from bounding import *
+from camera import *
+from group import *
+from history import *
+from objects import *
+from picking import *
+from quaternion import *
+from scenefile import *
+
+import numpy
+
+class Scene(object):
+	"""
+	Scene that scripts can build and edit without a QApplication or a GL context.
+	Objects are referred to by their store IDs, and every operation takes many of them at once
+	and runs as array operations on the SceneStore. The selection is a Group, like in the GlWidget.
+	If the scene keeps a history, the operations can be undone and redone.
+	The GlWidget and the benchmarks run their scene operations through a Scene as well.
+	"""
+
+	def __init__(self, width=640, height=480, store=None, history=False, view=None):
+		"""
+		Constructor. width and height are the size of the viewport of the camera,
+		used to place objects at screen positions and by the arcball of the groups.
+		If a view is given (such as the GlWidget), its camera and viewport size (wWidth and wHeight)
+		are used instead, and it is the parent of the objects and the groups.
+		"""
+
+		if view is None:
+			view = self
+			self.wWidth, self.wHeight = width, height
+
+			# The lens is set on the CPU only; setLens() would need a GL context.
+			self.camera = Camera()
+			self.camera.aspect = float(width) / height
+			self.camera.viewport = (width, height)
+		else:
+			self.camera = view.camera
+
+		self.view = view
+
+		if store is None:
+			store = SceneStore(view)
+
+		self.sceneObjects = store
+		self.selectedObjects = Group(view)
+
+		# Bounding volume hierarchy used to pick the objects with rays.
+		self.hierarchy = BoundingVolumeHierarchy(store)
+
+		# Undo/redo journal of the operations, or None if they are not recorded.
+		self.history = None
+		if history:
+			self.history = History(store)
+
+	def __len__(self):
+		"""
+		Returns how many objects there are in the scene.
+		"""
+
+		return len(self.sceneObjects)
+
+	def ids(self):
+		"""
+		Returns an array with the IDs of all the objects.
+		"""
+
+		return self.sceneObjects.ids.copy()
+
+	def rows(self, ids):
+		"""
+		Returns an array with the rows of the objects with the given IDs.
+		Raises KeyError if any of them is not in the scene.
+		"""
+
+		rows = self.sceneObjects.rowsOf(numpy.atleast_1d(ids))
+		if (rows < 0).any():
+			raise KeyError("There are no objects with some of the IDs.")
+
+		return rows
+
+	def objects(self, ids):
+		"""
+		Returns a list with the objects (Cube and Sphere views) with the given IDs.
+		"""
+
+		store = self.sceneObjects
+
+		return [store[row] for row in self.rows(ids)]
+
+	def positions(self, ids):
+		"""
+		Returns an (N,3) array with the central positions of the objects with the given IDs.
+		"""
+
+		return self.sceneObjects.positions[self.rows(ids), :3]
+
+	def boundingSphere(self, ids=None):
+		"""
+		Returns the (center, radius) of a sphere that bounds the objects with the given IDs (all of them, if ids is None).
+		"""
+
+		store = self.sceneObjects
+		if ids is None:
+			return boundingSphere(store.positions, store.radii)
+
+		rows = self.rows(ids)
+
+		return boundingSphere(store.positions[rows], store.radii[rows])
+
+	def create(self, types, positions, sizes=0.5, orientations=None, colors=None, wire=False):
+		"""
+		Creates many objects at once, returning the array of their IDs.
+		positions is an (N,3) or (N,4) array. types (CUBE or SPHERE), sizes, orientations (Quaternion or
+		(w, x, y, z) quaternions), colors (RGB bytes) and wire can be given per object or once for all of them.
+		The objects are unselected, with no rotation unless orientations are given.
+		"""
+
+		positions = numpy.atleast_2d(numpy.asarray(positions, dtype=float))
+
+		typeCodes = numpy.empty(len(positions), dtype=numpy.uint8)
+		typeCodes[:] = types
+
+		if orientations is None:
+			orientations = (1, 0, 0, 0)
+		elif isinstance(orientations, Quaternion):
+			orientations = orientations.asArray()
+
+		rows = self.sceneObjects.extend(typeCodes, positions, orientations, sizes, colors, wire)
+
+		if self.history is not None:
+			self.history.record(CreateCommand(self.sceneObjects, rows))
+
+		return self.sceneObjects.ids[rows]
+
+	def createCubes(self, positions, sides=0.5, orientations=None, colors=None, wire=False):
+		"""
+		Creates many cubes at once, returning the array of their IDs. See create().
+		"""
+
+		return self.create(CUBE, positions, sides, orientations, colors, wire)
+
+	def createSpheres(self, positions, radii=0.5, orientations=None, colors=None, wire=False):
+		"""
+		Creates many spheres at once, returning the array of their IDs. See create().
+		"""
+
+		return self.create(SPHERE, positions, radii, orientations, colors, wire)
+
+	def pick(self, x, y):
+		"""
+		Returns the ID of the nearest object under a screen position, or None if there is none.
+		"""
+
+		if len(self.sceneObjects) == 0:
+			return None
+
+		origin, direction = self.camera.getRay(x, y, self.view.wWidth, self.view.wHeight)
+
+		self.hierarchy.update()
+		row, distance = self.hierarchy.intersect(origin, direction)
+
+		if row is None:
+			return None
+
+		return int(self.sceneObjects.ids[row])
+
+	def viewAll(self):
+		"""
+		Moves the camera back, along its current direction, until it sees all the objects.
+		"""
+
+		if len(self.sceneObjects) == 0:
+			return
+
+		center, radius = self.boundingSphere()
+
+		self.camera.resetFovy()
+		dist = radius / sin(radians(self.camera.fovAngle * 0.5))
+		self.camera.position = center - self.camera.pointer * dist
+
+	def createAt(self, typeCode, x, y, size=0.5, depth=None):
+		"""
+		Creates an object under a screen position, facing the camera, like the GlWidget does
+		when C or E is pressed, and returns its ID. See Camera.getScenePosition().
+		"""
+
+		position = self.camera.getScenePosition(x, y, depth)
+
+		return self.create(typeCode, [position], size, self.camera.orientation)[0]
+
+	def translate(self, ids, shift):
+		"""
+		Shifts the objects with the given IDs by a vector.
+		"""
+
+		self.rows(ids)
+		self.__apply(TransformCommand.translation(ids, numpy.asarray(shift, dtype=float)))
+
+	def rotate(self, ids, rotation, center=None):
+		"""
+		Rotates the objects with the given IDs around a center point, given a rotation quaternion.
+		If there is no center, they rotate around the center of their bounding sphere, like a Group does.
+		"""
+
+		if center is None:
+			center = self.boundingSphere(ids)[0]
+		else:
+			self.rows(ids)
+
+		self.__apply(TransformCommand.rotationAround(ids, rotation, numpy.asarray(center, dtype=float)))
+
+	def resize(self, ids, size, merge=False):
+		"""
+		Sets the size of the objects with the given IDs.
+		If merge is True, it is undone along with the last resize of the same objects, if that was the last operation.
+		"""
+
+		self.__apply(ResizeCommand(ids, self.sceneObjects.sizes[self.rows(ids)], size), merge)
+
+	def delete(self, ids):
+		"""
+		Removes the objects with the given IDs from the scene.
+		"""
+
+		store = self.sceneObjects
+		rows = self.rows(ids)
+		if len(rows) == 0:
+			return
+
+		selectedRows = rows[store.selected[rows]]
+		if len(selectedRows) == len(self.selectedObjects):
+			self.selectedObjects.clear(False)
+		else:
+			self.selectedObjects.removeMany([store[row] for row in selectedRows], False)
+
+		if self.history is None:
+			store.removeRows(rows)
+		else:
+			self.__apply(DeleteCommand(store, rows))
+
+	def select(self, ids):
+		"""
+		Adds the objects with the given IDs to the selection.
+		"""
+
+		self.selectedObjects.addMany(self.objects(ids))
+
+	def deselect(self, ids=None):
+		"""
+		Removes the objects with the given IDs (all of them, if ids is None) from the selection.
+		"""
+
+		if ids is None:
+			self.selectedObjects.clear()
+		else:
+			self.selectedObjects.removeMany(self.objects(ids))
+
+	def selectAll(self):
+		"""
+		Selects all the objects.
+		"""
+
+		self.selectedObjects.addMany(self.sceneObjects)
+
+	def selectedIds(self):
+		"""
+		Returns an array with the IDs of the selected objects.
+		"""
+
+		return self.sceneObjects.ids[self.sceneObjects.rows(self.selectedObjects)]
+
+	def deleteSelected(self):
+		"""
+		Removes the selected objects from the scene.
+		"""
+
+		self.delete(self.selectedIds())
+
+	def group(self, ids):
+		"""
+		Returns a new Group with the objects with the given IDs, without selecting them.
+		The group can be transformed like the selection of the GlWidget.
+		"""
+
+		group = Group(self)
+		group.addMany(self.objects(ids), False)
+
+		return group
+
+	def undo(self):
+		"""
+		Reverts the last operation, returning its command, or None if there is none to undo.
+		The objects that it changed, if they are still in the scene, become the selection.
+		"""
+
+		if self.history is None or not self.history.canUndo():
+			return None
+
+		self.selectedObjects.clear()
+
+		return self.__selectCommandObjects(self.history.undo())
+
+	def redo(self):
+		"""
+		Applies the last undone operation again, returning its command, or None if there is none to redo.
+		The objects that it changed, if they are still in the scene, become the selection.
+		"""
+
+		if self.history is None or not self.history.canRedo():
+			return None
+
+		self.selectedObjects.clear()
+
+		return self.__selectCommandObjects(self.history.redo())
+
+	def clear(self):
+		"""
+		Removes all the objects, and discards the history.
+		"""
+
+		self.selectedObjects.clear()
+		self.sceneObjects.clear()
+
+		if self.history is not None:
+			self.history.clear()
+
+	def save(self, path):
+		"""
+		Saves all the objects to a scene file.
+		"""
+
+		saveScene(path, self.sceneObjects)
+
+	def load(self, path):
+		"""
+		Adds the objects of a scene file to the scene, returning the array of their IDs.
+		"""
+
+		store = self.sceneObjects
+		first = len(store)
+
+		loadScene(path, store)
+
+		rows = numpy.arange(first, len(store))
+		if self.history is not None:
+			self.history.record(CreateCommand(store, rows))
+
+		return store.ids[rows]
+
+	def __apply(self, command, merge=False):
+		"""
+		Applies a command to the objects, recording it if the scene keeps a history (see History.record()).
+		The selection sphere follows the selected objects.
+		"""
+
+		command.redo(self.sceneObjects)
+
+		if self.history is not None:
+			self.history.record(command, merge)
+
+		if len(self.selectedObjects) > 0:
+			self.selectedObjects.updateRadiusAndCenter()
+
+	def __selectCommandObjects(self, command):
+		"""
+		Selects the objects of an undone or redone command that are in the scene, and returns the command.
+		"""
+
+		store = self.sceneObjects
+		rows = store.rowsOf(command.ids)
+		self.selectedObjects.addMany([store[row] for row in rows[rows >= 0]])
+
+		return command
+
+def randomScene(n, seed, store=None):
+	"""
+	Adds n random cubes and spheres, in front of the default camera, to the store
+	(to a new SceneStore, if none is given) and returns it.
+	The same seed always gives the same scene. The objects are added at once, at the end.
+	"""
+
+	random = numpy.random.RandomState(seed)
+	if store is None:
+		store = SceneStore()
+
+	types = numpy.empty(n, dtype=numpy.uint8)
+	sizes = numpy.empty(n)
+	positions = numpy.empty((n, 3))
+	orientations = numpy.empty((n, 4))
+
+	for i in range(n):
+		if random.randint(2):
+			types[i] = CUBE
+		else:
+			types[i] = SPHERE
+		sizes[i] = random.uniform(0.1, 2.0)
+		positions[i] = (random.uniform(-20, 20), random.uniform(-15, 15), random.uniform(-60, 0))
+		orientations[i] = Quaternion.fromAxisAngle(random.uniform(0, 360), *random.uniform(-1, 1, 3)).asArray()
+
+	store.extend(types, positions, orientations, sizes)
+
+	return store
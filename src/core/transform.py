@@ -0,0 +1,163 @@
+from math import sqrt, sin, cos, tan, radians
+from util import *
+from quaternion import multiplyQuaternions, normalizeQuaternions
+
+import numpy
+
+# CPU-side 4x4 matrix and vector operations, so that no GL context is needed.
+# All matrices are stored exactly as OpenGL stores them (column-major), i.e.,
+# matrix[i] is the i-th column. They can be passed directly to glLoadMatrixd()
+# and glMultMatrixd(), and vectors are transformed as row vectors (v * M).
+
+def identityMatrix():
+	"""
+	Returns a new 4x4 identity matrix.
+	"""
+
+	return numpy.identity(4)
+
+def translationMatrix(x, y, z):
+	"""
+	Returns the matrix that glTranslate(x, y, z) would multiply by.
+	"""
+
+	retMatrix = numpy.identity(4)
+	retMatrix[W][X] = x
+	retMatrix[W][Y] = y
+	retMatrix[W][Z] = z
+
+	return retMatrix
+
+def rotationMatrix(angle, x, y, z):
+	"""
+	Returns the matrix that glRotate(angle, x, y, z) would multiply by.
+	The angle is given in degrees. A null axis results in the identity matrix.
+	"""
+
+	length = sqrt(x*x + y*y + z*z)
+	if length < 1e-12:
+		return numpy.identity(4)
+
+	x, y, z = x / length, y / length, z / length
+	c = cos(radians(angle))
+	s = sin(radians(angle))
+	t = 1 - c
+
+	retMatrix = numpy.identity(4)
+	retMatrix[X][X] = t*x*x + c
+	retMatrix[X][Y] = t*x*y + s*z
+	retMatrix[X][Z] = t*x*z - s*y
+	retMatrix[Y][X] = t*x*y - s*z
+	retMatrix[Y][Y] = t*y*y + c
+	retMatrix[Y][Z] = t*y*z + s*x
+	retMatrix[Z][X] = t*x*z + s*y
+	retMatrix[Z][Y] = t*y*z - s*x
+	retMatrix[Z][Z] = t*z*z + c
+
+	return retMatrix
+
+def lookAtMatrix(eye, center, up):
+	"""
+	Returns the matrix that gluLookAt() would multiply by.
+	"""
+
+	forward = numpy.array(center[:3], dtype=float) - numpy.array(eye[:3], dtype=float)
+	forward /= sqrt(numpy.dot(forward, forward))
+
+	side = crossProduct(forward, up[:3])[:3]
+	side /= sqrt(numpy.dot(side, side))
+
+	newUp = crossProduct(side, forward)[:3]
+
+	retMatrix = numpy.identity(4)
+	retMatrix[:3, X] = side
+	retMatrix[:3, Y] = newUp
+	retMatrix[:3, Z] = -forward
+
+	return matrixByMatrix(retMatrix, translationMatrix(-eye[X], -eye[Y], -eye[Z]))
+
+def perspectiveMatrix(fovy, aspect, near, far):
+	"""
+	Returns the matrix that gluPerspective() would multiply by.
+	The fovy angle is given in degrees.
+	"""
+
+	f = 1.0 / tan(radians(fovy) * 0.5)
+
+	retMatrix = numpy.zeros((4, 4))
+	retMatrix[X][X] = f / aspect
+	retMatrix[Y][Y] = f
+	retMatrix[Z][Z] = float(far + near) / (near - far)
+	retMatrix[Z][W] = -1
+	retMatrix[W][Z] = 2.0 * far * near / (near - far)
+
+	return retMatrix
+
+def matrixByMatrix(a, b):
+	"""
+	Multiplies two matrices (a x b) and returns the result.
+	This is the matrix that glLoadMatrixd(a) followed by glMultMatrixd(b) would leave on the stack.
+	"""
+
+	return numpy.dot(b, a)
+
+def multiplyByMatrix(vector, matrix):
+	"""
+	Multiplies a given 4-component vector by the given matrix, then returns the result.
+	Points (W != 0) are normalized so that W is 1.
+	"""
+
+	assert(len(vector) == 4)
+
+	retVec = numpy.dot(vector, matrix)
+
+	# Normalize the vector, if it's a point.
+	if (retVec[W] != 0):
+		retVec /= retVec[W]
+
+	return retVec
+
+def inverseMatrix(matrix):
+	"""
+	Returns the inverse of the given matrix.
+	"""
+
+	return numpy.linalg.inv(matrix)
+
+def rotationAroundPoint(rotation, point):
+	"""
+	Returns the matrix that applies the given rotation matrix around a center point,
+	i.e., glTranslate(point) x rotation x glTranslate(-point).
+	"""
+
+	retMatrix = matrixByMatrix(translationMatrix(*point[:3]), rotation)
+
+	return matrixByMatrix(retMatrix, translationMatrix(-point[X], -point[Y], -point[Z]))
+
+def transformPoints(points, matrix):
+	"""
+	Multiplies an (N,4) array of points by the given matrix in one vectorized pass,
+	returning the normalized points.
+	"""
+
+	points = numpy.dot(points, matrix)
+	points /= points[:, W:W+1]
+
+	return points
+
+def transformBatch(positions, orientations, matrix, rotation=None):
+	"""
+	Transforms many objects in one vectorized pass.
+	positions is an (N,4) array of points, which are multiplied by matrix, and
+	orientations is an (N,4) array of (w, x, y, z) quaternions, which are premultiplied
+	by the rotation quaternion (if given), i.e., orientations[i] becomes rotation * orientations[i].
+	Returns the new (positions, orientations) arrays.
+	"""
+
+	positions = transformPoints(positions, matrix)
+
+	if rotation is not None:
+		orientations = multiplyQuaternions(rotation.asArray(), orientations)
+		normalizeQuaternions(orientations)
+
+	return positions, orientations
@@ -1,4 +1,3 @@
-from OpenGL.GL import *
 from math import sqrt, acos, pi, degrees
 import numpy
 
@@ -23,56 +22,6 @@ def crossProduct(a, b):
 	
 	return retVec
 
-def multiplyByMatrix(vector):
-	"""
-	Multiplies a given vector by the current matrix on the current
-	GLMatrixMode stack, then returns the result.
-	"""
-	
-	assert(len(vector) == 4)
-	
-	glMode = glGetInteger(GL_MATRIX_MODE)
-	assert(glMode == GL_MODELVIEW or glMode == GL_PROJECTION)
-	
-	vecMatrix = numpy.zeros(16)
-	for i in range(4):	
-		vecMatrix[i] = vector[i]
-	
-	glPushMatrix()
-	glMultMatrixd(vecMatrix)
-	if glMode == GL_MODELVIEW:
-		retVec = glGetDouble(GL_MODELVIEW_MATRIX)[0]
-	elif glMode == GL_PROJECTION:
-		retVec = glGetDouble(GL_PROJECTION_MATRIX)[0]
-	else:
-		retVec = numpy.zeros(4)
-	glPopMatrix()
-	
-	# Normalize the vector, if it's a point.
-	if (retVec[W] != 0):
-		retVec /= retVec[W]
-	
-	return numpy.array(retVec)
-
-def matrixByMatrix(a, b):
-	"""
-	Multiplies two matrices (a x b) and returns the result.
-	"""
-	
-	glMode = glGetInteger(GL_MATRIX_MODE)
-	assert(glMode == GL_MODELVIEW or glMode == GL_PROJECTION)
-	
-	glPushMatrix()
-	glLoadMatrixd(a)
-	glMultMatrixd(b)
-	if glMode == GL_MODELVIEW:
-		retMatrix = glGetDouble(GL_MODELVIEW_MATRIX)
-	elif glMode == GL_PROJECTION:
-		retMatrix = glGetDouble(GL_PROJECTION_MATRIX)
-	glPopMatrix()
-	
-	return retMatrix
-
 def distance(a, b):
 	"""
 	Returns the distance between two vectors/points.
@@ -92,12 +41,12 @@ def angle(a, b):
 	"""
 	
 	assert(len(a) == len(b))
-	
-	c = numpy.dot(a, b) / (lengthVector(a) * lengthVector(b))
-	if c > 1:
-		c = 1
-	elif c < -1:
-		c = -1
+	
+	c = numpy.dot(a, b) / (lengthVector(a) * lengthVector(b))
+	if c > 1:
+		c = 1
+	elif c < -1:
+		c = -1
 
 	return degrees(acos(c))
 
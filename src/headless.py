@@ -0,0 +1,95 @@
+from optparse import OptionParser
+
+# It selects the offscreen GL platform, so it must be imported before anything else imports PyOpenGL.
+from core.offscreen import *
+
+from OpenGL.GL import *
+from core.camera import *
+from core.lighting import *
+from core.profiler import *
+from core.quaternion import *
+from core.renderer import *
+from core.scenes import *
+
+import core.geometry
+import core.instancing
+import core.lighting
+import core.objects
+import core.renderer
+import core.renderqueue
+
+# Renders a scene without any window or display, writing the last frame as an image
+# and the timings of every frame as CSV. For example:
+#   python headless.py --objects 10000 --frames 100 --orbit 1 --image scene.png --timings frames.csv
+
+def main():
+	"""
+	Parses the command line, renders the frames and prints a summary of their timings.
+	"""
+
+	parser = OptionParser()
+	parser.add_option("--width", type="int", default=640)
+	parser.add_option("--height", type="int", default=480)
+	parser.add_option("--objects", type="int", default=1000,
+					  help="number of random objects in the scene")
+	parser.add_option("--seed", type="int", default=0)
+	parser.add_option("--frames", type="int", default=1)
+	parser.add_option("--orbit", type="float", default=0,
+					  help="degrees that the camera orbits around the scene between frames")
+	parser.add_option("--image", help="PNG (or .ppm) file where the last frame is written")
+	parser.add_option("--timings", help="CSV file where the timings of every frame are written")
+	parser.add_option("--no-instancing", action="store_true", default=False)
+	parser.add_option("--no-culling", action="store_true", default=False)
+	parser.add_option("--no-sorting", action="store_true", default=False)
+	options, args = parser.parse_args()
+
+	context = OffscreenContext(options.width, options.height)
+
+	camera = Camera()
+	lighting = Lighting()
+	profiler = FrameProfiler(GLCallCounter([core.geometry, core.instancing, core.lighting,
+											core.objects, core.renderer, core.renderqueue]))
+	renderer = SceneRenderer(profiler)
+	renderer.initialize(lighting)
+	renderer.useInstancing = not options.no_instancing
+	renderer.useCulling = not options.no_culling
+	renderer.renderQueue.sorting = not options.no_sorting
+
+	store = randomScene(options.objects, options.seed)
+
+	profiler.setEnabled(True)
+	for i in range(options.frames):
+		if i > 0 and options.orbit:
+			camera.rotate(Quaternion.fromAxisAngle(options.orbit, 0, 1, 0))
+
+		profiler.beginFrame()
+		profiler.phase("clear")
+		glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+		renderer.render(camera, lighting, store, options.width, options.height)
+
+		# Software renderers only do the work when it is flushed.
+		profiler.phase("finish")
+		glFinish()
+		profiler.endFrame()
+
+	profiler.flush()
+	profiler.setEnabled(False)
+
+	for line in profiler.summary():
+		print(line)
+
+	if not renderer.instancingActive():
+		print("%d state changes, %d saved by sorting" % (renderer.renderQueue.stateChanges,
+														 renderer.renderQueue.stateChangesSaved))
+
+	if options.timings:
+		profiler.exportCsv(options.timings)
+
+	if options.image:
+		writeImage(options.image, context.readPixels())
+
+	renderer.release()
+	context.release()
+
+if __name__ == "__main__":
+	main()
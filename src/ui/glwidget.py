@@ -8,15 +8,35 @@ import numpy
 
 from about_dialog import *
 from help_dialog import *
+from loader import *
+from replay import *
+from scheduler import *
 
 from core.arcball import *
+from core.bounding import *
 from core.camera import *
 from core.group import *
+from core.history import *
+from core.idbuffer import *
 from core.lighting import *
 from core.objects import *
+from core.picking import *
 from core.plane import *
+from core.profiler import *
+from core.renderer import *
+from core.scenefile import *
+from core.scenes import *
 from core.util import *
 
+import core.camera
+import core.geometry
+import core.group
+import core.instancing
+import core.lighting
+import core.objects
+import core.renderer
+import core.renderqueue
+
 class GlWidget(QGLWidget):
 	"""
 	Implementation of the QGLWidget widget.
@@ -35,15 +55,50 @@ class GlWidget(QGLWidget):
 		# Initialize window-related attributes.
 		self.wWidth, self.wHeight = 0, 0
 		
+		# Repaints the widget at most once per display refresh. Every redraw request goes through it.
+		self.scheduler = FrameScheduler(self)
+		
 		# Initialize the camera.
 		self.camera = Camera()
 		
 		# Initialize the lighting system.
 		self.lighting = Lighting()
 		
-		# Initialize widget attributes.
-		self.sceneObjects = []
-		self.selectedObjects = Group(self)
+		# Frame profiler, enabled along with the performance overlay. It counts the GL calls of the rendering modules.
+		self.profiler = FrameProfiler(GLCallCounter([core.camera, core.geometry, core.group, core.instancing,
+													 core.lighting, core.objects, core.renderer, core.renderqueue]))
+		self.showOverlay = False
+		
+		# Records the input events to a file, and replays recordings measuring the input-to-frame latency.
+		self.inputRecorder = InputRecorder(self)
+		self.inputReplayer = InputReplayer(self)
+		self.connect(self.inputReplayer, SIGNAL("finished()"), self.replayFinished)
+		
+		# Renders the scene: meshes, instancing, frustum culling and levels of detail.
+		self.renderer = SceneRenderer(self.profiler)
+		
+		# Objects of the scene, the selected ones and the undo/redo journal of their changes.
+		# The scene operations are shared with the scripts and the benchmarks, through the Scene.
+		self.scene = Scene(history=True, view=self)
+		self.sceneObjects = self.scene.sceneObjects
+		self.selectedObjects = self.scene.selectedObjects
+		self.history = self.scene.history
+		
+		# Alternative picking engine that reads object IDs from an offscreen framebuffer,
+		# created once the GL context exists. Ray casting is used if it is disabled or not supported.
+		self.colorPicker = None
+		self.useColorPicking = False
+		
+		# Group center when a translation started, group orientation when a rotation started,
+		# and whether the resizes of the current size slider drag are being recorded as one command.
+		self.translationStart = None
+		self.rotationStart = None
+		self.resizeRecorded = False
+		
+		# Loads scene files in the background, adding their objects as they are read.
+		self.sceneLoader = SceneLoader(self)
+		self.connect(self.sceneLoader, SIGNAL("finished()"), self.sceneLoaded)
+		self.connect(self.sceneLoader, SIGNAL("failed(QString)"), self.sceneLoadFailed)
 		self.mousePos = numpy.zeros(3)
 		
 		# Scene's arcball.
@@ -68,6 +123,9 @@ class GlWidget(QGLWidget):
 		self.objTranslated = False
 		self.rotatingScene = False
 		
+		# Indicates whether the selected objects were rotated since the right button was pressed.
+		self.objRotated = False
+		
 		# Indicates whether if the user is editing or not a slider.
 		self.editingSizeSlider = False
 		self.editingZoomSlider = False
@@ -77,28 +135,22 @@ class GlWidget(QGLWidget):
 		Method called right before the first call to paintGL() or resizeGL().
 		"""
 		
-		glEnable(GL_DEPTH_TEST)
-		glEnable(GL_BLEND)
-		glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-		
-		# Lighting
-		self.lighting.enableLighting()
-		self.lighting.addLight(GL_LIGHT0)
-		self.lighting.setLight(GL_LIGHT0, [1.0, 1.0, 1.0, 0],
-										[1.0, 1.0, 1.0, 1.0],
-										[0, 0, 0, 1.0],
-										[0.2, 0.2, 0.2, 1.0])
-		
-		glEnable(GL_COLOR_MATERIAL)
-		glClearColor(0.6, 0.7, 0.9, 1)
+		self.renderer.initialize(self.lighting)
+		self.colorPicker = ColorIdPicker()
 		
 	def paintGL(self):
 		"""
 		Widget drawing callback.
 		"""
 		
+		self.profiler.beginFrame()
+		self.profiler.phase("clear")
 		glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 		self.render()
+		self.profiler.endFrame()
+		
+		if self.showOverlay:
+			self.renderOverlay()
 
 	def resizeGL (self, width, height):
 		"""
@@ -107,14 +159,21 @@ class GlWidget(QGLWidget):
 		
 		self.wWidth, self.wHeight = width, height
 		glViewport(0, 0, width, height)
-		self.updateGL()
 
 	def mouseMoveEvent(self, ev):
 		"""
 		Mouse movement callback.
+		The move is only handled in the next frame, and only if no other move arrives before it.
 		"""
 		
-		self.updateMousePosition()
+		self.scheduler.postMouseMove(self.handleMouseMove, ev.x(), ev.y())
+		
+	def handleMouseMove(self, x, y):
+		"""
+		Handles a mouse move to the given widget coordinates.
+		"""
+		
+		self.updateMousePosition(x, y)
 		
 		# Translation
 		self.translationMoveEvent()
@@ -130,7 +189,8 @@ class GlWidget(QGLWidget):
 		Mouse press callback.
 		"""
 		
-		self.updateMousePosition()
+		self.scheduler.flushInput()
+		self.updateMousePosition(ev.x(), ev.y())
 		btn = ev.button()
 		
 		if (btn == Qt.LeftButton):
@@ -140,6 +200,7 @@ class GlWidget(QGLWidget):
 		elif (btn == Qt.RightButton):
 			if self.mouseOverGroup():
 				self.selectedObjects.rightClickEvent(self.mousePos[X], self.mousePos[Y])
+				self.rotationStart = self.selectedObjects.orientation.copy()
 			else:
 				self.sceneArcBall.setInitialPt(self.mousePos[X], self.mousePos[Y])
 				self.rotatingScene = True	
@@ -153,7 +214,8 @@ class GlWidget(QGLWidget):
 		Mouse release callback.
 		"""
 		
-		self.updateMousePosition()
+		self.scheduler.flushInput()
+		self.updateMousePosition(ev.x(), ev.y())
 		
 		# Rotation
 		self.rotationReleaseEvent()
@@ -185,11 +247,9 @@ class GlWidget(QGLWidget):
 		Selects all objects.
 		"""
 		
-		for obj in self.sceneObjects:
-			if obj not in self.selectedObjects:
-				self.selectedObjects.add(obj)
+		self.scene.selectAll()
 		
-		self.updateGL()
+		self.scheduler.requestRedraw()
 		
 	def translationMoveEvent(self):
 		"""
@@ -198,7 +258,7 @@ class GlWidget(QGLWidget):
 		
 		if self.leftClicked:
 			self.handleTranslation()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		
 	def translationReleaseEvent(self):
 		"""
@@ -211,7 +271,12 @@ class GlWidget(QGLWidget):
 				self.releaseEventPicking()
 			else:
 				self.objTranslated = False
+				
+				if self.translationStart is not None and len(self.selectedObjects) > 0:
+					shift = self.selectedObjects.centralPosition - self.translationStart
+					self.history.record(TransformCommand.translation(self.scene.selectedIds(), shift))
 		
+		self.translationStart = None
 		self.leftClicked = False
 		
 	def zoomMoveEvent(self):
@@ -222,13 +287,26 @@ class GlWidget(QGLWidget):
 		if self.middleClicked:
 			if self.lastMousePos[Y] < self.mousePos[Y]:
 				self.camera.zoomIn()
-				self.updateGL()
+				self.scheduler.requestRedraw()
 			elif self.lastMousePos[Y] > self.mousePos[Y]:
 				self.camera.zoomOut()
-				self.updateGL()
+				self.scheduler.requestRedraw()
 			self.mainWindow.zoomSlider.setValue(int(self.camera.fovAngle))
 		
-		self.updateGL()
+	def toggleRotationAxis(self, axis):
+		"""
+		Constrains the scene and group rotations to the given world axis (X, Y or Z),
+		or makes them free again if they were already constrained to it.
+		"""
+		
+		vector = numpy.zeros(3)
+		vector[axis] = 1
+		
+		if self.sceneArcBall.axis is not None and (self.sceneArcBall.axis == vector).all():
+			vector = None
+		
+		self.sceneArcBall.setAxis(vector)
+		self.selectedObjects.arcBall.setAxis(vector)
 		
 	def zoomOut(self):
 		"""
@@ -236,7 +314,7 @@ class GlWidget(QGLWidget):
 		"""
 		
 		self.camera.zoomOut()
-		self.updateGL()
+		self.scheduler.requestRedraw()
 		
 	def zoomReleaseEvent(self):
 		"""
@@ -256,7 +334,8 @@ class GlWidget(QGLWidget):
 				self.camera.rotate(r)
 			else:
 				self.selectedObjects.rightClickMoveEvent(self.mousePos[X], self.mousePos[Y])			
-			self.updateGL()
+				self.objRotated = True
+			self.scheduler.requestRedraw()
 		
 	def rotationReleaseEvent(self):
 		"""
@@ -268,65 +347,96 @@ class GlWidget(QGLWidget):
 				self.rotatingScene = False
 			else:
 				self.selectedObjects.rightClickReleaseEvent(self.mousePos[X], self.mousePos[Y])
+				
+				# A click without a drag does not rotate anything, so there is nothing to undo.
+				if self.objRotated and self.rotationStart is not None and len(self.selectedObjects) > 0:
+					rotation = self.selectedObjects.orientation * self.rotationStart.conjugate()
+					center = self.selectedObjects.centralPosition
+					self.history.record(TransformCommand.rotationAround(self.scene.selectedIds(), rotation, center))
+				self.rotationStart = None
+				self.objRotated = False
 			self.rightClicked = False
-			self.updateGL()
+			self.scheduler.requestRedraw()
 
 	def keyPressEvent(self, ev):
 		"""
 		Key press callback.
 		"""
 		
+		self.scheduler.flushInput()
 		self.updateMousePosition()
 		key = str(ev.text()).upper()
 		
 		if (ev.modifiers() & Qt.ControlModifier):
 			self.ctrlPressed = True
+			if (ev.key() == Qt.Key_S):
+				self.saveScene()
+				return
+			elif (ev.key() == Qt.Key_O):
+				self.openScene()
+				return
+			elif (ev.key() == Qt.Key_Z and ev.modifiers() & Qt.ShiftModifier) or ev.key() == Qt.Key_Y:
+				self.redo()
+				return
+			elif (ev.key() == Qt.Key_Z):
+				self.undo()
+				return
 		if (key == "C"):
 			self.createCube()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (key == "E"):
 			self.createSphere()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (key == "X"):
 			self.deleteSelectedObjects()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (key == "W"):
 			self.camera.moveUp()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (key == "S"):
 			self.camera.moveDown()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (key == "A"):
 			self.camera.moveLeft()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (key == "D"):
 			self.camera.moveRight()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (key == "F"):
 			self.camera.moveForward()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (key == "B"):
 			self.camera.moveBackward()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (key == "R"):
 			self.resetView()
 		elif (key == "T"):
 			self.selectAll()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (ev.key() == Qt.Key_Up):
 			self.camera.tiltUp()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (ev.key() == Qt.Key_Down):
 			self.camera.tiltDown()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (ev.key() == Qt.Key_Left):
 			self.camera.tiltLeft()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (ev.key() == Qt.Key_Right):
 			self.camera.tiltRight()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		elif (ev.key() == Qt.Key_Home):
 			self.viewAll()
+		elif (key == "P"):
+			self.toggleOverlay()
+		elif (key == "O"):
+			self.exportProfile()
+		elif (key == "K"):
+			self.toggleInputRecording()
+		elif (key == "L"):
+			self.replayInput()
+		elif (key in ("1", "2", "3")):
+			self.toggleRotationAxis("123".index(key))
 		
 	def keyReleaseEvent(self, ev):
 		"""
@@ -341,29 +451,85 @@ class GlWidget(QGLWidget):
 		Creates a new cube.
 		"""
 		
-		newCube = Cube(self, self.mainWindow.sizeSlider.value()*0.1)
-		newCube.centralPosition = self.camera.getScenePosition(self.mousePos[X], self.mousePos[Y])
-		newCube.rotation = self.camera.rotation
-		self.sceneObjects.append(newCube)
+		self.scene.createAt(CUBE, self.mousePos[X], self.mousePos[Y], self.mainWindow.sizeSlider.value()*0.1)
 		
 	def createSphere(self):
 		"""
 		Creates a new sphere.
 		"""
 		
-		newSphere = Sphere(self, self.mainWindow.sizeSlider.value()*0.1)
-		newSphere.centralPosition = self.camera.getScenePosition(self.mousePos[X], self.mousePos[Y])
-		newSphere.rotation = self.camera.rotation
-		self.sceneObjects.append(newSphere)
+		self.scene.createAt(SPHERE, self.mousePos[X], self.mousePos[Y], self.mainWindow.sizeSlider.value()*0.1)
 	
 	def deleteSelectedObjects(self):
 		"""
 		Deletes all selected objects.
 		"""
 		
-		for obj in self.selectedObjects:
-			self.sceneObjects.remove(obj)
-		self.selectedObjects.removeAll()
+		self.scene.deleteSelected()
+		
+	def undo(self):
+		"""
+		Reverts the last change of the objects, and selects the objects that it changed.
+		"""
+		
+		self.scene.undo()
+		self.scheduler.requestRedraw()
+		
+	def redo(self):
+		"""
+		Applies the last undone change of the objects again, and selects the objects that it changed.
+		"""
+		
+		self.scene.redo()
+		self.scheduler.requestRedraw()
+		
+	def saveScene(self):
+		"""
+		Saves all the objects to a scene file chosen by the user.
+		"""
+		
+		path = QFileDialog.getSaveFileName(self, "Save scene", "scene.scn", "Scene files (*.scn)")
+		if path:
+			saveScene(str(path), self.sceneObjects)
+		
+	def openScene(self):
+		"""
+		Replaces all the objects by the ones in a scene file chosen by the user.
+		The objects are loaded in the background, and drawn as they arrive.
+		"""
+		
+		path = QFileDialog.getOpenFileName(self, "Open scene", "", "Scene files (*.scn)")
+		if not path:
+			return
+		
+		# The current scene is only replaced once the file is known to be valid.
+		try:
+			records = openScene(str(path))
+		except (SceneFileError, EnvironmentError) as e:
+			QMessageBox.warning(self, "Open scene", str(e))
+			return
+		
+		self.sceneLoader.cancel()
+		self.scene.clear()
+		
+		self.sceneLoader.start(records)
+		
+		self.scheduler.requestRedraw()
+		
+	def sceneLoaded(self):
+		"""
+		Method called when a scene file was loaded. Shows the load measurements in the status bar.
+		"""
+		
+		self.mainWindow.statusBar().showMessage(", ".join(self.sceneLoader.summary()))
+		
+	def sceneLoadFailed(self, message):
+		"""
+		Method called when a scene file could not be loaded completely. Warns the user.
+		"""
+		
+		QMessageBox.warning(self, "Open scene", message)
+		self.scheduler.requestRedraw()
 		
 	def resetView(self):
 		"""
@@ -372,7 +538,7 @@ class GlWidget(QGLWidget):
 		
 		self.camera.reset()
 		self.mainWindow.zoomSlider.setValue(int(self.camera.fovAngle))
-		self.updateGL()
+		self.scheduler.requestRedraw()
 	
 	def viewAll(self):
 		"""
@@ -382,76 +548,163 @@ class GlWidget(QGLWidget):
 		if len(self.sceneObjects) == 0:
 			return
 		
-		group = Group(self)
-		for obj in self.sceneObjects:
-			group.add(obj, False)
-		
-		self.camera.resetFovy()
+		self.scene.viewAll()
 		self.mainWindow.zoomSlider.setValue(int(self.camera.fovAngle))
-		dist = group.radius / sin(radians(self.camera.fovAngle * 0.5))
-		self.camera.position = group.centralPosition - self.camera.pointer * dist
 		
-		self.updateGL()
+		self.scheduler.requestRedraw()
 		
-	def updateMousePosition(self):
+	def updateMousePosition(self, x=None, y=None):
 		"""
 		Updates mousePos and lastMousePos attributes, using GL coordinates.
+		x and y are the widget coordinates of the mouse; the cursor position is used if they are not given.
 		"""
 		
-		screenY = self.mapFromGlobal(QCursor.pos()).y()
+		if x is None or y is None:
+			cursor = self.mapFromGlobal(QCursor.pos())
+			x, y = cursor.x(), cursor.y()
 		
 		self.lastMousePos[X] = self.mousePos[X]
 		self.lastMousePos[Y] = self.mousePos[Y]
 		
-		self.mousePos[X] = self.mapFromGlobal(QCursor.pos()).x()
-		self.mousePos[Y] = glGetIntegerv(GL_VIEWPORT)[3] - screenY - 1
+		self.mousePos[X] = x
+		self.mousePos[Y] = self.wHeight - y - 1
+		
+	def render(self):
+		"""
+		Renders the scene.
+		Warning: This method sets the matrix mode to GL_MODELVIEW.
+		"""
+		
+		self.renderer.render(self.camera, self.lighting, self.sceneObjects, self.wWidth, self.wHeight,
+							 self.selectedObjects)
 		
-	def renderAxis(self):
+	def renderOverlay(self):
 		"""
-		Creates a small white wire sphere and the XYZ axis in the 0 coordinate, just for reference.
+		Renders the performance overlay: the frame profiler summary and a histogram of the frame times.
 		"""
 		
-		# White wire
+		lines = self.profiler.summary()
+		lines.append("%d visible, %d culled objects" % (self.renderer.frustum.visible, self.renderer.frustum.culled))
+		lines.append("%d sphere triangles saved by LOD" % self.renderer.lod.trianglesSaved)
+		if not self.renderer.instancingActive():
+			lines.append("%d state changes, %d saved by sorting" % (self.renderer.renderQueue.stateChanges,
+																	self.renderer.renderQueue.stateChangesSaved))
+		lines.append("%.1f repaints/s, %d merged redraws, %d merged mouse moves"
+					 % (self.scheduler.repaintsPerSecond, self.scheduler.mergedRedraws, self.scheduler.mergedMoves))
+		if self.sceneLoader.loading:
+			lines.extend(self.sceneLoader.summary())
+		if self.inputRecorder.recording:
+			lines.append("recording input: %d events" % len(self.inputRecorder.events))
+		elif self.inputReplayer.latencies and not self.inputReplayer.replaying:
+			lines.extend(self.inputReplayer.summary())
+		
+		glPushAttrib(GL_ENABLE_BIT | GL_CURRENT_BIT)
+		glDisable(GL_LIGHTING)
+		glDisable(GL_DEPTH_TEST)
+		
+		font = QFont("Monospace", 9)
 		glColor(1, 1, 1)
-		glutWireSphere(0.1, 20, 20)
-		
-		# XYZ axis
-		glLineWidth(2)
-		glDisable(GL_LIGHTING)
-		glBegin(GL_LINES)
-		glColor(1, 0, 0)
-		glVertex3f(0, 0, 0)
-		glVertex3f(1, 0, 0)
-		glColor(0, 1, 0)
-		glVertex3f(0, 0, 0)
-		glVertex3f(0, 1, 0)
-		glColor(0, 0, 1)
-		glVertex3f(0, 0, 0)
-		glVertex3f(0, 0, 1)
-		glEnd()
-		glEnable(GL_LIGHTING)
-		glLineWidth(1)
-			
-	def render(self):
+		for i, line in enumerate(lines):
+			self.renderText(10, 20 + 15*i, line, font)
+		
+		# Histogram of the frame times, in the bottom left corner.
+		counts = self.profiler.histogram()
+		edges = FrameProfiler.HISTOGRAM_EDGES
+		barWidth, maxHeight = 30, 80
+		
+		glMatrixMode(GL_PROJECTION)
+		glPushMatrix()
+		glLoadIdentity()
+		glOrtho(0, self.wWidth, 0, self.wHeight, -1, 1)
+		glMatrixMode(GL_MODELVIEW)
+		glPushMatrix()
+		glLoadIdentity()
+		
+		glColor(1, 1, 0)
+		glBegin(GL_QUADS)
+		for i, count in enumerate(counts):
+			height = maxHeight * count / float(max(counts.max(), 1))
+			left = 10 + i*barWidth
+			glVertex2f(left, 25)
+			glVertex2f(left + barWidth - 4, 25)
+			glVertex2f(left + barWidth - 4, 25 + height)
+			glVertex2f(left, 25 + height)
+		glEnd()
+		
+		glMatrixMode(GL_PROJECTION)
+		glPopMatrix()
+		glMatrixMode(GL_MODELVIEW)
+		glPopMatrix()
+		
+		glColor(1, 1, 1)
+		for i in range(len(counts)):
+			self.renderText(10 + i*barWidth, self.wHeight - 10, "%g" % edges[i], font)
+		
+		glPopAttrib()
+		
+	def toggleOverlay(self):
 		"""
-		Renders the scene.
-		Warning: This method sets the matrix mode to GL_MODELVIEW.
+		Shows or hides the performance overlay. The frame profiler only runs while it is shown.
 		"""
 		
-		# Camera
-		self.camera.setLens(self.wWidth, self.wHeight)
-		self.camera.setView()
+		self.makeCurrent()
+		self.showOverlay = not self.showOverlay
+		self.profiler.setEnabled(self.showOverlay)
+		self.scheduler.requestRedraw()
 		
-		# Lighting
-		self.lighting.render()
+	def exportProfile(self):
+		"""
+		Exports the frames recorded by the profiler to a CSV file chosen by the user.
+		"""
+		
+		path = QFileDialog.getSaveFileName(self, "Export frame profile", "profile.csv", "CSV files (*.csv)")
+		if path:
+			self.profiler.exportCsv(str(path))
+		
+	def toggleInputRecording(self):
+		"""
+		Starts recording the input events, or stops recording and saves them to a file chosen by the user.
+		The K key that stops the recording is not saved.
+		"""
+		
+		if not self.inputRecorder.recording:
+			self.inputRecorder.start()
+			return
+		
+		self.inputRecorder.stop()
 		
-		# Reference of the XYZ axis
-		self.renderAxis()
+		# Drops the press of the K key itself.
+		del self.inputRecorder.events[-1:]
 		
-		for obj in self.sceneObjects:
-			obj.render()
+		path = QFileDialog.getSaveFileName(self, "Save input recording", "input.rec", "Input recordings (*.rec)")
+		if path:
+			self.inputRecorder.save(str(path))
 		
-		self.selectedObjects.render()
+	def replayInput(self):
+		"""
+		Replays an input recording chosen by the user, measuring the input-to-frame latency of its events.
+		"""
+		
+		if self.inputRecorder.recording or self.inputReplayer.replaying:
+			return
+		
+		path = QFileDialog.getOpenFileName(self, "Replay input recording", "", "Input recordings (*.rec)")
+		if not path:
+			return
+		
+		self.inputReplayer.load(str(path))
+		self.inputReplayer.start()
+		
+	def replayFinished(self):
+		"""
+		Method called when an input recording was replayed. Shows the latency percentiles of all the events
+		in the status bar; the performance overlay shows them for each event type as well.
+		"""
+		
+		lines = self.inputReplayer.summary()[:2]
+		self.mainWindow.statusBar().showMessage("; ".join([" ".join(line.split()) for line in lines]))
+		
+		self.scheduler.requestRedraw()
 		
 	def handleTranslation(self):
 		"""
@@ -472,49 +725,22 @@ class GlWidget(QGLWidget):
 		"""
 		Handles object picking, returning the object under the current mouse position.
 		Returns None if there is none.
-		"""
+		"""
 		
 		if len(self.sceneObjects) == 0:
 			return None
-		
-		buffer = glSelectBuffer(len(self.sceneObjects)*4)
-		projection = glGetDouble(GL_PROJECTION_MATRIX)
-		viewport = glGetInteger(GL_VIEWPORT)
-		
-		glRenderMode(GL_SELECT)
-		
-		glMatrixMode(GL_PROJECTION)
-		glPushMatrix()
-		glLoadIdentity()
-		gluPickMatrix(self.mousePos[X], self.mousePos[Y], 2, 2, viewport)
-		glMultMatrixf(projection)
-		self.camera.setView()
 		
-		glInitNames()
-		glPushName(0)
+		if self.useColorPicking and self.colorPicker is not None and self.colorPicker.supported:
+			self.makeCurrent()
+			objectId = self.colorPicker.pick(self.sceneObjects, self.renderer.geometry, self.camera,
+											 self.mousePos[X], self.mousePos[Y], self.wWidth, self.wHeight)
+		else:
+			objectId = self.scene.pick(self.mousePos[X], self.mousePos[Y])
 		
-		for i in range(len(self.sceneObjects)):
-			glLoadName(i)
-			self.sceneObjects[i].render()
-				
-		glMatrixMode(GL_PROJECTION)
-		glPopMatrix()
-		glMatrixMode(GL_MODELVIEW)
-		glFlush()
-		glPopName()
-			
-		hits = glRenderMode(GL_RENDER)
+		if objectId is None:
+			return None
 		
-		nearestHit = None
-		for hit in hits:
-			near, far, names = hit
-			if (nearestHit == None) or (near < nearestHit[0]):
-				nearestHit = [near, names[0]]
-				
-		if nearestHit != None:
-			return self.sceneObjects[nearestHit[1]]
-				
-		return nearestHit
+		return self.sceneObjects.find(objectId)
 	
 	def mouseOverGroup(self):
 		"""
@@ -525,34 +751,12 @@ class GlWidget(QGLWidget):
 		if len(self.selectedObjects) == 0:
 			return False
 		
-		buffer = glSelectBuffer(4)
-		projection = glGetDouble(GL_PROJECTION_MATRIX)
-		viewport = glGetInteger(GL_VIEWPORT)
-		
-		glRenderMode(GL_SELECT)
-		
-		glMatrixMode(GL_PROJECTION)
-		glPushMatrix()
-		glLoadIdentity()
-		gluPickMatrix(self.mousePos[X], self.mousePos[Y], 2, 2, viewport)
-		glMultMatrixf(projection)
-		self.camera.setView()
-		
-		glInitNames()
-		glPushName(0)
+		origin, direction = self.camera.getRay(self.mousePos[X], self.mousePos[Y], self.wWidth, self.wHeight)
 		
-		glLoadName(0)
-		self.selectedObjects.render(True)
-				
-		glMatrixMode(GL_PROJECTION)
-		glPopMatrix()
-		glMatrixMode(GL_MODELVIEW)
-		glFlush()
-		glPopName()
-			
-		hits = glRenderMode(GL_RENDER)
+		group = self.selectedObjects
+		distances = raySpheres(origin, direction, numpy.array([group.centralPosition]), [group.radius])
 				
-		return len(hits) > 0
+		return distances[0] < numpy.inf
 			
 	def pressEventPicking(self):
 		"""
@@ -578,7 +782,7 @@ class GlWidget(QGLWidget):
 					# The picked object was not previously selected.
 					
 					# Deselect all previously selected objects.
-					self.selectedObjects.removeAll()
+					self.selectedObjects.clear()
 					
 					# Select the picked object.
 					self.selectedObjects.add(pickedObject)
@@ -594,14 +798,15 @@ class GlWidget(QGLWidget):
 					self.preSelectedObject = pickedObject
 			
 			self.selectedObjects.leftClickPressEvent(self.mousePos[X], self.mousePos[Y])		
+			self.translationStart = self.selectedObjects.centralPosition.copy()
 		else:
 			# No objects were picked.
-			self.selectedObjects.removeAll()
+			self.selectedObjects.clear()
 			
 		if len(self.selectedObjects) > 0:
 			self.mainWindow.sizeSlider.setValue(self.selectedObjects.maxObjectSize * 10)
 			
-		self.updateGL()
+		self.scheduler.requestRedraw()
 		
 	def releaseEventPicking(self):
 		"""
@@ -626,7 +831,7 @@ class GlWidget(QGLWidget):
 						# There were more than one object previously selected.
 						
 						# Deselect all previously selected objects.
-						self.selectedObjects.removeAll()
+						self.selectedObjects.clear()
 						
 						# Select the picked object.
 						self.selectedObjects.add(pickedObject)
@@ -645,7 +850,7 @@ class GlWidget(QGLWidget):
 
 		if len(self.selectedObjects) > 0:
 			self.mainWindow.sizeSlider.setValue(self.selectedObjects.maxObjectSize * 10)
-		self.updateGL()
+		self.scheduler.requestRedraw()
 
 	def showAboutEvent(self):
 		"""
@@ -666,9 +871,10 @@ class GlWidget(QGLWidget):
 	def quitEvent(self):
 		"""
 		Method called when the menu Quit button is pressed.
+		Stops the scene load in progress, since its reader thread must not outlive the widget.
 		"""
 		
-		pass
+		self.sceneLoader.cancel()
 	
 	def zoomSliderChangeEvent(self):
 		"""
@@ -677,7 +883,7 @@ class GlWidget(QGLWidget):
 		
 		if self.mainWindow.zoomSlider.hasFocus():
 			self.camera.fovAngle = self.mainWindow.zoomSlider.value()
-			self.updateGL()
+			self.scheduler.requestRedraw()
 		
 	def zoomSliderPressedEvent(self):
 		"""
@@ -700,11 +906,13 @@ class GlWidget(QGLWidget):
 		
 		if self.mainWindow.sizeSlider.hasFocus():
 			size = self.mainWindow.sizeSlider.value() * 0.1
-			for obj in self.selectedObjects:
-				obj.size = size
-			self.selectedObjects.updateRadiusAndCenter()
+			
+			if len(self.selectedObjects) > 0:
+				# The resizes of one drag of the slider are undone at once.
+				self.scene.resize(self.scene.selectedIds(), size, merge=self.editingSizeSlider and self.resizeRecorded)
+				self.resizeRecorded = self.editingSizeSlider
 				
-			self.updateGL()
+			self.scheduler.requestRedraw()
 
 	def sizeSliderPressedEvent(self):
 		"""
@@ -712,6 +920,7 @@ class GlWidget(QGLWidget):
 		"""
 		
 		self.editingSizeSlider = True
+		self.resizeRecorded = False
 		
 	def sizeSliderReleasedEvent(self):
 		"""
@@ -720,4 +929,4 @@ class GlWidget(QGLWidget):
 		
 		self.editingSizeSlider = False
 		
-	
\ No newline at end of file
+	
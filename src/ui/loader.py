@@ -0,0 +1,203 @@
+from PyQt4.QtCore import *
+from timeit import default_timer
+
+from core.scenefile import *
+
+import threading
+import numpy
+
+class SceneReader(QThread):
+	"""
+	Worker thread that reads the records of a scene file in batches, emitting batchRead(PyQt_PyObject)
+	with a (reader, records) tuple for each one. Only a few batches can be waiting to be added at a time,
+	so that the reader does not flood the event queue of the GUI thread.
+	"""
+
+	# Number of batches that can be handed over before the first of them is added.
+	BATCHES_IN_FLIGHT = 2
+
+	def __init__(self, records, batchSize, parent=None):
+		"""
+		Constructor. records is the memory-mapped array returned by openScene().
+		"""
+
+		super(SceneReader, self).__init__(parent)
+
+		self.records = records
+		self.batchSize = batchSize
+		self.cancelled = False
+
+		self._slots = threading.Semaphore(SceneReader.BATCHES_IN_FLIGHT)
+
+	def run(self):
+		"""
+		Reads the batches. Copying them out of the memory map is what reads the file.
+		"""
+
+		for start in range(0, len(self.records), self.batchSize):
+			self._slots.acquire()
+			if self.cancelled:
+				return
+
+			batch = numpy.array(self.records[start:start + self.batchSize])
+			self.emit(SIGNAL("batchRead(PyQt_PyObject)"), (self, batch))
+
+	def batchAdded(self):
+		"""
+		Signals that a batch was added, so that the next one can be handed over.
+		"""
+
+		self._slots.release()
+
+	def cancel(self):
+		"""
+		Stops reading and waits for the thread to finish.
+		"""
+
+		self.cancelled = True
+		self._slots.release()
+		self.wait()
+
+class SceneLoader(QObject):
+	"""
+	Loads a scene file into the GlWidget progressively. The records are read in a worker thread
+	and the objects are added in batches in the GUI thread, each batch as it arrives, so that the
+	scene is drawn and can be used while it loads.
+	It measures the time until the first frame with objects and the load throughput,
+	and emits finished() when everything was loaded and drawn. If a batch is not valid,
+	the load stops, keeping the objects added so far, and failed(QString) is emitted with the error.
+	"""
+
+	# Number of objects added at a time.
+	BATCH_SIZE = 16384
+
+	def __init__(self, widget):
+		"""
+		Constructor.
+		"""
+
+		super(SceneLoader, self).__init__(widget)
+
+		self.widget = widget
+		self.loading = False
+
+		# Number of objects in the file being loaded, and number of them added so far.
+		self.total = 0
+		self.loaded = 0
+
+		# Seconds from the start of the load to the end of the first frame with objects, and to the last batch.
+		self.timeToFirstFrame = None
+		self.elapsed = None
+
+		self._reader = None
+		self._start = 0
+		self._bytes = 0
+
+		self.connect(self.widget.scheduler, SIGNAL("frameDrawn(double)"), self.frameDrawn)
+
+	def start(self, records):
+		"""
+		Starts loading the records of a scene file, as returned by openScene(), adding their objects
+		to the scene of the widget. A load in progress is cancelled.
+		The file is opened by the caller, so that nothing is changed if it cannot be opened.
+		"""
+
+		self.cancel()
+
+		self.loading = True
+		self.total = len(records)
+		self.loaded = 0
+		self.timeToFirstFrame = None
+		self.elapsed = None
+		self._bytes = records.nbytes
+		self._start = default_timer()
+
+		self.widget.sceneObjects.reserve(len(self.widget.sceneObjects) + self.total)
+
+		if self.total == 0:
+			self.__finish()
+			return
+
+		self._reader = SceneReader(records, SceneLoader.BATCH_SIZE, self)
+		self.connect(self._reader, SIGNAL("batchRead(PyQt_PyObject)"), self.addBatch)
+		self._reader.start()
+
+	def cancel(self):
+		"""
+		Stops the load in progress, if any, and waits for the reader thread to finish.
+		The objects added so far are kept. It must be called before the widget is destroyed.
+		"""
+
+		if self._reader is not None:
+			self._reader.cancel()
+			self._reader = None
+
+		self.loading = False
+
+	def addBatch(self, item):
+		"""
+		Adds a batch of records read by the worker thread to the scene, and asks for a frame to draw it.
+		"""
+
+		reader, batch = item
+
+		# Batches of a cancelled load may still be queued.
+		if reader is not self._reader:
+			return
+
+		try:
+			addRecords(self.widget.sceneObjects, batch)
+		except SceneFileError as e:
+			self.cancel()
+			self.emit(SIGNAL("failed(QString)"), str(e))
+			return
+
+		self.loaded += len(batch)
+		reader.batchAdded()
+
+		self.widget.scheduler.requestRedraw()
+
+		if self.loaded == self.total:
+			self.elapsed = default_timer() - self._start
+			self._reader.wait()
+			self._reader = None
+			self.__finish()
+
+	def frameDrawn(self, time):
+		"""
+		Records the time of the first frame drawn with objects of the file.
+		"""
+
+		if self.timeToFirstFrame is None and self.loaded > 0:
+			self.timeToFirstFrame = time - self._start
+			self.__finish()
+
+	def summary(self):
+		"""
+		Returns lines of text with the progress of the load, or with its measurements once it is finished.
+		"""
+
+		if self.loading:
+			return ["loading scene: %d of %d objects" % (self.loaded, self.total)]
+
+		lines = ["%d objects loaded" % self.loaded]
+		if self.timeToFirstFrame is not None:
+			lines.append("first frame after %.1f ms" % (self.timeToFirstFrame * 1000))
+		if self.elapsed:
+			lines.append("%.0f objects/s, %.1f MB/s" % (self.loaded / self.elapsed, self._bytes / self.elapsed / 1e6))
+
+		return lines
+
+	def __finish(self):
+		"""
+		Ends the load once every object was added, and drawn at least once.
+		"""
+
+		if not self.loading or self.loaded < self.total:
+			return
+
+		if self.total > 0 and self.timeToFirstFrame is None:
+			return
+
+		self.loading = False
+		self.emit(SIGNAL("finished()"))
@@ -15,6 +15,15 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 		super(MainWindow, self).__init__(parent)
 		self.setupUi(self)
 
+	def closeEvent(self, ev):
+		"""
+		Event called when the window is closed. Stops the scene load in progress, if any,
+		since its reader thread must not outlive the widget.
+		"""
+		
+		self.widget.sceneLoader.cancel()
+		ev.accept()
+
 	def on_actionQuit_triggered(self):
 		"""
 		Event called when the Quit menu entry is triggered.
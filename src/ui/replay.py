@@ -0,0 +1,248 @@
+from PyQt4.QtCore import *
+from PyQt4.QtGui import *
+from timeit import default_timer
+
+import json
+import numpy
+
+# Input recordings are text files with a header line followed by one JSON list per event:
+# [time, type, x, y, button, buttons, modifiers, key, text], with the time in seconds since the recording started.
+RECORDING_HEADER = "# glwidget input recording 1"
+
+# Event types that are recorded, and the widget handlers that they are replayed through.
+RECORDED_EVENTS = {
+	QEvent.MouseButtonPress: "mousePressEvent",
+	QEvent.MouseButtonRelease: "mouseReleaseEvent",
+	QEvent.MouseMove: "mouseMoveEvent",
+	QEvent.KeyPress: "keyPressEvent",
+	QEvent.KeyRelease: "keyReleaseEvent",
+}
+
+class InputRecorder(QObject):
+	"""
+	Records the mouse and key events of a widget, with their timestamps, while it is running.
+	It watches the events through an event filter, so the widget handles them as usual.
+	"""
+
+	def __init__(self, widget):
+		"""
+		Constructor. The recorder does not start until start() is called.
+		"""
+
+		super(InputRecorder, self).__init__(widget)
+
+		self.widget = widget
+		self.recording = False
+
+		# Recorded events, as lists of [time, type, x, y, button, buttons, modifiers, key, text].
+		self.events = []
+
+		self._start = 0
+
+	def start(self):
+		"""
+		Discards the recorded events and starts recording new ones.
+		"""
+
+		self.events = []
+		self._start = default_timer()
+		self.recording = True
+		self.widget.installEventFilter(self)
+
+	def stop(self):
+		"""
+		Stops recording.
+		"""
+
+		self.widget.removeEventFilter(self)
+		self.recording = False
+
+	def eventFilter(self, obj, ev):
+		"""
+		Records the input events of the widget. The events are never filtered out.
+		"""
+
+		eventType = ev.type()
+		if obj is self.widget and eventType in RECORDED_EVENTS:
+			time = default_timer() - self._start
+
+			if eventType in (QEvent.KeyPress, QEvent.KeyRelease):
+				cursor = self.widget.mapFromGlobal(QCursor.pos())
+				self.events.append([time, int(eventType), cursor.x(), cursor.y(), 0, 0,
+									int(ev.modifiers()), ev.key(), str(ev.text())])
+			else:
+				self.events.append([time, int(eventType), ev.x(), ev.y(), int(ev.button()), int(ev.buttons()),
+									int(ev.modifiers()), 0, ""])
+
+		return False
+
+	def save(self, path):
+		"""
+		Writes the recorded events to a file.
+		"""
+
+		recordingFile = open(path, "w")
+		try:
+			recordingFile.write(RECORDING_HEADER + "\n")
+			for event in self.events:
+				recordingFile.write(json.dumps(event) + "\n")
+		finally:
+			recordingFile.close()
+
+class InputReplayer(QObject):
+	"""
+	Replays a recording through the event handlers of a GlWidget, with the recorded timing,
+	and measures the latency from each input event to the end of the first frame drawn after it.
+	Events after which nothing was drawn (such as moves with no button pressed) have no latency.
+	It emits finished() when all the events were replayed and the last frame was drawn.
+	"""
+
+	# Percentiles of the latencies in the summary.
+	PERCENTILES = (50, 90, 95, 99)
+
+	def __init__(self, widget):
+		"""
+		Constructor.
+		"""
+
+		super(InputReplayer, self).__init__(widget)
+
+		self.widget = widget
+		self.replaying = False
+
+		# Events to replay, as loaded from a recording.
+		self.events = []
+
+		# (event type, latency in seconds) of the events that were followed by a frame.
+		self.latencies = []
+
+		# Number of replayed events that no frame followed.
+		self.eventsWithoutFrame = 0
+
+		self._next = 0
+		self._start = 0
+
+		# (event type, dispatch time) of the events waiting for a frame.
+		self._waiting = []
+
+		self.connect(self.widget.scheduler, SIGNAL("frameDrawn(double)"), self.frameDrawn)
+
+	def load(self, path):
+		"""
+		Loads the events of a recording.
+		"""
+
+		recordingFile = open(path, "r")
+		try:
+			if recordingFile.readline().strip() != RECORDING_HEADER:
+				raise ValueError("%s is not an input recording." % path)
+
+			self.events = [json.loads(line) for line in recordingFile if line.strip()]
+		finally:
+			recordingFile.close()
+
+	def start(self):
+		"""
+		Starts replaying the loaded events. The widget should be in the same state as when they were recorded.
+		"""
+
+		self.latencies = []
+		self.eventsWithoutFrame = 0
+		self._waiting = []
+		self._next = 0
+		self._start = default_timer()
+		self.replaying = True
+
+		self.__scheduleNext()
+
+	def frameDrawn(self, time):
+		"""
+		Assigns the end time of a frame to the events that were waiting for it.
+		"""
+
+		for eventType, dispatched in self._waiting:
+			self.latencies.append((eventType, time - dispatched))
+		self._waiting = []
+
+		self.__checkFinished()
+
+	def summary(self):
+		"""
+		Returns lines of text with the latency percentiles of all the events and of each event type.
+		"""
+
+		lines = ["%d events replayed, %d with no frame after them" % (len(self.latencies) + self.eventsWithoutFrame,
+																	 self.eventsWithoutFrame)]
+
+		groups = [("all", [latency for eventType, latency in self.latencies])]
+		for eventType, handler in sorted(RECORDED_EVENTS.items()):
+			latencies = [latency for latencyType, latency in self.latencies if latencyType == eventType]
+			if latencies:
+				groups.append((handler, latencies))
+
+		for name, latencies in groups:
+			if not latencies:
+				continue
+			percentiles = numpy.percentile(numpy.array(latencies) * 1000, InputReplayer.PERCENTILES)
+			lines.append("%-18s %6d  " % (name, len(latencies))
+						 + "  ".join(["p%d %7.2f ms" % (p, value) for p, value in zip(InputReplayer.PERCENTILES, percentiles)])
+						 + "  max %7.2f ms" % (max(latencies) * 1000))
+
+		return lines
+
+	def __scheduleNext(self):
+		"""
+		Waits until the time of the next event, if there is one.
+		"""
+
+		if self._next >= len(self.events):
+			self.__checkFinished()
+			return
+
+		wait = self.events[self._next][0] - (default_timer() - self._start)
+		QTimer.singleShot(max(0, int(wait * 1000)), self.__dispatchNext)
+
+	def __dispatchNext(self):
+		"""
+		Feeds the next event to the widget handler of its type.
+		"""
+
+		time, eventType, x, y, button, buttons, modifiers, key, text = self.events[self._next]
+		self._next += 1
+
+		# The events before this one are not waiting for a frame if there is nothing left to draw.
+		if not self.widget.scheduler.pending():
+			self.eventsWithoutFrame += len(self._waiting)
+			self._waiting = []
+
+		eventType = QEvent.Type(eventType)
+		if eventType in (QEvent.KeyPress, QEvent.KeyRelease):
+			# Key handlers read the mouse position from the cursor.
+			QCursor.setPos(self.widget.mapToGlobal(QPoint(x, y)))
+			ev = QKeyEvent(eventType, key, Qt.KeyboardModifiers(modifiers), text)
+		else:
+			ev = QMouseEvent(eventType, QPoint(x, y), Qt.MouseButton(button), Qt.MouseButtons(buttons),
+							 Qt.KeyboardModifiers(modifiers))
+
+		self._waiting.append((int(eventType), default_timer()))
+		getattr(self.widget, RECORDED_EVENTS[eventType])(ev)
+
+		self.__scheduleNext()
+
+	def __checkFinished(self):
+		"""
+		Ends the replay once all the events were dispatched and there is nothing left to draw.
+		"""
+
+		if not self.replaying or self._next < len(self.events):
+			return
+
+		# Wait for the frame of the last events, if there is one coming.
+		if self.widget.scheduler.pending():
+			QTimer.singleShot(int(self.widget.scheduler.interval * 1000), self.__checkFinished)
+			return
+
+		self.eventsWithoutFrame += len(self._waiting)
+		self._waiting = []
+		self.replaying = False
+		self.emit(SIGNAL("finished()"))
@@ -0,0 +1,138 @@
+from PyQt4.QtCore import *
+from timeit import default_timer
+
+class FrameScheduler(QObject):
+	"""
+	Coalesces the redraw requests of a QGLWidget, so that it is repainted at most once per
+	display refresh, no matter how many events asked for it in between.
+	Mouse moves are coalesced as well: only the latest one is handled, right before the frame is drawn.
+	It emits frameDrawn(double) after every repaint, with the time when it ended.
+	The repaint rate is updated every second, even when nothing is drawn.
+	"""
+
+	# Display refresh rate (in Hz) assumed when none is given.
+	REFRESH_RATE = 60
+
+	def __init__(self, widget, refreshRate=None):
+		"""
+		Constructor.
+		"""
+
+		super(FrameScheduler, self).__init__(widget)
+
+		# Widget that is repainted.
+		self.widget = widget
+
+		# Minimum time between two repaints, in seconds.
+		self.interval = 1.0 / (refreshRate or FrameScheduler.REFRESH_RATE)
+
+		# Total number of repaints, and repaints in the last full second.
+		self.repaints = 0
+		self.repaintsPerSecond = 0.0
+
+		# Redraw requests merged into an already pending frame, and mouse moves
+		# dropped because a newer one arrived before they were handled.
+		self.mergedRedraws = 0
+		self.mergedMoves = 0
+
+		self._dirty = False
+		self._pendingMove = None
+		self._lastFrame = default_timer() - self.interval
+		self._secondStart = default_timer()
+		self._secondRepaints = 0
+
+		self._timer = QTimer(self)
+		self._timer.setSingleShot(True)
+		self.connect(self._timer, SIGNAL("timeout()"), self.tick)
+
+		# Updates the repaint rate while the widget is idle, so that it drops to 0.
+		self._rateTimer = QTimer(self)
+		self.connect(self._rateTimer, SIGNAL("timeout()"), self.updateRate)
+		self._rateTimer.start(1000)
+
+	def requestRedraw(self):
+		"""
+		Marks the widget as dirty. It will be repainted in the next frame.
+		"""
+
+		if self._dirty:
+			self.mergedRedraws += 1
+		else:
+			self._dirty = True
+
+		self.__schedule()
+
+	def postMouseMove(self, handler, *args):
+		"""
+		Defers a mouse move to the next frame, calling handler(*args) right before it is drawn.
+		A pending mouse move that was not handled yet is replaced.
+		"""
+
+		if self._pendingMove is not None:
+			self.mergedMoves += 1
+
+		self._pendingMove = (handler, args)
+		self.__schedule()
+
+	def flushInput(self):
+		"""
+		Handles the pending mouse move right away, if there is one.
+		It must be called before handling events that depend on the mouse moves before them.
+		"""
+
+		if self._pendingMove is not None:
+			handler, args = self._pendingMove
+			self._pendingMove = None
+			handler(*args)
+
+	def pending(self):
+		"""
+		Returns True if there is a redraw or a mouse move waiting for the next frame.
+		"""
+
+		return self._dirty or self._pendingMove is not None
+
+	def tick(self):
+		"""
+		Handles the pending input and repaints the widget, if it is dirty.
+		"""
+
+		self.flushInput()
+
+		if not self._dirty:
+			return
+
+		self._dirty = False
+		self._lastFrame = default_timer()
+		self.widget.updateGL()
+		self.emit(SIGNAL("frameDrawn(double)"), default_timer())
+
+		self.repaints += 1
+		self._secondRepaints += 1
+
+		self.updateRate(self._lastFrame)
+
+	def updateRate(self, now=None):
+		"""
+		Computes repaintsPerSecond once at least a second passed since it was last computed.
+		"""
+
+		if now is None:
+			now = default_timer()
+
+		elapsed = now - self._secondStart
+		if elapsed >= 1:
+			self.repaintsPerSecond = self._secondRepaints / elapsed
+			self._secondStart = now
+			self._secondRepaints = 0
+
+	def __schedule(self):
+		"""
+		Starts the timer of the next frame, if it is not running yet.
+		"""
+
+		if self._timer.isActive():
+			return
+
+		wait = self.interval - (default_timer() - self._lastFrame)
+		self._timer.start(max(0, int(wait * 1000)))